@@ -1,8 +1,11 @@
-import pandas as pd
+import sys
+from pathlib import Path
 
-df = pd.read_csv(r"AGG\refseq_codon_species.tsv", sep="\t")
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+from cutg_offsets import OffsetIndex
 
-print("Shape:", df.shape)
-print("\nTop 10 by total codons:")
-print(df.nlargest(10, "#Codons")[["Taxid", "Organelle", "#CDS", "#Codons"]])
+idx = OffsetIndex.open(r"AGG\refseq_codon_species.tsv")
 
+print("Shape:", (len(idx), len(idx.columns)))
+print("\nTop 10 by total codons:")
+print(idx.read(idx.top("#Codons", 10), ["Taxid", "Organelle", "#CDS", "#Codons"]))
@@ -25,16 +25,60 @@ CLI reference
 --agg-dir DIR  folder for aggregated output     (default: "AGG")
 --progress N   emit a progress line every **N** input rows
                value may use k/M suffixes: 10k, 2M etc.
+--engine E     "numpy" (default): parse blocks of rows straight into int32
+               arrays (np.loadtxt), factorize (Taxid, Organelle) and sum
+               each key's rows with one weighted np.bincount per codon;
+               "rows": the original csv.DictReader loop.  Same output file.
+--chunksize N  rows per parsed block for the numpy engine (default 200k)
+--workers N    numpy engine only: split the table into N newline‑aligned
+               byte ranges, aggregate them in N processes and merge the
+               partial sums in file order (same output as one process);
+               --progress counts rows across all of them
+--incremental  numpy engine only: keep a checkpoint (sums, byte offset and a
+               hash of the consumed prefix) in AGG/<dataset>_codon_species.
+               state.npz and, on the next run, read only the rows after it –
+               resuming an interrupted run or folding in appended rows.  If
+               the prefix has changed the table is rebuilt from scratch
+--checkpoint N input bytes between checkpoints (default 256M)
+--rebuild      discard the checkpoint first
+--compress C   write the output as .gz, .bz2, .xz or .zst
+--telemetry F  append JSON‑lines records (per stage: seconds, rows, bytes,
+               rows/s, bytes/s, peak RSS) to F; default $CUTG_TELEMETRY
+               (cutg_telemetry.py).  A one‑line summary per stage always
+               goes to stderr
+--format F     "tsv" (default) or "parquet": typed int64 columns, rows sorted
+               by (Organelle, Taxid) in row groups with min/max statistics, so
+               cutg_cache.load_frame(..., organelle=…, taxids=…) reads only the
+               row groups and columns it needs (cutg_parquet.py; needs pyarrow)
+
+Input tables may themselves be compressed (<name>.tsv.gz etc., found by the
+same names); they are decompressed in a background thread while parsing.
 """
 from __future__ import annotations
 
 import argparse
 import csv
+import hashlib
+import os
 import re
-import sys
 from pathlib import Path
+from itertools import islice
 from typing import Dict, List, Tuple
 
+import numpy as np
+import pandas as pd
+
+from codon_index import CODONS_DNA
+from cutg_compress import SUFFIXES, is_compressed, open_input, open_output
+from cutg_layout import Layout, sniff
+from cutg_parquet import agg_frame, arrow_modules, is_parquet, write_table
+from cutg_shards import (Heartbeat, header_end, last_line_end, open_span, run_shards,
+                         shard_ranges)
+from cutg_telemetry import Telemetry
+
+CHUNK = 200_000  # rows per block for the numpy engine
+REPORT = 10_000  # rows between progress reports of the row engine
+
 # ------------------------------------------------------------
 # helpers
 # ------------------------------------------------------------
@@ -48,6 +92,7 @@ def _find_input(dataset: str, cds_dir: Path) -> Path:
     tag = dataset.lower()
     cand = [f"{tag}_species_cds_fixed.tsv", f"{tag}_cds_fixed.tsv",
             f"{tag}_species_cds.tsv", f"{tag}_cds.tsv"]
+    cand = [n + ext for n in cand for ext in ("", *SUFFIXES)]
     for name in cand:
         p = cds_dir / name
         if p.exists():
@@ -56,8 +101,7 @@ def _find_input(dataset: str, cds_dir: Path) -> Path:
 
 
 def _codon_columns() -> List[str]:
-    bases = "TCAG"  # lexicographic order used by CUTG
-    return [a + b + c for a in bases for b in bases for c in bases]
+    return list(CODONS_DNA)  # lexicographic TCAG order used by CUTG
 
 
 def _parse_int_with_suffix(text: str) -> int:
@@ -73,6 +117,269 @@ def _parse_int_with_suffix(text: str) -> int:
         n *= 1_000_000
     return n
 
+# ------------------------------------------------------------
+# aggregation
+# ------------------------------------------------------------
+
+Counts = Dict[Tuple[str, str], Dict[str, int]]
+
+
+def aggregate_rows(raw_path: Path, step: int | None = None, progress=None) -> Counts:
+    """Sum codon counts per (Taxid, Organelle) row by row.
+
+    *progress(n)* (default a Heartbeat every *step* rows) hears of rows read.
+    """
+    beat = progress or Heartbeat(step)
+    every = min(step, REPORT) if step else REPORT
+    codon_cols = _codon_columns()
+    lay = sniff(raw_path)
+    _key_columns(lay)
+    fields = list(zip(codon_cols, lay.codon_names))  # output name, name in file
+    counts: Counts = {}
+
+    row_no = 0
+    with open_input(raw_path, "rt") as f:
+        f.readline()
+        rdr = csv.DictReader(f, delimiter="\t", fieldnames=lay.names)
+        for row in rdr:
+            key = (row["Taxid"], row["Organelle"])
+            acc = counts.setdefault(key, {c: 0 for c in codon_cols})
+            acc.setdefault("#CDS", 0)
+            for c, name in fields:
+                acc[c] += int(row[name])
+            acc["#CDS"] += 1
+
+            row_no += 1
+            if row_no % every == 0:
+                beat(every)
+    beat(row_no % every)
+    return counts
+
+
+def write_counts(counts: Counts, out_path: Path) -> None:
+    codon_cols = _codon_columns()
+    if is_parquet(out_path):
+        sums = [[acc[c] for c in codon_cols] for acc in counts.values()]
+        ncds = [acc["#CDS"] for acc in counts.values()]
+        write_table(agg_frame(counts, sums, ncds), out_path)
+        return
+    with open_output(out_path, "w") as f:
+        fieldnames = ["Taxid", "Organelle", *codon_cols, "#CDS", "#Codons"]
+        w = csv.DictWriter(f, delimiter="\t", fieldnames=fieldnames)
+        w.writeheader()
+        for (taxid, org), acc in counts.items():
+            row = {c: acc[c] for c in codon_cols}
+            row["#CDS"]    = acc["#CDS"]
+            row["#Codons"] = sum(acc[c] for c in codon_cols)
+            w.writerow({"Taxid": taxid, "Organelle": org, **row})
+
+
+class Accumulator:
+    """Per‑(Taxid, Organelle) int64 codon sums, keys kept in first‑seen order."""
+
+    def __init__(self):
+        self.ids: Dict[Tuple[str, str], int] = {}
+        self.sums = np.zeros((1024, 64), dtype=np.int64)
+        self.ncds = np.zeros(1024, dtype=np.int64)
+
+    @classmethod
+    def from_arrays(cls, keys, sums: np.ndarray, ncds: np.ndarray) -> "Accumulator":
+        """Rebuild an accumulator from its keys (in order) and their sums."""
+        acc = cls()
+        gid = acc._key_ids(list(keys))
+        acc.sums[gid] = sums
+        acc.ncds[gid] = ncds
+        return acc
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _grow(self, n: int) -> None:
+        old = len(self.ncds)
+        if n > old:
+            cap = max(n, 2 * old)
+            self.sums = np.concatenate([self.sums, np.zeros((cap - old, 64), np.int64)])
+            self.ncds = np.concatenate([self.ncds, np.zeros(cap - old, np.int64)])
+
+    def _key_ids(self, keys) -> np.ndarray:
+        ids = self.ids
+        out = np.fromiter((ids.setdefault(k, len(ids)) for k in keys),
+                          dtype=np.int64, count=len(keys))
+        self._grow(len(ids))
+        return out
+
+    def add(self, taxid, organelle, counts: np.ndarray) -> None:
+        """Fold one block of rows (codon columns in CODONS_DNA order) in."""
+        ct, ut = pd.factorize(np.asarray(taxid))
+        co, uo = pd.factorize(np.asarray(organelle))
+        codes, pairs = pd.factorize(ct * len(uo) + co)     # first-seen order
+        gid = self._key_ids([(ut[p // len(uo)], uo[p % len(uo)]) for p in pairs])
+        # one weighted bincount per codon column; float64 weights are exact
+        # far beyond any block's sums
+        self.sums[gid] += np.column_stack(
+            [np.bincount(codes, weights=col, minlength=len(pairs)) for col in counts.T]
+        ).astype(np.int64)
+        self.ncds[gid] += np.bincount(codes, minlength=len(pairs))
+
+    def merge(self, other: "Accumulator") -> "Accumulator":
+        """Add *other*'s sums; its new keys go after ours, in its order."""
+        n = len(other)
+        gid = self._key_ids(list(other.ids))
+        self.sums[gid] += other.sums[:n]
+        self.ncds[gid] += other.ncds[:n]
+        return self
+
+
+def _key_columns(lay: Layout) -> List[int]:
+    """Fields of Taxid and Organelle."""
+    missing = [c for c in ("Taxid", "Organelle") if c not in lay.columns]
+    if missing:
+        raise ValueError(f"missing column(s) {', '.join(missing)} in header")
+    return [lay.columns.index("Taxid"), lay.columns.index("Organelle")]
+
+
+def _block_dtype(lay: Layout) -> Tuple[List[int], np.dtype]:
+    """loadtxt columns and structured dtype: Taxid, Organelle, 64 codons.
+
+    Per‑CDS counts fit int32 (loadtxt raises on one that does not), and the
+    smaller block parses faster; the sums stay int64.
+    """
+    dtype = np.dtype([("taxid", object), ("organelle", object), ("codons", np.int32, 64)])
+    return [*_key_columns(lay), *lay.codon_cols], dtype
+
+
+def _aggregate_span(raw_path: Path, start: int, end: int, report,
+                    chunksize: int = CHUNK) -> Accumulator:
+    """Accumulator for the rows in bytes [start, end) of *raw_path*."""
+    usecols, dtype = _block_dtype(sniff(raw_path))
+    acc = Accumulator()
+    with open_span(raw_path, start, end) as f:
+        while True:
+            lines = list(islice(f, chunksize))
+            if not lines:
+                break
+            block = np.loadtxt(lines, delimiter="\t", quotechar='"', usecols=usecols,
+                               dtype=dtype, ndmin=1, comments=None, encoding="utf-8")
+            acc.add(block["taxid"], block["organelle"], block["codons"])
+            report(len(lines))
+    return acc
+
+
+def aggregate_blocks(raw_path: Path, step: int | None = None,
+                     chunksize: int = CHUNK, workers: int = 1, progress=None) -> Accumulator:
+    """Same sums as aggregate_rows, parsed and added a block at a time.
+
+    With workers > 1 the body is split into newline‑aligned byte ranges,
+    one process aggregates each, and the partial sums are merged in file
+    order – so keys, sums and output match the serial run exactly.
+    """
+    spans = shard_ranges(raw_path, workers)
+    parts = run_shards(_aggregate_span, raw_path, spans, workers,
+                       progress or Heartbeat(step), (chunksize,))
+    acc = Accumulator()
+    for part in parts:
+        acc.merge(part)
+    return acc
+
+
+# ------------------------------------------------------------
+# incremental runs
+# ------------------------------------------------------------
+
+STATE_VERSION = 1
+CHECKPOINT = 256_000_000  # bytes of input between checkpoints
+
+
+def _hash_span(h, raw_path: Path, start: int, end: int):
+    with open_span(raw_path, start, end) as f:
+        for block in iter(lambda: f.read(1 << 24), b""):
+            h.update(block)
+    return h
+
+
+def _new_hash():
+    return hashlib.blake2b(digest_size=20)
+
+
+def save_state(acc: Accumulator, offset: int, digest: str, state_path: Path) -> None:
+    """Checkpoint *acc* and the input prefix it covers (written atomically)."""
+    n, keys = len(acc), list(acc.ids)
+    tmp = state_path.with_name(state_path.name + ".tmp")
+    with tmp.open("wb") as f:
+        np.savez(f, version=STATE_VERSION, offset=offset, digest=digest,
+                 taxid=np.array([k[0] for k in keys], dtype=str),
+                 organelle=np.array([k[1] for k in keys], dtype=str),
+                 sums=acc.sums[:n], ncds=acc.ncds[:n])
+    os.replace(tmp, state_path)
+
+
+def load_state(raw_path: Path, state_path: Path):
+    """(accumulator, offset, prefix hash) from a checkpoint whose prefix
+    still matches *raw_path* byte for byte; None otherwise."""
+    if not state_path.exists():
+        return None
+    with np.load(state_path) as z:
+        if int(z["version"]) != STATE_VERSION:
+            return None
+        offset, digest = int(z["offset"]), str(z["digest"])
+        if raw_path.stat().st_size < offset:
+            print(f"{raw_path.name} is shorter than the checkpoint – rebuilding")
+            return None
+        h = _hash_span(_new_hash(), raw_path, 0, offset)
+        if h.hexdigest() != digest:
+            print(f"{raw_path.name} changed before byte {offset:,} – rebuilding")
+            return None
+        keys = zip(z["taxid"].tolist(), z["organelle"].tolist())
+        acc = Accumulator.from_arrays(keys, z["sums"], z["ncds"])
+    return acc, offset, h
+
+
+def aggregate_incremental(raw_path: Path, state_path: Path, step: int | None = None,
+                          chunksize: int = CHUNK, workers: int = 1,
+                          every: int = CHECKPOINT, progress=None) -> Accumulator:
+    """aggregate_blocks that starts from the checkpoint in *state_path* and
+    checkpoints there every *every* input bytes.
+
+    Only rows past the checkpoint are read, so an interrupted run picks up
+    where it stopped and an appended‑to table costs just the new rows.  A
+    checkpoint whose prefix no longer matches the file is discarded.  A
+    final line without its newline is left for the next run.
+    """
+    resumed = load_state(raw_path, state_path)
+    if resumed:
+        acc, offset, h = resumed
+        print(f"resuming at byte {offset:,} ({len(acc):,} keys)")
+    else:
+        acc, offset = Accumulator(), header_end(raw_path)
+        h = _hash_span(_new_hash(), raw_path, 0, offset)
+    end = max(offset, last_line_end(raw_path))
+    segments = shard_ranges(raw_path, -(-(end - offset) // every), offset, end)
+    beat = progress or Heartbeat(step)
+    for a, b in segments:
+        spans = shard_ranges(raw_path, workers, a, b)
+        for part in run_shards(_aggregate_span, raw_path, spans, workers, beat, (chunksize,)):
+            acc.merge(part)
+        save_state(acc, b, _hash_span(h, raw_path, a, b).hexdigest(), state_path)
+    if not segments and not resumed:
+        save_state(acc, offset, h.hexdigest(), state_path)
+    return acc
+
+
+def write_accumulator(acc: Accumulator, out_path: Path) -> None:
+    """Write *acc* exactly as write_counts writes the equivalent dict."""
+    n = len(acc)
+    sums, ncds = acc.sums[:n], acc.ncds[:n]
+    if is_parquet(out_path):
+        write_table(agg_frame(acc.ids, sums, ncds), out_path)
+        return
+    total = sums.sum(axis=1)
+    with open_output(out_path, "w") as f:
+        w = csv.writer(f, delimiter="\t")
+        w.writerow(["Taxid", "Organelle", *_codon_columns(), "#CDS", "#Codons"])
+        for (taxid, org), row, k, t in zip(acc.ids, sums.tolist(), ncds.tolist(),
+                                           total.tolist()):
+            w.writerow([taxid, org, *row, k, t])
+
 # ------------------------------------------------------------
 # main
 # ------------------------------------------------------------
@@ -87,6 +394,25 @@ def main() -> None:
     ap.add_argument("--agg-dir", default="AGG", help="Folder to write aggregated output")
     ap.add_argument("--progress", metavar="N", default=None,
                     help="Print progress every N rows (accepts k/M suffix)")
+    ap.add_argument("--engine", choices=["numpy", "rows"], default="numpy",
+                    help="numpy block aggregation (default) or the row-by-row loop")
+    ap.add_argument("--chunksize", metavar="N", default=str(CHUNK),
+                    help=f"rows per block for the numpy engine (default {CHUNK:,})")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="processes for the numpy engine, one byte-range shard each (default 1)")
+    ap.add_argument("--incremental", action="store_true",
+                    help="resume from / append to the checkpoint next to the output")
+    ap.add_argument("--checkpoint", metavar="N", default="256M",
+                    help="input bytes between checkpoints (accepts k/M suffix, default 256M)")
+    ap.add_argument("--compress", choices=[s.lstrip(".") for s in SUFFIXES],
+                    help="write the output compressed (gz, bz2, xz or zst)")
+    ap.add_argument("--format", choices=["tsv", "parquet"], default="tsv",
+                    help="output table format (parquet needs pyarrow; default tsv)")
+    ap.add_argument("--telemetry", metavar="FILE",
+                    help="append JSON-lines timing/throughput/RSS records here "
+                         "(default: $CUTG_TELEMETRY)")
+    ap.add_argument("--rebuild", action="store_true",
+                    help="with --incremental: ignore any existing checkpoint")
 
     args = ap.parse_args()
 
@@ -97,7 +423,13 @@ def main() -> None:
 
     dataset  = args.dataset.lower()
     raw_path = _find_input(dataset, cds_dir)
-    out_path = agg_dir / f"{dataset}_codon_species.tsv"
+    out_path = agg_dir / f"{dataset}_codon_species.{args.format}"
+    if args.compress and args.format == "parquet":
+        ap.error("--compress applies to tsv output; parquet is compressed internally")
+    if args.format == "parquet":
+        arrow_modules()                 # fail before aggregating, not after
+    if args.compress:
+        out_path = out_path.with_name(out_path.name + "." + args.compress)
 
     step = None
     if args.progress is not None:
@@ -108,35 +440,38 @@ def main() -> None:
         except ValueError:
             ap.error("--progress expects integer or k/M‑suffix value, e.g. 10000 or 10k")
 
-    codon_cols = _codon_columns()
-    counts: Dict[Tuple[str, str], Dict[str, int]] = {}
-
-    # ---------- aggregation loop ----------
-    row_no = 0
-    with raw_path.open(newline="") as f:
-        rdr = csv.DictReader(f, delimiter="\t")
-        for row in rdr:
-            key = (row["Taxid"], row["Organelle"])
-            acc = counts.setdefault(key, {c: 0 for c in codon_cols})
-            acc.setdefault("#CDS", 0)
-            for c in codon_cols:
-                acc[c] += int(row[c])
-            acc["#CDS"] += 1
-
-            row_no += 1
-            if step and row_no % step == 0:
-                print(f"…{row_no:,} rows", file=sys.stderr)
-
-    # ---------- write result ----------
-    with out_path.open("w", newline="") as f:
-        fieldnames = ["Taxid", "Organelle", *codon_cols, "#CDS", "#Codons"]
-        w = csv.DictWriter(f, delimiter="\t", fieldnames=fieldnames)
-        w.writeheader()
-        for (taxid, org), acc in counts.items():
-            row = {c: acc[c] for c in codon_cols}
-            row["#CDS"]    = acc["#CDS"]
-            row["#Codons"] = sum(acc[c] for c in codon_cols)
-            w.writerow({"Taxid": taxid, "Organelle": org, **row})
+    tel = Telemetry("agg_codon_by_taxid", args.telemetry)
+    nbytes = raw_path.stat().st_size
+    if args.engine == "rows":
+        if args.incremental:
+            ap.error("--incremental needs the numpy engine")
+        with tel.stage("aggregate", step, nbytes) as st:
+            counts = aggregate_rows(raw_path, step, st)
+        with tel.stage("write") as st:
+            write_counts(counts, out_path)
+            st(len(counts))
+    else:
+        try:
+            chunksize = _parse_int_with_suffix(args.chunksize)
+            every = _parse_int_with_suffix(args.checkpoint)
+        except ValueError:
+            ap.error("--chunksize/--checkpoint expect integer or k/M‑suffix values")
+        if args.incremental:
+            if is_compressed(raw_path):
+                ap.error("--incremental needs an uncompressed CDS table")
+            state_path = agg_dir / f"{dataset}_codon_species.state.npz"
+            if args.rebuild and state_path.exists():
+                state_path.unlink()
+            with tel.stage("aggregate", step, nbytes) as st:
+                acc = aggregate_incremental(raw_path, state_path, step, chunksize,
+                                            args.workers, every, st)
+        else:
+            with tel.stage("aggregate", step, nbytes) as st:
+                acc = aggregate_blocks(raw_path, step, chunksize, args.workers, st)
+        with tel.stage("write") as st:
+            write_accumulator(acc, out_path)
+            st(len(acc))
+    tel.close(dataset=dataset, engine=args.engine, workers=args.workers)
 
     print(f"\u2713 wrote {out_path.relative_to(root)}")
 
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+r"""
+bench_cutg.py – time and memory baseline for the CUTG pipeline
+--------------------------------------------------------------
+Generates synth_cutg.py tables at each requested scale and runs every stage
+in a fresh process, recording wall time, rows/s, the Python allocation peak
+(tracemalloc – includes NumPy buffers) and the process high‑water RSS:
+
+    fix_header       fix_hive_header.main        raw dump → *_cds_fixed.tsv
+    agg_loop         agg_codon_by_taxid           (Taxid, Organelle) sums, row loop
+    agg_numpy        agg_codon_by_taxid           the same, --engine numpy
+    species_rollup   cds_to_species_hardwired     per‑species sums
+    pipeline         cutg_pipeline.run            raw dump → both tables in one pass
+    read_cutg        fc_checker.read_cutg         species table load
+    reference_fc     fc_checker.to_rscu/sigma_ratio, row by row
+    engine_fc        cutg_io.iter_cutg + fc_engine.fc_ratios
+    null_model       fc_null.null_distribution    --null shuffles
+
+Per‑row reference scoring and the null model use at most --cap species so
+the large scales finish; their rows/s still compare across scales.
+
+    $ python bench_cutg.py --scales 1k,10k,100k
+    $ python bench_cutg.py --scales 1M,10M --stages agg_loop,engine_fc --out bench.tsv
+
+Data is cached per scale under --dir and reused by later runs.  With
+--compression gz (bz2, xz, zst) the stages read compressed copies of the
+tables instead, so the two runs compare plain and compressed wall time.
+
+--check first compares cutg_pipeline --fixed (1 and 2 workers) with
+fix_hive_header byte for byte, on each dump with its final newline removed,
+and exits if they differ.
+
+Requires numpy pandas (plus whatever the benchmarked scripts need)
+"""
+
+import argparse
+import contextlib
+import csv
+import filecmp
+import importlib
+import io
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import List
+
+from cutg_compress import SUFFIXES, open_output
+from cutg_telemetry import Telemetry, peak_rss_mb
+from synth_cutg import parse_count, write_tables
+
+STAGES = ["fix_header", "agg_loop", "agg_numpy", "species_rollup", "pipeline", "read_cutg",
+          "reference_fc", "engine_fc", "null_model"]
+FIELDS = ["scale", "compression", "stage", "rows", "seconds", "rows_per_s", "py_peak_mb", "max_rss_mb"]
+
+# ---------------------------------------------------------------------------
+# stages – each returns the number of rows it processed
+# ---------------------------------------------------------------------------
+
+
+def _fix_header(paths, opts):
+    import fix_hive_header
+    fix_hive_header.main(paths["raw"])
+    return opts["rows"]
+
+
+def _agg_loop(paths, opts):
+    import agg_codon_by_taxid as agg
+    counts = agg.aggregate_rows(paths["fixed"])
+    agg.write_counts(counts, paths["work"] / "agg.tsv")
+    return opts["rows"]
+
+
+def _agg_numpy(paths, opts):
+    import agg_codon_by_taxid as agg
+    acc = agg.aggregate_blocks(paths["fixed"])
+    agg.write_accumulator(acc, paths["work"] / "agg_numpy.tsv")
+    return opts["rows"]
+
+
+def _species_rollup(paths, opts):
+    from cds_to_species_hardwired import roll_up
+    roll_up(paths["fixed"], paths["work"] / "rollup.tsv")
+    return opts["rows"]
+
+
+def _pipeline(paths, opts):
+    from cutg_pipeline import run
+    run(paths["raw"], paths["work"], "pipeline")
+    return opts["rows"]
+
+
+def _read_cutg(paths, opts):
+    from fc_checker import read_cutg
+    return len(read_cutg(paths["species"]))
+
+
+def _reference_fc(paths, opts):
+    import pandas as pd
+    from fc_checker import load_map, sigma_ratio, to_rscu
+    orbit = load_map(opts["map"])
+    df = pd.read_csv(paths["species"], sep="\t", nrows=opts["cap"])
+    counts = df.iloc[:, -64:].to_numpy(dtype=float)
+    for row in counts:
+        rscu = to_rscu(row, orbit)
+        if not (rscu != rscu).any():
+            sigma_ratio(rscu, orbit)
+    return len(counts)
+
+
+def _engine_fc(paths, opts):
+    from cutg_io import iter_cutg
+    from fc_checker import load_map
+    from fc_engine import compile_orbit_map, fc_ratios
+    idx = compile_orbit_map(load_map(opts["map"]))
+    n = 0
+    for _, counts in iter_cutg(paths["species"]):
+        fc_ratios(counts, idx)
+        n += len(counts)
+    return n
+
+
+def _null_model(paths, opts):
+    import pandas as pd
+    from fc_checker import load_map
+    from fc_engine import compile_orbit_map
+    from fc_null import frequency_matrix, null_distribution
+    idx = compile_orbit_map(load_map(opts["map"]))
+    df = pd.read_csv(paths["species"], sep="\t", nrows=opts["cap"])
+    freq = frequency_matrix(df.iloc[:, -64:].to_numpy(dtype=float))
+    null_distribution(freq, idx, opts["null"], workers=opts["workers"])
+    return len(freq)
+
+
+_RUN = {name: globals()["_" + name] for name in STAGES}
+_IMPORTS = {"fix_header": ["fix_hive_header"],
+            "agg_loop": ["agg_codon_by_taxid"],
+            "agg_numpy": ["agg_codon_by_taxid"],
+            "species_rollup": ["cds_to_species_hardwired"],
+            "pipeline": ["cutg_pipeline"],
+            "read_cutg": ["fc_checker"],
+            "reference_fc": ["fc_checker"],
+            "engine_fc": ["fc_checker", "cutg_io", "fc_engine"],
+            "null_model": ["fc_checker", "fc_engine", "fc_null"]}
+
+
+def _measure(stage, paths, opts):
+    """Run one stage (in a fresh worker) and return its measurements."""
+    for mod in _IMPORTS[stage]:         # keep import cost out of the timing
+        importlib.import_module(mod)
+    tracemalloc.start()
+    with open(os.devnull, "w") as null, \
+            contextlib.redirect_stdout(null), contextlib.redirect_stderr(null):
+        t0 = time.perf_counter()
+        rows = _RUN[stage](paths, opts)
+        secs = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_mb = peak_rss_mb(children=False) or 0.0
+    return {"rows": rows, "seconds": round(secs, 4),
+            "rows_per_s": round(rows / secs) if secs else 0,
+            "py_peak_mb": round(peak / 2**20, 1), "max_rss_mb": round(rss_mb, 1)}
+
+
+def _compressed_copy(path: Path, ext: str) -> Path:
+    """*path* + *ext*, written once and reused."""
+    out = path.with_name(path.name + ext)
+    if not out.exists():
+        with open(path, "rb") as src, open_output(out, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 24)
+    return out
+
+
+def check_fixed(raw: Path, work: Path) -> List[str]:
+    """Where cutg_pipeline --fixed differs from fix_hive_header on *raw* without
+    its final newline; empty if nowhere."""
+    from cutg_pipeline import run
+    from fix_hive_header import stream_fix
+    cut = work / "check_cds.tsv"
+    with open(raw, "rb") as src, open(cut, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1 << 24)
+        dst.truncate(dst.tell() - 1)
+    want = work / "check_cds_fixed.tsv"
+    with contextlib.redirect_stdout(io.StringIO()):
+        stream_fix(cut, want)
+    bad = []
+    for workers in (1, 2):
+        got = work / f"check_pipeline_{workers}_fixed.tsv"
+        run(cut, work / "check", "check", fixed=got, workers=workers,
+            telemetry=Telemetry("bench_check", os.devnull, quiet=True))
+        if not filecmp.cmp(want, got, shallow=False):
+            bad.append(f"{got} != {want}")
+    return bad
+
+
+def run_stage(stage, paths, opts) -> dict:
+    ctx = get_context("spawn")
+    with ProcessPoolExecutor(1, mp_context=ctx) as ex:
+        return ex.submit(_measure, stage, paths, opts).result()
+
+# ---------------------------------------------------------------------------
+
+
+def main():
+    here = Path(__file__).resolve().parent
+    ap = argparse.ArgumentParser(description="Benchmark the CUTG pipeline on synthetic data.")
+    ap.add_argument("--scales", default="1k,10k,100k",
+                    help="comma list of CDS/species row counts [1k,10k,100k]")
+    ap.add_argument("--stages", default=",".join(STAGES), help="comma list of stages [all]")
+    ap.add_argument("--dir", type=Path, default=Path("bench_data"),
+                    help="where generated tables are kept [./bench_data]")
+    ap.add_argument("--cap", type=parse_count, default=parse_count("20k"),
+                    help="species used by reference_fc and null_model [20k]")
+    ap.add_argument("--null", type=int, default=1000, help="null‑model shuffles [1000]")
+    ap.add_argument("--workers", type=int, default=1, help="null‑model processes [1]")
+    ap.add_argument("--compression", choices=[s.lstrip(".") for s in SUFFIXES],
+                    help="read compressed copies of the tables (gz, bz2, xz or zst)")
+    ap.add_argument("--map", default=str(here / "orbit_map.csv"))
+    ap.add_argument("--out", help="append results to this TSV")
+    ap.add_argument("--check", action="store_true",
+                    help="first check cutg_pipeline --fixed against fix_hive_header")
+    args = ap.parse_args()
+
+    stages = args.stages.split(",")
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        ap.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    results = []
+    print(f"{'scale':>10} {'stage':15s} {'rows':>10} {'seconds':>9} "
+          f"{'rows/s':>11} {'py MB':>8} {'RSS MB':>8}")
+    for text in args.scales.split(","):
+        scale = parse_count(text)
+        root = args.dir / f"n{scale}"
+        paths = {"raw": root / "CDS" / "bench_cds.tsv",
+                 "fixed": root / "CDS" / "bench_cds_fixed.tsv",
+                 "species": root / "bench_species.tsv",
+                 "work": root / "work"}
+        if not all(paths[k].exists() for k in ("raw", "fixed", "species")):
+            print(f"  generating {scale:,} rows → {root}", flush=True)
+            write_tables(root, scale, scale, tag="bench")
+        paths["work"].mkdir(exist_ok=True)
+        if args.check:
+            bad = check_fixed(paths["raw"], paths["work"])
+            if bad:
+                sys.exit("--fixed mismatch: " + "; ".join(bad))
+            print(f"  {scale:,} rows: cutg_pipeline --fixed == fix_hive_header", flush=True)
+        if args.compression:
+            for k in ("raw", "fixed", "species"):
+                paths[k] = _compressed_copy(paths[k], "." + args.compression)
+        opts = {"rows": scale, "cap": args.cap, "null": args.null,
+                "workers": args.workers, "map": args.map}
+        for stage in stages:
+            r = {"scale": scale, "compression": args.compression or "",
+                 "stage": stage, **run_stage(stage, paths, opts)}
+            results.append(r)
+            print(f"{scale:>10,} {stage:15s} {r['rows']:>10,} {r['seconds']:>9.3f} "
+                  f"{r['rows_per_s']:>11,} {r['py_peak_mb']:>8.1f} {r['max_rss_mb']:>8.1f}",
+                  flush=True)
+
+    if args.out:
+        new = not Path(args.out).exists()
+        with open(args.out, "a", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=FIELDS, delimiter="\t")
+            if new:
+                w.writeheader()
+            w.writerows(results)
+        print("Results →", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,257 @@
 #!/usr/bin/env python3
 r"""cds_to_species_hardwired.py
 ---------------------------------
-Hard‑wired one‑shot conversion of your CUTG *CDS* tables into per‑species
-summary tables.  **No command‑line arguments needed.**  Just run:
+Rolls CUTG *CDS* tables up into per‑species summary tables: every numeric
+column summed by the "Species" field, one row per species, sorted by name.
 
-    python cds_to_species_hardwired.py
+    python cds_to_species_hardwired.py CDS/refseq_species_cds.tsv
+    python cds_to_species_hardwired.py CDS/genbank_cds.tsv -o genbank_species.tsv --workers 8
+
+Without arguments it still processes the two tables in the original
+hard‑wired folder
+   C:\Users\djhmo\OneDrive\Projects\ACF\CUTG\CDS\
+   * genbank_species_cds.tsv
+   * refseq_species_cds.tsv
+and writes genbank_species.tsv / refseq_species.tsv next to them.
 
 Prerequisites
 -------------
-* pandas
-* tqdm  (pip install tqdm)
+* numpy, pandas
+* tqdm  (pip install tqdm) – for the command line and roll_up() only;
+  cutg_pipeline.py imports the accumulator without it
 
-What it does
+How it works
 ------------
-1. Loads the two big CDS tables located in
-   C:\Users\djhmo\OneDrive\Projects\ACF\CUTG\CDS\
-   * genbank_species_cds.tsv
-   * refseq_species_cds.tsv
+1. Reads the table with pandas' C parser in batches of --chunksize rows,
+   coercing blanks to 0.
+2. Folds each batch into a SpeciesTotals accumulator – species → row id,
+   int64 sums – in time proportional to the batch, however many species
+   have been seen.
+3. With --workers N the table is cut into newline‑aligned byte ranges
+   (cutg_shards.py) rolled up in N processes and merged in file order; the
+   output is the same as a single‑process run.
 
-2. Streams them in batches of 50 000 rows, coercing blanks to 0.
-3. Sums every numeric column by the "Species" field.
-4. Writes:
-   * genbank_species.tsv
-   * refseq_species.tsv
-   in **the same folder** as the inputs.
+Tables named *.gz, *.bz2, *.xz or *.zst are read and written compressed
+(cutg_compress.py); a compressed input is read as one stream, not sharded.
 
-Each run prints a tqdm progress bar + a final row count.
+Decimal columns (GC%, GC1%, …) are summed as int64 millionths so that totals
+do not depend on how rows were batched or sharded.
+
+Each run prints a tqdm progress bar + a final row count, and a stage summary
+(rows/s, MB/s, peak RSS) that --telemetry FILE (or $CUTG_TELEMETRY) also
+appends as JSON lines (cutg_telemetry.py).
 """
 
-import pandas as pd
+import argparse
 from pathlib import Path
-from tqdm import tqdm
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from codon_index import CODONS_RNA, DNA2RNA
+from cutg_compress import open_input, open_output
+from cutg_layout import EXTRA, sniff
+from cutg_shards import open_span, run_shards, shard_ranges
+from cutg_telemetry import Telemetry
 
 # -------------------------------------------------------------
 BASE = Path(r"C:\Users\djhmo\OneDrive\Projects\ACF\CUTG\CDS")
 IN_FILES = [BASE / "genbank_species_cds.tsv", BASE / "refseq_species_cds.tsv"]
 CHUNK = 50_000  # rows per chunk
+# decimal columns are summed as int64 millionths so that totals do not depend
+# on how rows were batched (or sharded) – float sums do, in the last digit
+GC_COLUMNS = ["GC%", "GC1%", "GC2%", "GC3%"]
+SCALE = 10**6
+SNIFF_ROWS = 10_000  # rows read to decide which extra columns are numeric
+# species read_csv takes for missing by default (its keep_default_na list):
+# skipped by SpeciesTotals whatever NA options the reader used
+SPECIES_NA = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+})
+
+
+class Plan(NamedTuple):
+    """Which columns are summed, and how."""
+    names: List[str]     # header after renaming
+    sums: List[str]      # summed columns, in header order
+    decimal: List[str]   # the subset summed as millionths
+
+
+def column_plan(in_path: Path, columns: List[str] = None) -> Plan:
+    """Species column and summed columns of a CDS table.
+
+    Codon columns are always summed as integers, GC columns as decimals;
+    any other column is summed if pandas reads it as numeric in the first
+    SNIFF_ROWS rows (a decimal if it reads as float).  *columns* replaces
+    the header cutg_layout.sniff() reads from the file (e.g. FIXED_HEADER for
+    a raw HIVE dump); fields past the last named column are ignored.
+    """
+    raw = list(columns) if columns is not None else sniff(in_path).names
+    rename = dict(DNA2RNA)
+    if "Species" not in raw:
+        rename["SpeciesName"] = "Species"
+    if "# Codons" not in raw:
+        rename["TotalCodons"] = "# Codons"
+    names = [rename.get(c, c) for c in raw]
+    if "Species" not in names:
+        raise RuntimeError("Input file missing 'Species' column")
+    missing = [c for c in CODONS_RNA if c not in names]
+    if missing:
+        raise RuntimeError(f"Input file missing codon column(s) {', '.join(missing[:5])}")
+
+    with open_input(in_path) as f:
+        head = pd.read_csv(f, sep="\t", nrows=SNIFF_ROWS, skiprows=1, header=None,
+                           names=names, usecols=range(len(names)), dtype={"Species": str})
+    sums, decimal = [], []
+    for c in names:
+        if c in ("Species", EXTRA):
+            continue
+        if c in CODONS_RNA or c in GC_COLUMNS or pd.api.types.is_numeric_dtype(head[c]):
+            sums.append(c)
+            if c in GC_COLUMNS or (c not in CODONS_RNA
+                                   and pd.api.types.is_float_dtype(head[c])):
+                decimal.append(c)
+    return Plan(names, sums, decimal)
 
-CODONS_DNA = [a + b + c for a in "TCAG" for b in "TCAG" for c in "TCAG"]
-CODONS_RNA = [c.replace("T", "U") for c in CODONS_DNA]
 
-# mapping DNA->RNA column names once
-DNA2RNA = dict(zip(CODONS_DNA, CODONS_RNA))
+class SpeciesTotals:
+    """Per‑species int64 sums of the plan's columns, species in first‑seen order."""
 
-for in_path in IN_FILES:
-    if not in_path.exists():
-        print(f"ERROR: {in_path} not found – skipping.")
-        continue
+    def __init__(self, width: int):
+        self.ids: Dict[str, int] = {}
+        self.sums = np.zeros((1024, width), dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _key_ids(self, keys) -> np.ndarray:
+        ids = self.ids
+        out = np.fromiter((ids.setdefault(k, len(ids)) for k in keys),
+                          dtype=np.int64, count=len(keys))
+        if len(ids) > len(self.sums):
+            grow = max(len(ids), 2 * len(self.sums)) - len(self.sums)
+            self.sums = np.concatenate([self.sums, np.zeros((grow, self.sums.shape[1]),
+                                                            np.int64)])
+        return out
+
+    def add(self, species, values: np.ndarray) -> None:
+        """Fold one batch in: *values* is (n, width) int64; blank species, and
+        those spelled as in SPECIES_NA, are skipped."""
+        species = pd.Series(np.asarray(species, dtype=object))
+        codes, uniq = pd.factorize(species.mask(species.isin(SPECIES_NA)))
+        keep = codes >= 0
+        part = np.zeros((len(uniq), values.shape[1]), dtype=np.int64)
+        np.add.at(part, codes[keep], values[keep])
+        gid = self._key_ids(list(uniq))         # may grow self.sums
+        self.sums[gid] += part
+
+    def merge(self, other: "SpeciesTotals") -> "SpeciesTotals":
+        gid = self._key_ids(list(other.ids))
+        self.sums[gid] += other.sums[:len(other)]
+        return self
+
+    def frame(self, plan: Plan) -> pd.DataFrame:
+        """Species‑sorted DataFrame: Species, then the summed columns."""
+        names = np.array(list(self.ids), dtype=object)
+        order = np.argsort(names, kind="stable")
+        sums = self.sums[:len(self)][order]
+        df = pd.DataFrame(sums, columns=plan.sums)
+        for c in plan.decimal:
+            df[c] = df[c] / SCALE
+        df.insert(0, "Species", names[order])
+        return df
+
+
+def batch_values(chunk: pd.DataFrame, plan: Plan) -> np.ndarray:
+    """(n, width) int64 of one batch; blanks and junk count as 0."""
+    out = np.empty((len(chunk), len(plan.sums)), dtype=np.int64)
+    for j, c in enumerate(plan.sums):
+        x = chunk[c]
+        if not pd.api.types.is_numeric_dtype(x) or x.hasnans:
+            x = pd.to_numeric(x, errors="coerce").fillna(0)
+        if c in plan.decimal:
+            x = (x * SCALE).round()
+        out[:, j] = x.to_numpy(dtype=np.int64)
+    return out
+
+
+def _roll_up_span(in_path: Path, start: int, end: int, report, plan: Plan,
+                  chunksize: int = CHUNK) -> SpeciesTotals:
+    """Per‑species totals for the rows in bytes [start, end)."""
+    acc = SpeciesTotals(len(plan.sums))
+    with open_span(in_path, start, end) as f:
+        for chunk in pd.read_csv(f, sep="\t", engine="c", header=None, names=plan.names,
+                                 usecols=["Species", *plan.sums], dtype={"Species": str},
+                                 chunksize=chunksize):
+            acc.add(chunk["Species"].to_numpy(), batch_values(chunk, plan))
+            report(len(chunk))
+    return acc
+
+
+def roll_up(in_path: Path, out_path: Path = None, workers: int = 1,
+            chunksize: int = CHUNK, telemetry: Telemetry = None) -> pd.DataFrame:
+    """Sum every numeric column of a CDS table by Species and write it out.
+
+    With workers > 1 the table is cut into newline‑aligned byte ranges that
+    are rolled up in parallel; the partial totals are merged in file order.
+    Stage times and rates go to *telemetry* (by default one that logs to
+    $CUTG_TELEMETRY, if set).
+    """
+    from tqdm import tqdm
 
     print(f"Processing {in_path.name} …")
-    agg = None  # will hold the running per‑species totals
-
-    for chunk in tqdm(pd.read_csv(in_path, sep="\t", engine="python", chunksize=CHUNK),
-                      unit="rows"):
-        # normalise column names if needed
-        if "Species" not in chunk.columns:
-            if "SpeciesName" in chunk.columns:
-                chunk.rename(columns={"SpeciesName": "Species"}, inplace=True)
-            else:
-                raise RuntimeError("Input file missing 'Species' column")
-        if "# Codons" not in chunk.columns and "TotalCodons" in chunk.columns:
-            chunk.rename(columns={"TotalCodons": "# Codons"}, inplace=True)
-
-        # convert DNA columns to RNA and coerce blanks to 0
-        chunk.rename(columns=DNA2RNA, inplace=True)
-        chunk[CODONS_RNA] = chunk[CODONS_RNA].apply(pd.to_numeric, errors="coerce").fillna(0)
-
-        # aggregate this batch
-        batch_sum = chunk.groupby("Species", as_index=False).sum(numeric_only=True)
-        agg = batch_sum if agg is None else pd.concat([agg, batch_sum]).groupby("Species", as_index=False).sum()
+    tel = telemetry or Telemetry("cds_to_species_hardwired")
+    plan = column_plan(in_path)
+    spans = shard_ranges(in_path, workers)
+    with tel.stage(f"roll_up:{in_path.name}", nbytes=in_path.stat().st_size) as st, \
+            tqdm(unit="rows") as bar:
+        st.forward = bar.update
+        parts = run_shards(_roll_up_span, in_path, spans, workers, st, (plan, chunksize))
+        acc = SpeciesTotals(len(plan.sums))
+        for part in parts:
+            acc.merge(part)
+    agg = acc.frame(plan)
 
     # finished streaming – write output
-    out_path = in_path.with_name(in_path.name.replace("_cds", "_species"))
-    agg.to_csv(out_path, sep="\t", index=False)
+    out_path = out_path or in_path.with_name(in_path.name.replace("_cds", "_species"))
+    with tel.stage(f"write:{out_path.name}") as st:
+        with open_output(out_path, "w") as f:
+            agg.to_csv(f, sep="\t", index=False)
+        st(len(agg))
+    if telemetry is None:
+        tel.close()
     print(f"Written {len(agg):,} rows → {out_path.name}\n")
+    return agg
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Roll CUTG CDS tables up into per-species sums.")
+    ap.add_argument("inputs", nargs="*", type=Path,
+                    help="CDS tables (default: the two hard-wired CUTG tables)")
+    ap.add_argument("-o", "--output", type=Path,
+                    help="output path (one input only; default: *_cds → *_species "
+                         "next to the input)")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="processes, one byte-range shard each (default 1)")
+    ap.add_argument("--chunksize", type=int, default=CHUNK,
+                    help=f"rows per parsed batch (default {CHUNK:,})")
+    ap.add_argument("--telemetry", metavar="FILE",
+                    help="append JSON-lines timing/throughput/RSS records here "
+                         "(default: $CUTG_TELEMETRY)")
+    args = ap.parse_args()
+    if args.output and len(args.inputs) != 1:
+        ap.error("--output needs exactly one input table")
+
+    with Telemetry("cds_to_species_hardwired", args.telemetry) as tel:
+        for in_path in args.inputs or IN_FILES:
+            if not in_path.exists():
+                print(f"ERROR: {in_path} not found – skipping.")
+                continue
+            roll_up(in_path, args.output, args.workers, args.chunksize, tel)
+
+
+if __name__ == "__main__":
+    main()
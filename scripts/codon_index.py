@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+r"""
+codon_index.py – shared codon order, codon families and compiled orbit maps
+---------------------------------------------------------------------------
+One place for the definitions every script used to redefine by hand:
+
+    CODONS_RNA / CODON_ORDER   64 RNA codons, UCAG lexicographic (CUTG order)
+    CODONS_DNA                 the same in DNA spelling (TCAG)
+    DNA2RNA, RNA2DNA           column renaming maps
+    AA_FAMILIES                standard‑code synonymous families, RNA codons
+    SIXFOLD_SUBFAMILIES        the 4+2 split of Ser, Leu and Arg
+    STANDARD_ORBITS            {codon: orbit size}, identical to orbit_map.csv
+
+compile_orbit_map() turns any {codon: label} map into integer arrays –
+group id per codon, group sizes, a stable sort permutation and the group
+boundaries into it – cached per map, so analyses can do grouped reductions
+with array indexing instead of string‑keyed dicts inside row loops:
+
+    >>> idx = compile_orbit_map(family_map(AA_FAMILIES))
+    >>> cv = group_cv(codon_matrix(df), idx)      # (n_species, 21) CV per family
+
+Requires numpy
+"""
+
+from functools import lru_cache
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+
+CODONS_RNA = [a + b + c for a in "UCAG" for b in "UCAG" for c in "UCAG"]
+CODONS_DNA = [c.replace("U", "T") for c in CODONS_RNA]
+CODON_ORDER = CODONS_RNA
+DNA2RNA = dict(zip(CODONS_DNA, CODONS_RNA))
+RNA2DNA = dict(zip(CODONS_RNA, CODONS_DNA))
+
+# Standard genetic code, grouped by amino acid (Stop counted as a family)
+AA_FAMILIES = {
+    'Met': ['AUG'],
+    'Trp': ['UGG'],
+    'Phe': ['UUU', 'UUC'],
+    'Tyr': ['UAU', 'UAC'],
+    'Cys': ['UGU', 'UGC'],
+    'His': ['CAU', 'CAC'],
+    'Gln': ['CAA', 'CAG'],
+    'Asn': ['AAU', 'AAC'],
+    'Lys': ['AAA', 'AAG'],
+    'Asp': ['GAU', 'GAC'],
+    'Glu': ['GAA', 'GAG'],
+    'Stop': ['UAA', 'UAG', 'UGA'],
+    'Ile': ['AUU', 'AUC', 'AUA'],
+    'Val': ['GUU', 'GUC', 'GUA', 'GUG'],
+    'Pro': ['CCU', 'CCC', 'CCA', 'CCG'],
+    'Thr': ['ACU', 'ACC', 'ACA', 'ACG'],
+    'Ala': ['GCU', 'GCC', 'GCA', 'GCG'],
+    'Gly': ['GGU', 'GGC', 'GGA', 'GGG'],
+    'Ser': ['UCU', 'UCC', 'UCA', 'UCG', 'AGU', 'AGC'],
+    'Leu': ['UUA', 'UUG', 'CUU', 'CUC', 'CUA', 'CUG'],
+    'Arg': ['CGU', 'CGC', 'CGA', 'CGG', 'AGA', 'AGG'],
+}
+
+# 6‑fold families split into their 4‑codon box and 2‑codon satellite
+SIXFOLD_SUBFAMILIES = {
+    'Ser': {'UC': ['UCU', 'UCC', 'UCA', 'UCG'], 'AG': ['AGU', 'AGC']},
+    'Leu': {'UU': ['UUA', 'UUG'], 'CU': ['CUU', 'CUC', 'CUA', 'CUG']},
+    'Arg': {'CG': ['CGU', 'CGC', 'CGA', 'CGG'], 'AG': ['AGA', 'AGG']},
+}
+
+
+def family_map(families: Dict[str, List[str]]) -> Dict[str, str]:
+    """{family: [codons]} → {codon: family}."""
+    return {c: name for name, codons in families.items() for c in codons}
+
+
+def families_by_size(families: Dict[str, List[str]] = AA_FAMILIES) -> Dict[int, List[str]]:
+    """{orbit size: [family names]} in the order families are listed."""
+    out = {}
+    for name, codons in families.items():
+        out.setdefault(len(codons), []).append(name)
+    return dict(sorted(out.items()))
+
+
+STANDARD_ORBITS = {c: len(codons) for codons in AA_FAMILIES.values() for c in codons}
+
+
+def to_rna(codon: str) -> str:
+    return codon.upper().replace("T", "U")
+
+
+def to_dna(codon: str) -> str:
+    return codon.upper().replace("U", "T")
+
+# ---------------------------------------------------------------------------
+# compiled orbit maps
+# ---------------------------------------------------------------------------
+
+
+class OrbitIndex(NamedTuple):
+    """Integer form of a codon→orbit map, aligned with CODON_ORDER."""
+    group: np.ndarray    # (64,)   group id per codon, 0..k-1
+    size: np.ndarray     # (k,)    codons per group
+    degen: np.ndarray    # (64,)   RSCU multiplier per codon
+    onehot: np.ndarray   # (64, k) membership matrix for grouped sums
+    labels: np.ndarray   # (k,)    map label of each group
+    order: np.ndarray    # (64,)   codon columns sorted by group (stable)
+    bounds: np.ndarray   # (k+1,)  group g is order[bounds[g]:bounds[g+1]]
+
+
+@lru_cache(maxsize=64)
+def _compile(labels: tuple) -> OrbitIndex:
+    labels = np.array(labels)
+    keys, group = np.unique(labels, return_inverse=True)
+    size = np.bincount(group)
+    onehot = np.zeros((64, len(size)))
+    onehot[np.arange(64), group] = 1.0
+    # numeric labels double as the degeneracy (fc_checker's RSCU weights);
+    # named families are weighted by their size
+    degen = (labels.astype(float) if np.issubdtype(labels.dtype, np.number)
+             else size[group].astype(float))
+    order = np.argsort(group, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(size)])
+    idx = OrbitIndex(group, size, degen, onehot, keys, order, bounds)
+    for a in idx:
+        a.setflags(write=False)      # shared between callers via the cache
+    return idx
+
+
+def compile_orbit_map(orbit: Dict[str, object]) -> OrbitIndex:
+    """Compile a {codon: label} map (RNA or DNA spelling, all 64 codons) once."""
+    rna = {to_rna(c): v for c, v in orbit.items()}
+    missing = [c for c in CODONS_RNA if c not in rna]
+    if missing:
+        raise ValueError(f"orbit map lacks {len(missing)} codons, e.g. {missing[:3]}")
+    return _compile(tuple(rna[c] for c in CODONS_RNA))
+
+# ---------------------------------------------------------------------------
+# table columns and grouped reductions
+# ---------------------------------------------------------------------------
+
+
+def codon_positions(columns) -> List[int]:
+    """Column index of each codon in CODON_ORDER; last 64 columns if names are missing."""
+    pos = {}
+    for i, c in enumerate(columns):
+        name = to_rna(str(c).strip())
+        if name in DNA2RNA.values() and name not in pos:
+            pos[name] = i
+    if len(pos) == 64:
+        return [pos[c] for c in CODONS_RNA]
+    if len(columns) < 64:
+        raise ValueError(f"expected 64 codon columns, header has {len(columns)}")
+    return list(range(len(columns) - 64, len(columns)))
+
+
+def codon_matrix(df) -> np.ndarray:
+    """(n, 64) float counts in CODON_ORDER from a DataFrame with codon columns."""
+    x = df.iloc[:, codon_positions(df.columns)].to_numpy(dtype=float)
+    return np.nan_to_num(x, nan=0.0)
+
+
+def group_sums(x: np.ndarray, idx: OrbitIndex) -> np.ndarray:
+    """(n, k) per‑group row sums of an (n, 64) matrix."""
+    return np.add.reduceat(np.asarray(x)[:, idx.order], idx.bounds[:-1], axis=1)
+
+
+def group_cv(x: np.ndarray, idx: OrbitIndex) -> np.ndarray:
+    """(n, k) coefficient of variation (ddof=1) of the counts inside each group.
+
+    NaN for single‑codon groups and for groups a row never uses.
+    """
+    x = np.asarray(x, dtype=float)[:, idx.order]
+    mean = np.add.reduceat(x, idx.bounds[:-1], axis=1) / idx.size
+    dev = x - np.repeat(mean, idx.size, axis=1)
+    ss = np.add.reduceat(dev * dev, idx.bounds[:-1], axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sd = np.sqrt(ss / (idx.size - 1))
+        return np.where(mean > 0, sd / mean, np.nan)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+r"""
+cutg_cache.py – binary columnar cache of parsed CUTG count tables
+-----------------------------------------------------------------
+The first time a CUTG table is opened it is parsed once (pandas C engine, in
+chunks) into
+
+    <dir>/.cutg_cache/<file name>/
+        counts.u64   raw uint64 (n_rows × 64), codons in canonical TCAG order
+        meta.<i>.npy every non‑codon column (Taxid, Organelle, Species, #CDS …):
+                     numbers as they are, text as codes into meta.json
+        meta.json    the text columns' labels
+        stamp.json   source fingerprint, original column order, shape
+
+Later opens memory‑map counts.u64 and read the side table back from plain
+arrays, so repeat runs start in milliseconds instead of re‑parsing the TSV.
+Nothing is unpickled, so CUTG_CACHE_DIR may point at a shared location.
+
+The cache is rebuilt automatically when the source's size, mtime or content
+fingerprint (BLAKE2b of its first and last MiB) changes.  Set CUTG_CACHE_DIR
+to keep caches somewhere other than next to the data.
+
+    >>> df = load_frame("../CUTG/AGG/refseq_codon_species.tsv")   # ≈ pd.read_csv(..., sep="\t")
+    >>> tab = open_table("../CUTG/AGG/refseq_codon_species.tsv")
+    >>> tab.counts.shape, tab.meta.columns.tolist()
+    ((n, 64), ['Taxid', 'Organelle', '#CDS', '#Codons'])
+
+load_frame() also takes columns=, organelle= and taxids= to return only what
+a caller filters for, and serves .parquet aggregates (cutg_parquet.py)
+without a cache – Parquet is already columnar and typed.
+
+Compressed sources (.gz/.bz2/.xz/.zst, cutg_compress.py) are decompressed
+once, in a background thread, while the cache is built.
+
+Columns follow cutg_layout.sniff(): codons are matched by name (DNA or RNA
+spelling), a merged HIVE header is split and a trailing empty field dropped,
+and a table without codon names falls back to its last 64 columns.  A table
+whose columns would shift raises LayoutError before anything is cached.
+Blank or non‑numeric counts are stored as 0.
+
+    $ python cutg_cache.py TABLE [TABLE …] [--refresh]     # build / check caches
+
+Requires numpy pandas
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Callable, Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+from codon_index import CODONS_DNA, codon_positions  # noqa: F401 (re-exported)
+from cutg_compress import open_input
+from cutg_io import table_codes, translation_column
+from cutg_layout import sniff
+from cutg_parquet import is_parquet, read_table
+
+CHUNK = 200_000         # rows per parse block while building
+VERSION = 3             # bump when the on‑disk layout changes
+_SAMPLE = 1 << 20       # bytes hashed from each end of the source
+
+
+class CachedTable(NamedTuple):
+    meta: pd.DataFrame      # non‑codon columns, one row per table row
+    counts: np.ndarray      # (n, 64) uint64 memmap, CODONS_DNA order
+    columns: List[str]      # source header, in file order
+    codon_columns: List[str]  # source names of the 64 codon columns, CODONS_DNA order
+
+
+def fingerprint(path) -> dict:
+    """Size, mtime and a sampled BLAKE2b digest of *path*."""
+    st = os.stat(path)
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        h.update(f.read(_SAMPLE))
+        if st.st_size > 2 * _SAMPLE:
+            f.seek(-_SAMPLE, os.SEEK_END)
+            h.update(f.read())
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "blake2b": h.hexdigest()}
+
+
+def cache_dir(path) -> Path:
+    path = Path(path).resolve()
+    root = os.environ.get("CUTG_CACHE_DIR")
+    base = Path(root) / path.parent.relative_to(path.anchor) if root else path.parent / ".cutg_cache"
+    return base / path.name
+
+
+def read_stamp(where: Path):
+    """The stamp.json of a cache directory, or None if it is missing or unreadable."""
+    try:
+        with open(where / "stamp.json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_stamp(where: Path, stamp: dict) -> None:
+    with open(where / "stamp.json", "w") as f:
+        json.dump(stamp, f)
+
+
+def source_matches(stamp: dict, path) -> bool:
+    """True if *stamp* (a fingerprint()) still describes *path*; the sampled
+    digest is only recomputed when size and mtime agree."""
+    st = os.stat(path)
+    if (stamp["size"], stamp["mtime_ns"]) != (st.st_size, st.st_mtime_ns):
+        return False
+    return stamp["blake2b"] == fingerprint(path)["blake2b"]
+
+
+def is_current(where: Path, path, version: int) -> bool:
+    """True if cache directory *where* was built at *version* from *path* as it is now."""
+    stamp = read_stamp(where)
+    return bool(stamp) and stamp.get("version") == version and source_matches(stamp, path)
+
+
+def stage_dir(where: Path) -> Path:
+    """Empty scratch directory beside *where*; publish() it when complete."""
+    tmp = where.with_name(where.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    return tmp
+
+
+def publish(tmp: Path, where: Path, current: Callable[[], bool] = None) -> Path:
+    """Rename a finished stage_dir() over *where* – readers never see half a cache.
+
+    When another process publishes *where* first the rename fails; if
+    *current()* then finds its cache good, ours is dropped and that one used.
+    """
+    shutil.rmtree(where, ignore_errors=True)
+    try:
+        os.replace(tmp, where)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if current is None or not current():
+            raise
+    return where
+
+
+def _save_meta(where: Path, meta: pd.DataFrame) -> List[dict]:
+    """Write each column of *meta* as meta.<i>.npy; returns the stamp entries."""
+    cols, labels = [], {}
+    for i, name in enumerate(meta.columns):
+        col = meta[name]
+        if col.dtype.kind in "biuf":
+            arr, kind = col.to_numpy(), "values"
+        else:                                   # text: codes, -1 for missing
+            codes, uniq = pd.factorize(col)
+            arr, kind = codes.astype(np.int32), "codes"
+            labels[str(i)] = [str(u) for u in uniq]
+        np.save(where / f"meta.{i}.npy", arr, allow_pickle=False)
+        cols.append({"name": name, "kind": kind})
+    with open(where / "meta.json", "w") as f:
+        json.dump(labels, f)
+    return cols
+
+
+def _load_meta(where: Path, cols: List[dict]) -> pd.DataFrame:
+    with open(where / "meta.json") as f:
+        labels = json.load(f)
+    data = {}
+    for i, col in enumerate(cols):
+        arr = np.load(where / f"meta.{i}.npy", allow_pickle=False)
+        if col["kind"] == "codes":
+            # code -1 picks the NaN appended after the labels
+            arr = np.append(np.array(labels[str(i)], dtype=object), np.nan)[arr]
+        data[col["name"]] = arr
+    return pd.DataFrame(data, columns=[c["name"] for c in cols])
+
+
+def csr_gather(ptr: np.ndarray, ids) -> np.ndarray:
+    """Positions ptr[i] … ptr[i+1]‑1 of every i in *ids*, concatenated: the
+    members of CSR groups *ids*, without a Python loop."""
+    ids = np.asarray(ids, dtype=np.int64)
+    starts = np.asarray(ptr[ids])
+    lens = np.asarray(ptr[ids + 1]) - starts
+    return np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(lens.sum())
+
+
+def build(path, where: Path = None) -> Path:
+    """Parse *path* once into its cache directory and return that directory."""
+    path = Path(path)
+    where = where or cache_dir(path)
+    tmp = stage_dir(where)
+
+    stamp = fingerprint(path)
+    lay = sniff(path)
+    columns, cpos = lay.columns, lay.codon_cols
+    mpos = [i for i in range(len(columns)) if i not in set(cpos)]
+
+    n, metas = 0, []
+    with open(tmp / "counts.u64", "wb") as out, open_input(path) as src:
+        reader = pd.read_csv(src, sep="\t", header=None, skiprows=1, names=lay.names,
+                             usecols=range(len(columns)), engine="c", chunksize=CHUNK,
+                             on_bad_lines="skip", low_memory=False)
+        for chunk in reader:
+            counts = chunk.iloc[:, cpos]
+            if not all(pd.api.types.is_numeric_dtype(t) for t in counts.dtypes):
+                counts = counts.apply(pd.to_numeric, errors="coerce")
+            counts = counts.fillna(0).clip(lower=0).to_numpy(dtype=np.uint64)
+            out.write(np.ascontiguousarray(counts).tobytes())
+            metas.append(chunk.iloc[:, mpos])
+            n += len(chunk)
+    meta = (pd.concat(metas, ignore_index=True) if metas
+            else pd.DataFrame(columns=[columns[i] for i in mpos]))
+    meta_columns = _save_meta(tmp, meta)
+
+    stamp.update(version=VERSION, rows=n, columns=columns,
+                 codon_columns=[columns[i] for i in cpos], meta_columns=meta_columns)
+    write_stamp(tmp, stamp)
+    return publish(tmp, where, lambda: is_current(where, path, VERSION))
+
+
+def is_fresh(path, where: Path = None) -> bool:
+    """True if the cache for *path* exists and matches the source."""
+    return is_current(where or cache_dir(path), path, VERSION)
+
+
+def open_table(path, refresh: bool = False) -> CachedTable:
+    """Memory‑mapped counts plus side table for *path*, (re)building if stale."""
+    where = cache_dir(path)
+    if refresh or not is_fresh(path, where):
+        print(f"Caching {path} → {where}", file=sys.stderr)
+        build(path, where)
+    stamp = read_stamp(where)
+    rows = stamp["rows"]
+    counts = (np.memmap(where / "counts.u64", dtype=np.uint64, mode="r", shape=(rows, 64))
+              if rows else np.zeros((0, 64), dtype=np.uint64))
+    return CachedTable(_load_meta(where, stamp["meta_columns"]), counts,
+                       stamp["columns"], stamp["codon_columns"])
+
+
+def load_frame(path, refresh: bool = False, columns: List[str] = None,
+               organelle=None, taxids=None) -> pd.DataFrame:
+    """Drop‑in for pd.read_csv(path, sep="\t") served from the cache.
+
+    Columns keep the source names and order; codon counts are int64.
+    *columns*, *organelle* (one name or several) and *taxids* restrict the
+    result as cutg_parquet.read_table does; a .parquet table is read through
+    it directly, skipping the row groups and columns that are not needed.
+    """
+    if is_parquet(path):
+        return read_table(path, columns, organelle, taxids)
+    tab = open_table(path, refresh)
+    meta, counts = tab.meta, tab.counts
+    if organelle is not None or taxids is not None:
+        keep = np.ones(len(meta), dtype=bool)
+        if organelle is not None:
+            names = [organelle] if isinstance(organelle, str) else list(organelle)
+            keep &= meta["Organelle"].isin(names).to_numpy()
+        if taxids is not None:
+            wanted = {str(t) for t in ([taxids] if isinstance(taxids, (str, int)) else taxids)}
+            keep &= meta["Taxid"].astype(str).isin(wanted).to_numpy()
+        rows = np.flatnonzero(keep)
+        meta, counts = meta.iloc[rows].reset_index(drop=True), counts[rows]
+    columns = list(columns) if columns is not None else tab.columns
+    cpos = [i for i, c in enumerate(tab.codon_columns) if c in set(columns)]
+    if len(cpos) < counts.shape[1]:
+        counts = counts[:, cpos]
+    counts = pd.DataFrame(np.asarray(counts).view(np.int64),
+                          columns=[tab.codon_columns[i] for i in cpos],
+                          index=meta.index, copy=False)
+    df = pd.concat([meta[[c for c in meta.columns if c in set(columns)]], counts], axis=1)
+    return df[columns]
+
+
+def iter_blocks(path, chunksize: int = CHUNK, codes: bool = False) -> Iterator[Tuple]:
+    """(names, float counts[, codes]) blocks from the cache, shaped like cutg_io.iter_cutg.
+
+    Names come from the table's first column.
+    """
+    tab = open_table(path)
+    first = tab.columns[0]
+    names = (tab.meta[first].to_numpy() if first in tab.meta.columns
+             else np.arange(len(tab.counts)))
+    if codes:
+        tt = translation_column(tab.meta.columns)
+        ids = (table_codes(tab.meta.iloc[:, tt]) if tt is not None
+               else np.zeros(len(tab.counts), dtype=int))
+    for lo in range(0, len(tab.counts), chunksize):
+        block = (names[lo:lo + chunksize], tab.counts[lo:lo + chunksize].astype(float))
+        yield block + (ids[lo:lo + chunksize],) if codes else block
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build or refresh CUTG table caches.")
+    ap.add_argument("tables", nargs="+")
+    ap.add_argument("--refresh", action="store_true", help="rebuild even if fresh")
+    args = ap.parse_args()
+    for t in args.tables:
+        fresh = is_fresh(t) and not args.refresh
+        tab = open_table(t, refresh=args.refresh)
+        state = "fresh" if fresh else "built"
+        print(f"{t}: {len(tab.counts):,} rows, {state} → {cache_dir(t)}")
+
+
+if __name__ == "__main__":
+    main()
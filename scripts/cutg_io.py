@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+r"""
+cutg_io.py – streaming readers for CUTG codon tables
+----------------------------------------------------
+`fc_checker.read_cutg` loads a whole table through the python parser and
+keeps every column.  iter_cutg() reads the same columns – the first (species)
+and the 64 codon counts – with pandas' C parser in fixed‑size chunks,
+so a multi‑GB dump streams through in bounded memory (.gz/.bz2/.xz/.zst
+tables are decompressed on the fly, cutg_compress.py):
+
+    >>> for species, counts in iter_cutg("genbank_species.tsv", 100_000):
+    ...     ratios = fc_ratios(counts, idx)     # counts: (n, 64) float
+
+The count columns are found by name, in whatever order and spelling the
+table uses, by cutg_layout.sniff() – as read_cutg does – and are returned in
+CODON_ORDER; a table without codon names falls back to its last 64 columns.
+A layout that would shift columns raises LayoutError before any row is
+parsed.  Blank or non‑numeric cells count as 0; lines with too many fields
+are skipped.
+
+With codes=True each block also carries the rows' NCBI "Translation Table"
+ids (0 where the column is missing or blank), for fc_ratios_by_code():
+
+    >>> for species, counts, codes in iter_cutg(path, codes=True):
+    ...     ratios = fc_ratios_by_code(counts, codes, table_indexes(), idx)
+
+Requires numpy pandas
+"""
+
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cutg_compress import open_input
+from cutg_layout import sniff
+
+CHUNK = 100_000     # rows per block
+
+
+def cutg_columns(path) -> List[str]:
+    """Header fields of a CUTG TSV, read from the first line only."""
+    with open_input(path, "rt") as f:
+        return f.readline().rstrip("\r\n").split("\t")
+
+
+def translation_column(columns) -> Optional[int]:
+    """Index of the "Translation Table" column, or None."""
+    for i, c in enumerate(columns):
+        if str(c).strip().lower().replace("_", " ") == "translation table":
+            return i
+    return None
+
+
+def table_codes(values) -> np.ndarray:
+    """Translation Table cells → int ids; blanks and junk become 0."""
+    return pd.to_numeric(pd.Series(values), errors="coerce").fillna(0).to_numpy(dtype=int)
+
+
+def iter_cutg(path, chunksize: int = CHUNK, codes: bool = False) -> Iterator[Tuple]:
+    """Yield (species, counts[, codes]) blocks of at most *chunksize* rows."""
+    lay = sniff(path)
+    columns = lay.columns
+    if len(columns) < 65:
+        raise ValueError(f"{path}: expected a name column plus 64 codon columns, "
+                         f"header has {len(columns)}")
+    usecols = [0, *lay.codon_cols]
+    tt = translation_column(columns) if codes else None
+    if tt is not None and tt not in usecols:
+        usecols.append(tt)
+    with open_input(path) as f:
+        reader = pd.read_csv(f, sep="\t", header=None, skiprows=1, names=lay.names,
+                             usecols=usecols, engine="c", on_bad_lines="skip",
+                             chunksize=chunksize)
+        for chunk in reader:
+            counts = chunk[lay.codon_names]
+            if not all(pd.api.types.is_numeric_dtype(t) for t in counts.dtypes):
+                counts = counts.apply(pd.to_numeric, errors="coerce")
+            block = (chunk.iloc[:, 0].to_numpy(), counts.fillna(0).to_numpy(dtype=float))
+            if codes:
+                ids = (table_codes(chunk[columns[tt]]) if tt is not None
+                       else np.zeros(len(chunk), dtype=int))
+                block += (ids,)
+            yield block
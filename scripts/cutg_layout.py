@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+r"""
+cutg_layout.py – sniff the column layout of a CUTG table before loading it
+--------------------------------------------------------------------------
+The HIVE dumps carry a malformed header (some adjacent codon names run
+together, "TTATTG") and an empty field at the end of every row; CDS and
+species tables list their codons in CUTG's own order, aggregate tables in
+UCAG order with #CDS/#Codons after them; names are spelled in DNA or RNA.
+A loader that trusts positions – "the last 64 columns are the codons" –
+reads shifted or mislabelled counts without complaint.
+
+sniff() reads only the header and at most SNIFF_LINES rows from the first
+SNIFF_BYTES of a table and returns its Layout, the column plan every loader
+in this folder follows:
+
+    >>> lay = sniff("CDS/refseq_cds.tsv")
+    >>> lay.describe()
+    'merged header (3 names split), trailing empty field, DNA codon names'
+    >>> pd.read_csv(path, sep="\t", skiprows=1, header=None, names=lay.names,
+    ...             usecols=[0, *lay.codon_cols])
+
+    columns     the repaired header, one name per real field
+    names       columns plus a placeholder (EXTRA) for a trailing field
+    codon_cols  field index of each codon in CODON_ORDER, found by name
+                whatever order and spelling the file uses
+
+A table whose rows do not have as many fields as its (repaired) header,
+whose codon names are incomplete or repeated, or whose sampled codon cells
+are not counts raises LayoutError in milliseconds instead of yielding
+garbage after a full load.  The field count is the one most sampled rows
+share: a few ragged or truncated rows are left for the loaders to skip
+(on_bad_lines="skip"), and only a sample without a clear majority fails.
+A table with no codon names at all falls back to its last 64 columns, as
+the loaders always did.
+
+    $ python cutg_layout.py TABLE [TABLE …]     # print each layout; exit 1 if any is bad
+
+Requires nothing outside the standard library
+"""
+
+import argparse
+import re
+import sys
+from collections import Counter
+from typing import List, NamedTuple, Optional, Tuple
+
+from codon_index import CODONS_RNA, to_rna
+from cutg_compress import open_input
+
+SNIFF_BYTES = 1 << 16   # bytes read from the start of the table
+SNIFF_LINES = 200       # rows checked, at most
+EXTRA = "__extra__"     # name given to a trailing empty field
+
+_MERGED = re.compile(r"(?:[ACGTU]{3}){2,}")     # codon names run together
+_CODON = re.compile(r"[ACGTU]{3}")
+_COUNT = re.compile(r"\d+(?:\.0*)?")
+
+
+class LayoutError(ValueError):
+    """The table cannot be read safely: its columns would come out shifted."""
+
+
+class Layout(NamedTuple):
+    """Column plan of one table."""
+    columns: List[str]          # repaired header, one name per real field
+    fields: int                 # fields per row
+    merged: int                 # header names that were split apart
+    trailing: bool              # rows end in one extra empty field
+    spelling: Optional[str]     # "DNA", "RNA", or None (no codon names)
+    codon_cols: List[int]       # field of each codon, CODON_ORDER
+
+    @property
+    def names(self) -> List[str]:
+        """One name per row field – pass as read_csv(names=…, header=None, skiprows=1)."""
+        return self.columns + [EXTRA] * (self.fields - len(self.columns))
+
+    @property
+    def codon_names(self) -> List[str]:
+        """Column names of the codons, in CODON_ORDER."""
+        return [self.columns[i] for i in self.codon_cols]
+
+    def describe(self) -> str:
+        parts = [f"merged header ({self.merged} names split)" if self.merged
+                 else "clean header"]
+        if self.trailing:
+            parts.append("trailing empty field")
+        parts.append(f"{self.spelling} codon names" if self.spelling
+                     else "no codon names (last 64 columns)")
+        return ", ".join(parts)
+
+
+def _split_merged(header: List[str]) -> Tuple[List[str], int]:
+    """Split run‑together codon names; make repeated names unique as pandas does."""
+    columns, merged = [], 0
+    for name in header:
+        name = name.strip()
+        if _MERGED.fullmatch(name.upper()):
+            columns += [name[i:i + 3] for i in range(0, len(name), 3)]
+            merged += 1
+        else:
+            columns.append(name)
+    seen = {}
+    for i, name in enumerate(columns):
+        k = seen.get(name, 0)
+        seen[name] = k + 1
+        if k:
+            columns[i] = f"{name}.{k}"
+    return columns, merged
+
+
+def _codon_plan(path, columns: List[str]) -> Tuple[List[int], Optional[str]]:
+    pos, spellings = {}, set()
+    for i, name in enumerate(columns):
+        name = name.upper()
+        if not _CODON.fullmatch(name):
+            continue
+        rna = to_rna(name)
+        if rna in pos:
+            raise LayoutError(f"{path}: codon {name} appears twice "
+                              f"(fields {pos[rna] + 1} and {i + 1})")
+        pos[rna] = i
+        if "T" in name or "U" in name:
+            spellings.add("RNA" if "U" in name else "DNA")
+    if not pos:
+        if len(columns) < 64:
+            raise LayoutError(f"{path}: no codon names and only {len(columns)} columns")
+        return list(range(len(columns) - 64, len(columns))), None
+    if len(pos) < 64:
+        missing = [c for c in CODONS_RNA if c not in pos]
+        raise LayoutError(f"{path}: {len(missing)} codon column(s) missing from the "
+                          f"header, e.g. {', '.join(missing[:3])}")
+    if len(spellings) > 1:
+        raise LayoutError(f"{path}: codon names mix DNA and RNA spelling")
+    return [pos[c] for c in CODONS_RNA], spellings.pop() if spellings else "DNA"
+
+
+def _sample(path) -> Tuple[str, List[str]]:
+    """Header line and up to SNIFF_LINES complete rows from the first SNIFF_BYTES."""
+    with open_input(path, "rb") as f:
+        head = f.read(SNIFF_BYTES + 1)
+    lines = head[:SNIFF_BYTES].split(b"\n")
+    if len(head) > SNIFF_BYTES:
+        lines.pop()                         # cut mid‑line
+        if not lines:
+            raise LayoutError(f"{path}: header line longer than {SNIFF_BYTES:,} bytes")
+    lines = [ln.rstrip(b"\r").decode("utf-8", "replace") for ln in lines]
+    return lines[0], [ln for ln in lines[1:SNIFF_LINES + 1] if ln]
+
+
+def sniff(path) -> Layout:
+    """Layout of *path* from its first few KB; LayoutError if it is not safe to read."""
+    header, rows = _sample(path)
+    columns, merged = _split_merged(header.split("\t"))
+    cells = [row.split("\t") for row in rows]
+
+    counts = Counter(len(r) for r in cells)
+    fields, common = counts.most_common(1)[0] if counts else (len(columns), 0)
+    if cells and 2 * common <= len(cells):
+        raise LayoutError(f"{path}: no field count is shared by most sampled rows "
+                          f"{dict(sorted(counts.items()))}")
+    # the odd rows are left to the loaders; only the majority is checked
+    cells = [(k, r) for k, r in enumerate(cells, start=2) if len(r) == fields]
+    trailing = fields == len(columns) + 1 and all(r[-1].strip() == "" for _, r in cells)
+    if fields != len(columns) and not trailing:
+        split = f" ({merged} merged names split)" if merged else ""
+        raise LayoutError(f"{path}: header has {len(columns)} names{split} but rows "
+                          f"have {fields} fields – columns would shift")
+
+    codon_cols, spelling = _codon_plan(path, columns)
+    for k, r in cells:
+        for i in codon_cols:
+            v = r[i].strip().strip('"')
+            if v and not _COUNT.fullmatch(v):
+                raise LayoutError(f"{path}: line {k}, codon column {columns[i]} holds "
+                                  f"{v!r} – columns look shifted")
+    return Layout(columns, fields, merged, trailing, spelling, codon_cols)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Check the column layout of CUTG tables.")
+    ap.add_argument("tables", nargs="+")
+    args = ap.parse_args()
+    bad = 0
+    for path in args.tables:
+        try:
+            print(f"{path}: {sniff(path).describe()}")
+        except (LayoutError, OSError) as e:
+            print(f"✗ {e}", file=sys.stderr)
+            bad += 1
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
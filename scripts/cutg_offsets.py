@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+r"""
+cutg_offsets.py – byte‑offset (Taxid, Organelle) index for random row access
+----------------------------------------------------------------------------
+Pulling a few dozen rows out of genbank_codon_species.tsv should not mean
+parsing all of it.  One pass over a plain TSV records where every row starts
+and how long it is, grouped by its (Taxid, Organelle) key:
+
+    <dir>/.cutg_cache/<file name>.offsets/
+        key_taxid.npy           distinct (Taxid, Organelle) keys sorted by Taxid,
+        key_org.npy             as Taxid text and organelle code
+        ptr.npy, rows.npy       key → its row numbers (file order)
+        start.npy, length.npy   byte offset and length of every row
+        ncds.npy, ncodons.npy   #CDS / #Codons of every row, when the table has them
+        stamp.json              source fingerprint, header, organelle labels
+
+Later reads look the wanted keys up by binary search, seek to their rows
+(nearby rows are fetched in one read, see COALESCE) and parse only those
+lines, so a small extraction costs I/O in proportion to the subset:
+
+    >>> df = load_rows("AGG/genbank_codon_species.tsv", taxids={"5911", "5888"},
+    ...                organelle="mitochondrion")       # ≈ load_frame(…, taxids=…)
+    >>> idx = OffsetIndex.open("AGG/genbank_codon_species.tsv")
+    >>> idx.read(idx.top("#Codons", 10))                 # ten rows, ten seeks
+
+Rows come back as load_frame() returns them: source columns in file order,
+codon counts as int64 with blanks and junk as 0.  The index is rebuilt when
+the source's fingerprint changes (cutg_cache.fingerprint; CUTG_CACHE_DIR is
+honoured).  Compressed and Parquet tables cannot be seeked into; load_rows()
+serves them through load_frame() instead.
+
+    $ python cutg_offsets.py AGG/genbank_codon_species.tsv --taxid 5911 --taxid 5888
+
+Requires numpy pandas
+"""
+
+import argparse
+import io
+import sys
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from cutg_cache import (cache_dir, csr_gather, fingerprint, is_current, load_frame,
+                        publish, read_stamp, stage_dir, write_stamp)
+from cutg_compress import is_compressed
+from cutg_layout import sniff
+from cutg_parquet import as_list, is_parquet
+
+VERSION = 1
+CHUNK = 100_000         # lines per block while indexing
+COALESCE = 1 << 16      # rows closer than this many bytes are fetched in one read
+TOTALS = {"#CDS": "ncds", "#Codons": "ncodons"}     # per‑row columns kept in the index
+
+
+def offsets_dir(path) -> Path:
+    where = cache_dir(path)
+    return where.with_name(where.name + ".offsets")
+
+
+def _seekable(path) -> bool:
+    return not (is_parquet(path) or is_compressed(path))
+
+
+def field(line: bytes, i: int) -> str:
+    """Field *i* of a raw TSV line, unquoted and stripped ("" if the line is short)."""
+    parts = line.split(b"\t", i + 1)
+    return parts[i].strip().strip(b'"').decode() if i < len(parts) else ""
+
+
+def build(path, where: Path = None) -> Path:
+    """Record the offset, length and key of every row of *path* once."""
+    if not _seekable(path):
+        raise ValueError(f"{path}: compressed or Parquet tables cannot be indexed by offset")
+    where = where or offsets_dir(path)
+    tmp = stage_dir(where)
+
+    stamp = fingerprint(path)
+    lay = sniff(path)
+    columns = lay.columns
+    if "Taxid" not in columns:
+        raise ValueError(f"{path}: no Taxid column to index")
+    tcol = columns.index("Taxid")
+    ocol = columns.index("Organelle") if "Organelle" in columns else None
+    totals = {c: columns.index(c) for c in TOTALS if c in columns}
+
+    starts, lengths, taxid, org = [], [], [], []
+    values = {c: [] for c in totals}
+    with open(path, "rb") as f:
+        pos = len(f.readline())
+        while True:
+            lines = list(islice(f, CHUNK))
+            if not lines:
+                break
+            lens = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines))
+            at = pos + np.cumsum(lens) - lens
+            pos += int(lens.sum())
+            keep = [i for i, ln in enumerate(lines) if ln.strip()]    # as pandas skips blanks
+            lines = [lines[i] for i in keep]
+            starts.append(at[keep])
+            lengths.append(lens[keep])
+            taxid += [field(ln, tcol) for ln in lines]
+            org += [field(ln, ocol) for ln in lines] if ocol is not None else [""] * len(lines)
+            for c, i in totals.items():
+                values[c].append(pd.to_numeric(pd.Series([field(ln, i) for ln in lines]),
+                                               errors="coerce").fillna(0).to_numpy(np.int64))
+    starts = np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64)
+    lengths = np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int64)
+
+    # distinct keys sorted by (Taxid, Organelle); inverse maps each row to its key
+    org_codes, org_labels = pd.factorize(pd.Series(org, dtype=object))
+    taxid = np.array(taxid, dtype=str)
+    tax_codes = np.unique(taxid, return_inverse=True)[1]
+    pair = tax_codes.astype(np.int64) * (len(org_labels) + 1) + org_codes
+    uniq, first, inverse = np.unique(pair, return_index=True, return_inverse=True)
+    ptr = np.zeros(len(uniq) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(inverse, minlength=len(uniq)), out=ptr[1:])
+    arrays = {"key_taxid": taxid[first], "key_org": org_codes[first].astype(np.int16),
+              "ptr": ptr, "rows": np.argsort(inverse, kind="stable").astype(np.int64),
+              "start": starts, "length": lengths.astype(np.int32)}
+    for c, name in TOTALS.items():
+        if c in totals:
+            arrays[name] = (np.concatenate(values[c]) if values[c]
+                            else np.zeros(0, dtype=np.int64))
+    for name, arr in arrays.items():
+        np.save(tmp / f"{name}.npy", arr)
+
+    stamp.update(version=VERSION, rows=len(starts), keys=len(uniq), columns=columns,
+                 names=lay.names, codon_cols=lay.codon_cols,
+                 organelles=[str(o) for o in org_labels],
+                 totals=[c for c in TOTALS if c in totals])
+    write_stamp(tmp, stamp)
+    return publish(tmp, where, lambda: is_current(where, path, VERSION))
+
+
+def is_fresh(path, where: Path = None) -> bool:
+    return is_current(where or offsets_dir(path), path, VERSION)
+
+
+class OffsetIndex:
+    """Memory‑mapped row offsets of one plain TSV table."""
+
+    def __init__(self, path, where: Path):
+        stamp = read_stamp(where)
+        load = lambda name: np.load(where / f"{name}.npy", mmap_mode="r")  # noqa: E731
+        self.path = Path(path)
+        self.key_taxid, self.key_org = load("key_taxid"), load("key_org")
+        self.ptr, self.rows_by_key = load("ptr"), load("rows")
+        self.start, self.length = load("start"), load("length")
+        self.totals = {c: load(TOTALS[c]) for c in stamp["totals"]}
+        self.columns: List[str] = stamp["columns"]
+        self.names: List[str] = stamp["names"]
+        self.codons = [self.columns[i] for i in stamp["codon_cols"]]
+        self.organelles: List[str] = stamp["organelles"]
+
+    @classmethod
+    def open(cls, path, refresh: bool = False) -> "OffsetIndex":
+        """Open the offset index of *path*, building it first if missing or stale."""
+        where = offsets_dir(path)
+        if refresh or not is_fresh(path, where):
+            print(f"Indexing {path} → {where}", file=sys.stderr)
+            build(path, where)
+        return cls(path, where)
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def taxids(self) -> np.ndarray:
+        """Distinct Taxids of the table, as text, sorted."""
+        t = np.asarray(self.key_taxid)
+        return t[np.r_[True, t[1:] != t[:-1]]] if len(t) else t
+
+    def rows(self, taxids: Optional[Iterable] = None,
+             organelle=None) -> np.ndarray:
+        """Row numbers (file order) of the wanted Taxids and/or organelle(s)."""
+        if taxids is None:
+            keys = np.arange(len(self.key_taxid))
+        else:
+            wanted = np.unique(np.array([str(t) for t in as_list(taxids)], dtype=str))
+            lo = np.searchsorted(self.key_taxid, wanted, side="left")
+            hi = np.searchsorted(self.key_taxid, wanted, side="right")
+            keys = np.concatenate([np.arange(a, b) for a, b in zip(lo, hi)] or
+                                  [np.zeros(0, dtype=np.int64)])
+        if organelle is not None:
+            codes = [i for i, o in enumerate(self.organelles) if o in set(as_list(organelle))]
+            keys = keys[np.isin(np.asarray(self.key_org)[keys], codes)]
+        pos = csr_gather(self.ptr, keys)
+        return np.sort(np.asarray(self.rows_by_key[pos], dtype=np.int64))
+
+    def top(self, column: str, n: int = 10) -> np.ndarray:
+        """Rows with the *n* largest values of an indexed total (#CDS, #Codons),
+        ordered as DataFrame.nlargest orders them."""
+        if column not in self.totals:
+            raise KeyError(f"{self.path}: {column} is not kept in the offset index")
+        return pd.Series(np.asarray(self.totals[column])).nlargest(n).index.to_numpy()
+
+    def lines(self, rows) -> bytes:
+        """Raw lines of *rows* (in the order given), fetching nearby rows in one read."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return b""
+        order = np.argsort(rows, kind="stable")
+        s = np.asarray(self.start[rows[order]])
+        e = s + np.asarray(self.length[rows[order]])
+        cut = np.flatnonzero(s[1:] - e[:-1] > COALESCE) + 1
+        out = [b""] * len(rows)
+        with open(self.path, "rb") as f:
+            for run in np.split(np.arange(len(rows)), cut):
+                lo, hi = int(s[run[0]]), int(e[run].max())
+                f.seek(lo)
+                buf = f.read(hi - lo)
+                for j in run:
+                    line = buf[s[j] - lo:e[j] - lo]
+                    out[order[j]] = line if line.endswith(b"\n") else line + b"\n"
+        return b"".join(out)
+
+    def read(self, rows, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Parse only *rows* – a frame like load_frame()'s, indexed by row number."""
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = list(columns) if columns is not None else self.columns
+        df = pd.read_csv(io.BytesIO(self.lines(rows)), sep="\t", header=None,
+                         names=self.names, usecols=range(len(self.columns)), engine="c",
+                         on_bad_lines="skip", low_memory=False)
+        codons = [c for c in self.codons if c in set(columns)]
+        counts = df[codons]
+        if not all(pd.api.types.is_numeric_dtype(t) for t in counts.dtypes):
+            counts = counts.apply(pd.to_numeric, errors="coerce")
+        counts = np.maximum(counts.fillna(0).to_numpy(), 0).astype(np.int64)
+        df = pd.concat([df.drop(columns=self.codons),
+                        pd.DataFrame(counts, columns=codons, index=df.index)], axis=1)
+        if len(df) == len(rows):            # (unless malformed lines were skipped)
+            df.index = rows
+        return df[columns]
+
+
+def load_rows(path, taxids: Optional[Iterable] = None, organelle=None,
+              columns: Optional[List[str]] = None, refresh: bool = False) -> pd.DataFrame:
+    """load_frame(path, columns=…, organelle=…, taxids=…) reading only the
+    matching rows of a plain TSV; other tables go through load_frame()."""
+    if not _seekable(path):
+        return load_frame(path, refresh, columns, organelle, taxids)
+    idx = OffsetIndex.open(path, refresh)
+    return idx.read(idx.rows(taxids, organelle), columns).reset_index(drop=True)
+
+
+def table_taxids(path) -> np.ndarray:
+    """Distinct Taxids of a table as text – from the offset index where possible."""
+    if _seekable(path):
+        return OffsetIndex.open(path).taxids()
+    return np.unique(load_frame(path, columns=["Taxid"])["Taxid"].astype(str).to_numpy())
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build / query the byte-offset (Taxid, Organelle) "
+                                             "index of a CUTG table.")
+    ap.add_argument("table", type=Path)
+    ap.add_argument("--taxid", action="append", help="rows of this Taxid (repeatable)")
+    ap.add_argument("--organelle", action="append", help="rows of this organelle (repeatable)")
+    ap.add_argument("--top", metavar="COLUMN", help="largest rows by an indexed total, e.g. #Codons")
+    ap.add_argument("-n", type=int, default=10, help="rows to show [10]")
+    ap.add_argument("--refresh", action="store_true", help="rebuild even if fresh")
+    args = ap.parse_args()
+
+    idx = OffsetIndex.open(args.table, args.refresh)
+    print(f"{args.table}: {len(idx):,} rows, {len(idx.key_taxid):,} (Taxid, Organelle) keys "
+          f"→ {offsets_dir(args.table)}")
+    if args.top:
+        rows = idx.top(args.top, args.n)
+    elif args.taxid or args.organelle:
+        rows = idx.rows(args.taxid, args.organelle)
+    else:
+        return
+    key = [c for c in ("Taxid", "Organelle", "#CDS", "#Codons") if c in idx.columns]
+    print(f"{len(rows):,} rows")
+    print(idx.read(rows[:args.n], key).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+r"""
+cutg_parquet.py – columnar (Parquet) aggregate tables
+-----------------------------------------------------
+An alternative on‑disk form for the (Taxid, Organelle) aggregates written by
+agg_codon_by_taxid.py.  Instead of 68 text columns the Parquet file holds
+
+    Taxid       int64 (string if any Taxid is not a plain integer)
+    Organelle   dictionary‑encoded string
+    64 codons   int64, CODONS_DNA order, then #CDS and #Codons
+
+with rows sorted by (Organelle, Taxid) and cut into row groups of ROW_GROUP
+rows, each carrying min/max statistics.  A reader that asks for one
+organelle, or a set of Taxids, skips every row group whose range cannot
+match, and reads only the columns it names:
+
+    >>> df = read_table("AGG/refseq_codon_species.parquet",
+    ...                 columns=["Taxid", "#CDS", "#Codons"],
+    ...                 organelle="mitochondrion")
+
+cutg_cache.load_frame() accepts the same columns/organelle/taxids arguments
+for both formats, so callers need not care which one they were given.
+
+    $ python cutg_parquet.py AGG/refseq_codon_species.tsv    # → .parquet next to it
+
+Requires numpy pandas pyarrow (pyarrow only when a .parquet table is used)
+"""
+
+import argparse
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from codon_index import CODONS_DNA
+
+ROW_GROUP = 16_384      # rows per Parquet row group
+SUFFIXES = (".parquet", ".pq")
+
+
+def arrow_modules():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet tables need the pyarrow package "
+                          "(pip install pyarrow)") from None
+    return pa, pq
+
+
+def is_parquet(path) -> bool:
+    return Path(path).suffix.lower() in SUFFIXES
+
+
+def agg_frame(keys, sums: np.ndarray, ncds: np.ndarray) -> pd.DataFrame:
+    """(Taxid, Organelle) keys and their sums as the aggregate table's columns."""
+    keys = list(keys)
+    df = pd.DataFrame(np.asarray(sums, dtype=np.int64).reshape(len(keys), 64),
+                      columns=list(CODONS_DNA))
+    df.insert(0, "Taxid", [k[0] for k in keys])
+    df.insert(1, "Organelle", [k[1] for k in keys])
+    df["#CDS"] = np.asarray(ncds, dtype=np.int64)
+    df["#Codons"] = df[list(CODONS_DNA)].sum(axis=1)
+    return df
+
+
+def _typed_taxid(taxid: pd.Series) -> pd.Series:
+    """int64 when every Taxid is a plain integer (so its statistics order
+    numerically), else str."""
+    text = taxid.astype(str)
+    if len(text) and text.str.fullmatch(r"[1-9]\d{0,17}|0").all():
+        return text.astype(np.int64)
+    return text
+
+
+def write_table(df: pd.DataFrame, out_path: Path, row_group_size: int = ROW_GROUP) -> None:
+    """Write an aggregate table as Parquet, sorted by (Organelle, Taxid)."""
+    pa, pq = arrow_modules()
+    df = df.assign(Taxid=_typed_taxid(df["Taxid"]),
+                   Organelle=df["Organelle"].fillna("").astype(str))
+    df = df.sort_values(["Organelle", "Taxid"], kind="stable", ignore_index=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    i = table.schema.get_field_index("Organelle")
+    table = table.set_column(i, "Organelle", table.column(i).dictionary_encode())
+
+    out_path = Path(out_path)
+    tmp = out_path.with_name(out_path.name + f".tmp{os.getpid()}")
+    pq.write_table(table, tmp, row_group_size=row_group_size, compression="zstd",
+                   write_statistics=True)
+    os.replace(tmp, out_path)
+
+
+def as_list(values) -> Optional[list]:
+    """None, one value or several values as None or a list."""
+    if values is None:
+        return None
+    return [values] if isinstance(values, (str, int)) else list(values)
+
+
+def read_table(path, columns: Optional[List[str]] = None,
+               organelle: Union[str, Iterable[str], None] = None,
+               taxids: Optional[Iterable] = None) -> pd.DataFrame:
+    """Rows of a Parquet aggregate, optionally only one organelle (or several)
+    and/or a set of Taxids, with only *columns* read.
+
+    Row groups whose min/max statistics rule the filter out are never read.
+    """
+    pa, pq = arrow_modules()
+    filters = []
+    organelle, taxids = as_list(organelle), as_list(taxids)
+    if organelle is not None:
+        filters.append(("Organelle", "in", [str(o) for o in organelle]))
+    if taxids is not None:
+        if pa.types.is_integer(pq.read_schema(path).field("Taxid").type):
+            taxids = [int(t) for t in map(str, taxids) if t.isdigit()]
+        else:
+            taxids = [str(t) for t in taxids]
+        filters.append(("Taxid", "in", taxids))
+    table = pq.read_table(path, columns=columns, filters=filters or None)
+    df = table.to_pandas()
+    if "Organelle" in df.columns:
+        df["Organelle"] = df["Organelle"].astype(object)
+    return df
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert aggregate TSV tables to Parquet.")
+    ap.add_argument("tables", nargs="+", type=Path, help="*_codon_species.tsv tables")
+    ap.add_argument("--row-group", type=int, default=ROW_GROUP,
+                    help=f"rows per row group [{ROW_GROUP:,}]")
+    args = ap.parse_args()
+    from cutg_cache import load_frame
+    for path in args.tables:
+        out = path.with_name(path.name.split(".")[0] + ".parquet")
+        df = load_frame(path)
+        write_table(df, out, args.row_group)
+        print(f"✓ {path} → {out} ({len(df):,} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+r"""
+cutg_pipeline.py – one pass from a CUTG HIVE dump to the analysis tables
+------------------------------------------------------------------------
+Replaces the four full scans
+
+    fix_hive_header.py → agg_codon_by_taxid.py → cds_to_species_hardwired.py
+                       → extract_ciliates.py
+
+with a single read of the raw dump.  The broken header is ignored (rows are
+parsed under FIXED_HEADER, the stray trailing field skipped) and every block
+of rows feeds, at once,
+
+    <out>/<tag>_codon_species.tsv           (Taxid, Organelle) sums, as
+                                            agg_codon_by_taxid.py writes them
+    <out>/<tag>_species.tsv                 per‑species sums, as
+                                            cds_to_species_hardwired.py
+    <out>/<tag>_<clade>_codon_species.tsv   the (Taxid, Organelle) rows of each
+                                            --clade or --genera, with
+                                            Species_Name added
+                                            (cf. extract_ciliates.py)
+
+The header‑repaired CDS table is an intermediate only written on request
+(--fixed PATH).  Outputs are identical to running the separate scripts.
+
+    $ python cutg_pipeline.py CDS/refseq_cds.tsv --out AGG --tag refseq
+    $ python cutg_pipeline.py CDS/genbank_cds.tsv --out AGG --tag genbank \
+          --clade Ciliophora --taxonomy taxdump --genera plasmodium=Plasmodium --workers 8
+
+As in extract_ciliates.py, --clade is an NCBI taxon (name or Taxid): every
+row whose Taxid lies under it in the taxonomy dump (--taxonomy DIR or
+$NCBI_TAXONOMY, see ncbi_taxonomy.py).  --genera NAME=Genus1,Genus2,… takes
+the rows whose species names contain any of the genera (case‑insensitive, as
+extract_ciliates.py matches without --clade); "--genera ciliates" uses
+extract_ciliates.CILIATE_GENERA.  Both are repeatable.  --workers splits the
+dump into byte ranges (cutg_shards.py) whose partial results are merged in
+file order.
+
+The dump may be compressed (.gz/.bz2/.xz/.zst – then it is read as one
+stream, decompressed in a background thread); --compress and a compressed
+--fixed name write compressed outputs (cutg_compress.py).
+
+The scan and the writes are reported as telemetry stages – a summary line
+each on stderr, JSON lines in --telemetry FILE or $CUTG_TELEMETRY
+(cutg_telemetry.py).
+
+Requires numpy pandas
+"""
+
+import argparse
+import csv
+import io
+import re
+import shutil
+import sys
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+from agg_codon_by_taxid import Accumulator, write_accumulator
+from cds_to_species_hardwired import (Plan, SpeciesTotals, batch_values,
+                                      column_plan)
+from codon_index import CODONS_DNA, CODONS_RNA
+from cutg_compress import SUFFIXES, open_output
+from cutg_shards import open_span, run_shards, shard_ranges
+from cutg_telemetry import Telemetry
+from extract_ciliates import CILIATE_GENERA
+from fix_hive_header import FIXED_HEADER, sniff_fields, strip_last_field
+from ncbi_taxonomy import Taxonomy
+
+CHUNK = 100_000     # rows per parsed block
+
+Clades = Dict[str, Dict[Tuple[str, str], str]]    # clade → {(taxid, organelle): species}
+
+
+class Partial(NamedTuple):
+    """Everything one byte range contributes."""
+    keys: Accumulator
+    species: SpeciesTotals
+    clades: Clades
+
+
+def parse_genera(text: str) -> Tuple[str, List[str]]:
+    """ "name=Genus1,Genus2" (or "ciliates") → (name, genera)."""
+    name, eq, genera = text.partition("=")
+    if not eq:
+        if name.lower() != "ciliates":
+            raise argparse.ArgumentTypeError(f"expected NAME=Genus1,Genus2: {text}")
+        return "ciliates", list(CILIATE_GENERA)
+    return name, [g.strip() for g in genera.split(",") if g.strip()]
+
+
+def _clade_patterns(clades) -> Dict[str, re.Pattern]:
+    return {name: re.compile("|".join(map(re.escape, genera)), re.IGNORECASE)
+            for name, genera in clades}
+
+
+def _part_path(fixed: Path, start: int) -> Path:
+    """Where the shard starting at byte *start* writes its repaired rows."""
+    return fixed.with_name(f"{fixed.name}.part{start:015d}")
+
+
+def _run_span(path: Path, start: int, end: int, report, plan: Plan, clades, taxa,
+              taxonomy, strip: bool, fixed: Path = None, chunksize: int = CHUNK) -> Partial:
+    """Parse bytes [start, end) once and feed every output.
+
+    *clades* are (name, genera) pairs, *taxa* (name, entry, exit) Euler‑tour
+    intervals of the *taxonomy* dump.
+    """
+    part = Partial(Accumulator(), SpeciesTotals(len(plan.sums)),
+                   {name: {} for name, *_ in [*clades, *taxa]})
+    patterns = _clade_patterns(clades)
+    tax = Taxonomy.open(taxonomy) if taxa else None
+    out = open(_part_path(fixed, start), "wb") if fixed else None
+    try:
+        with open_span(path, start, end) as f:
+            while True:
+                lines = list(islice(f, chunksize))
+                if not lines:
+                    break
+                block = b"".join(lines)
+                if out:
+                    out.write(strip_last_field(block) if strip else block)
+                chunk = pd.read_csv(io.BytesIO(block), sep="\t", header=None,
+                                    names=plan.names, usecols=range(len(plan.names)),
+                                    dtype={"Taxid": str, "Organelle": str, "Species": str},
+                                    keep_default_na=False, na_values=[""])
+                _feed(part, chunk, plan, patterns, tax, taxa)
+                report(len(lines))
+    finally:
+        if out:
+            out.close()
+    return part
+
+
+def _feed(part: Partial, chunk: pd.DataFrame, plan: Plan, patterns, tax, taxa) -> None:
+    taxid = chunk["Taxid"].fillna("").to_numpy()
+    organelle = chunk["Organelle"].fillna("").to_numpy()
+    counts = chunk[CODONS_RNA]
+    if not all(pd.api.types.is_integer_dtype(t) for t in counts.dtypes):
+        counts = counts.apply(pd.to_numeric, errors="coerce").fillna(0)
+    part.keys.add(taxid, organelle, counts.to_numpy(dtype=np.int64))
+    part.species.add(chunk["Species"].to_numpy(), batch_values(chunk, plan))
+
+    species = chunk["Species"].fillna("")
+    selected = []
+    if patterns:
+        names = species.unique()
+        for clade, pat in patterns.items():
+            hit = set(n for n in names if pat.search(n))
+            if hit:
+                selected.append((clade, species.isin(hit).to_numpy()))
+    if taxa:
+        pos = tax.positions(taxid)
+        for clade, lo, hi in taxa:
+            selected.append((clade, (pos >= lo) & (pos < hi)))
+    for clade, rows in selected:
+        found = part.clades[clade]
+        for key in zip(taxid[rows], organelle[rows], species.to_numpy()[rows]):
+            found.setdefault(key[:2], key[2])
+
+
+def _write_clade(acc: Accumulator, keys: Dict[Tuple[str, str], str], out_path: Path) -> None:
+    """The aggregate rows of one clade, in aggregate order, plus Species_Name."""
+    with open_output(out_path, "w") as f:
+        w = csv.writer(f, delimiter="\t")
+        w.writerow(["Taxid", "Organelle", *CODONS_DNA, "#CDS", "#Codons", "Species_Name"])
+        for key, gid in acc.ids.items():
+            if key in keys:
+                row = acc.sums[gid].tolist()
+                w.writerow([*key, *row, int(acc.ncds[gid]), sum(row), keys[key]])
+
+
+def run(raw_path: Path, out_dir: Path, tag: str, clades=(), fixed: Path = None,
+        workers: int = 1, step: int = None, chunksize: int = CHUNK,
+        ext: str = "", telemetry: Telemetry = None, taxa=(),
+        taxonomy=None) -> Dict[str, Path]:
+    """Single pass over *raw_path*; returns {output: path}.
+
+    *clades* are (name, genera) pairs matched against species names, *taxa*
+    NCBI taxa (names or Taxids) whose subtrees in the *taxonomy* dump
+    (default $NCBI_TAXONOMY) are selected by Taxid.
+
+    The scan and the writes are timed as *telemetry* stages (by default
+    logged to $CUTG_TELEMETRY, if set).
+    """
+    tel = telemetry or Telemetry("cutg_pipeline")
+    fields = sniff_fields(raw_path)
+    if fields not in (len(FIXED_HEADER), len(FIXED_HEADER) + 1):
+        sys.exit(f"{raw_path}: {fields} fields per row, expected {len(FIXED_HEADER)} "
+                 f"(+1 trailing)")
+    plan = column_plan(raw_path, FIXED_HEADER)
+    clades = list(clades)
+    names = [name for name, _ in clades] + [str(t).strip() for t in taxa]
+    if len(set(names)) < len(names):
+        sys.exit(f"clade names must be unique: {', '.join(names)}")
+    intervals = []
+    if taxa:
+        tax = Taxonomy.open(taxonomy)
+        for name, taxon in zip(names[len(clades):], taxa):
+            taxid = tax.resolve(taxon)
+            print(f"Clade: {tax.name(taxid)} (Taxid {taxid}, {tax.rank_of(taxid)})")
+            intervals.append((name, *tax.interval(taxid)))
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if fixed:
+        fixed.parent.mkdir(parents=True, exist_ok=True)
+    spans = shard_ranges(raw_path, workers)
+    with tel.stage("scan", step, raw_path.stat().st_size) as st:
+        results = run_shards(_run_span, raw_path, spans, workers, st,
+                             (plan, clades, intervals, taxonomy, fields > len(FIXED_HEADER),
+                              fixed, chunksize))
+
+        acc, species, found = Accumulator(), SpeciesTotals(len(plan.sums)), {}
+        for part in results:
+            acc.merge(part.keys)
+            species.merge(part.species)
+            for clade, keys in part.clades.items():
+                into = found.setdefault(clade, {})
+                for k, v in keys.items():
+                    into.setdefault(k, v)
+
+    paths = {"codon_species": out_dir / f"{tag}_codon_species.tsv{ext}",
+             "species": out_dir / f"{tag}_species.tsv{ext}"}
+    with tel.stage("write") as st:
+        write_accumulator(acc, paths["codon_species"])
+        with open_output(paths["species"], "w") as f:
+            species.frame(plan).to_csv(f, sep="\t", index=False)
+        for clade in names:
+            paths[clade] = out_dir / f"{tag}_{clade}_codon_species.tsv{ext}"
+            _write_clade(acc, found.get(clade, {}), paths[clade])
+        st(len(acc) + len(species))
+
+    if fixed:
+        with tel.stage("write_fixed") as st, open_output(fixed, "wb") as dst:
+            dst.write("\t".join(FIXED_HEADER).encode() + b"\n")
+            for start, _ in spans:
+                part = _part_path(fixed, start)
+                with open(part, "rb") as src:
+                    shutil.copyfileobj(src, dst, 1 << 24)
+                st.add_bytes(part.stat().st_size)
+                part.unlink()
+        paths["fixed"] = fixed
+    if telemetry is None:
+        tel.close()
+    return paths
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Raw CUTG dump → (Taxid, Organelle), species and clade tables in one pass.")
+    ap.add_argument("raw", type=Path, help="HIVE CDS dump (broken or fixed header)")
+    ap.add_argument("--out", type=Path, default=Path("AGG"), help="output folder [AGG]")
+    ap.add_argument("--tag", help="output name prefix [input name up to _cds]")
+    ap.add_argument("--clade", action="append", default=[], metavar="TAXON",
+                    help="extract an NCBI taxon (name or Taxid) and its subtree (repeatable)")
+    ap.add_argument("--taxonomy", help="NCBI taxdump directory (nodes.dmp, names.dmp) "
+                    "for --clade [$NCBI_TAXONOMY]")
+    ap.add_argument("--genera", action="append", type=parse_genera, default=[],
+                    metavar="NAME=GENUS,…", help="extract the species whose names contain "
+                    "a genus (repeatable); 'ciliates' uses extract_ciliates' genera")
+    ap.add_argument("--fixed", type=Path, help="also write the header-repaired CDS table here")
+    ap.add_argument("--workers", type=int, default=1, help="processes, one byte range each [1]")
+    ap.add_argument("--compress", choices=[s.lstrip(".") for s in SUFFIXES],
+                    help="write the output tables compressed (gz, bz2, xz or zst)")
+    ap.add_argument("--progress", type=int, metavar="N", help="report every N rows")
+    ap.add_argument("--chunksize", type=int, default=CHUNK,
+                    help=f"rows per parsed block [{CHUNK:,}]")
+    ap.add_argument("--telemetry", metavar="FILE",
+                    help="append JSON-lines timing/throughput/RSS records here "
+                         "[$CUTG_TELEMETRY]")
+    args = ap.parse_args()
+
+    tag = args.tag or args.raw.name.split("_cds")[0].split(".")[0]
+    with Telemetry("cutg_pipeline", args.telemetry) as tel:
+        try:
+            paths = run(args.raw, args.out, tag, args.genera, args.fixed, args.workers,
+                        args.progress, args.chunksize,
+                        "." + args.compress if args.compress else "", tel,
+                        args.clade, args.taxonomy)
+        except (KeyError, ValueError, FileNotFoundError) as e:
+            sys.exit(f"\u2717 {e.args[0] if e.args else e}")
+    for what, path in paths.items():
+        print(f"\u2713 {what:14s} {path}")
+
+
+if __name__ == "__main__":
+    main()
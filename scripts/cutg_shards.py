@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+r"""
+cutg_shards.py – newline‑aligned byte‑range shards of a CUTG TSV
+----------------------------------------------------------------
+Splits the body of a large table (everything after the header line) into
+byte ranges that start and end on line boundaries, so each range can be
+parsed by a separate process with no row read twice or lost:
+
+    >>> spans = shard_ranges("refseq_cds_fixed.tsv", 8)   # [(start, end), …]
+    >>> with open_span(path, *spans[3]) as f:              # binary, EOF at end
+    ...     rows = f.readlines()
+
+run_shards() maps a worker over the spans in a process pool and returns the
+results in span order, which is file order – merging them left to right
+reproduces what one serial pass over the whole file would have built.
+Workers report rows done through a callback; the parent sums the reports
+across shards into one Heartbeat (the "…N rows" lines of --progress) – or
+a cutg_telemetry.Stage, which also logs the stage's rates.
+
+shard_ranges(path, n, start, end) splits any line‑aligned sub‑range, and
+last_line_end() finds where the complete lines of a growing file stop – the
+hooks agg_codon_by_taxid.py --incremental uses to read only appended rows.
+
+A compressed table (cutg_compress.py) cannot be split or seeked: it comes
+back as the single span (header_end, -1), read from the decompressed stream
+to its end.
+
+Requires nothing outside the standard library
+"""
+
+import io
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import Manager
+from queue import Empty
+from typing import Callable, List, Optional, Tuple
+
+from cutg_compress import is_compressed, open_input
+
+Span = Tuple[int, int]
+TO_END = -1         # span end of a compressed stream: read to EOF
+
+
+def header_end(path) -> int:
+    """Byte offset just past the header line (of the decompressed stream)."""
+    with open_input(path, "rb") as f:
+        return len(f.readline())
+
+
+def last_line_end(path, end: Optional[int] = None) -> int:
+    """Offset just past the last complete line before *end* (a half‑written
+    final line is left for the next run)."""
+    if is_compressed(path):
+        raise ValueError(f"{path}: a compressed table cannot be scanned from its end")
+    end = os.path.getsize(path) if end is None else end
+    with open(path, "rb") as f:
+        pos = end
+        while pos > 0:
+            k = max(0, pos - (1 << 16))
+            f.seek(k)
+            nl = f.read(pos - k).rfind(b"\n")
+            if nl >= 0:
+                return k + nl + 1
+            pos = k
+    return 0
+
+
+def shard_ranges(path, n: int, start: Optional[int] = None,
+                 end: Optional[int] = None) -> List[Span]:
+    """Split bytes [start, end) – by default the body of *path* – into ≤ n
+    non‑empty, newline‑aligned byte ranges.  *start* must be a line start."""
+    start = header_end(path) if start is None else start
+    if is_compressed(path):
+        return [(start, TO_END)]
+    size = os.path.getsize(path) if end is None else end
+    cuts = [start]
+    with open(path, "rb") as f:
+        for k in range(1, max(1, n)):
+            guess = start + (size - start) * k // n
+            if guess <= cuts[-1]:
+                continue
+            f.seek(guess - 1)           # a cut already on a line start stays put
+            f.readline()
+            if cuts[-1] < f.tell() < size:
+                cuts.append(f.tell())
+    cuts.append(size)
+    return [(a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+
+
+class _SpanReader(io.RawIOBase):
+    """Raw reader over bytes [start, end) of a file (end TO_END: to EOF)."""
+
+    def __init__(self, path, start: int, end: int):
+        if is_compressed(path):
+            self._f = open_input(path, "rb")
+            skip = start
+            while skip > 0:                     # no seeking in a compressed stream
+                got = len(self._f.read(min(skip, 1 << 22)))
+                if not got:
+                    break
+                skip -= got
+        else:
+            self._f = open(path, "rb", buffering=0)
+            self._f.seek(start)
+        self._left = sys.maxsize if end == TO_END else end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = self._f.readinto(memoryview(b)[:min(len(b), self._left)]) if self._left > 0 else 0
+        self._left -= n
+        return n
+
+    def close(self) -> None:
+        self._f.close()
+        super().close()
+
+
+def open_span(path, start: int, end: int, buffering: int = 1 << 20) -> io.BufferedReader:
+    """Binary file object reading only bytes [start, end) of *path*."""
+    return io.BufferedReader(_SpanReader(path, start, end), buffering)
+
+
+def open_span_text(path, start: int, end: int) -> io.TextIOWrapper:
+    """Text view of a span, lines kept exactly as in the file (newline="")."""
+    return io.TextIOWrapper(open_span(path, start, end), encoding="utf-8", newline="")
+
+# ---------------------------------------------------------------------------
+# progress and the process pool
+# ---------------------------------------------------------------------------
+
+
+class Heartbeat:
+    """Prints "…N rows (R rows/s)" to stderr each time the running total crosses
+    a multiple of step; *unit* replaces "rows" for counts of something else."""
+
+    def __init__(self, step: Optional[int], unit: str = "rows"):
+        self.step, self.rows, self.unit = step, 0, unit
+        self.t0 = time.perf_counter()
+
+    def __call__(self, n: int) -> None:
+        if self.step:
+            ticks = range(self.rows // self.step + 1, (self.rows + n) // self.step + 1)
+            if ticks:
+                secs = time.perf_counter() - self.t0
+                rate = f"  ({(self.rows + n) / secs:,.0f} {self.unit}/s)" if secs > 0 else ""
+                for k in ticks:
+                    print(f"…{k * self.step:,} {self.unit}{rate}", file=sys.stderr)
+        self.rows += n
+
+
+def run_shards(worker: Callable, path, spans: List[Span], workers: int,
+               progress: Optional[Callable[[int], None]] = None, args: tuple = ()) -> list:
+    """[worker(path, start, end, report, *args) for each span], run in *workers* processes.
+
+    *report(n)* forwards row counts from the workers to *progress* in the
+    parent; results come back in span order.
+    """
+    if workers <= 1 or len(spans) <= 1:
+        report = progress or _ignore
+        return [worker(path, a, b, report, *args) for a, b in spans]
+
+    with Manager() as mgr, ProcessPoolExecutor(min(workers, len(spans))) as ex:
+        queue = mgr.Queue()
+        futs = [ex.submit(worker, path, a, b, queue.put, *args) for a, b in spans]
+        pending = set(futs)
+        while pending:
+            _, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            _drain(queue, progress)
+        _drain(queue, progress)
+        return [f.result() for f in futs]
+
+
+def _drain(queue, progress) -> None:
+    while True:
+        try:
+            n = queue.get_nowait()
+        except Empty:
+            return
+        if progress:
+            progress(n)
+
+
+def _ignore(n: int) -> None:
+    pass
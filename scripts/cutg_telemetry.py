@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+r"""
+cutg_telemetry.py – throughput and resource telemetry for the CUTG scripts
+--------------------------------------------------------------------------
+One instrumentation layer for every pipeline script: a run is split into
+named stages, and each stage records wall time, rows, bytes, rows/s, bytes/s
+and the peak RSS reached so far.
+
+    >>> tel = Telemetry("agg_codon_by_taxid", log="agg.jsonl")
+    >>> with tel.stage("aggregate", step=1_000_000, nbytes=path.stat().st_size) as st:
+    ...     acc = aggregate_blocks(path, progress=st)       # st(n): n more rows
+    >>> tel.close()
+
+A Stage is a Heartbeat (cutg_shards.py), so it doubles as the progress
+callback the scripts already take and still prints the human "…N rows
+(R rows/s)" lines every *step* rows; when a stage ends one summary line
+goes to stderr.
+
+Machine‑readable records are appended as JSON Lines to the log named by
+--telemetry or, failing that, the CUTG_TELEMETRY environment variable – one
+object per stage and one per run:
+
+    {"run": "…", "script": "agg_codon_by_taxid", "stage": "aggregate",
+     "seconds": 6.8, "rows": 1000000, "bytes": 226679641,
+     "rows_per_s": 147058.8, "bytes_per_s": 33335241.3, "peak_rss_mb": 412.3, …}
+
+Records from runs that share a log can be compared to catch regressions, or
+used to size batch jobs (peak_rss_mb covers worker processes as well).
+
+A stage that counts something other than input rows names its unit –
+tel.stage("null_model", unit="shuffles") – and records "shuffles" and
+"shuffles_per_s" in place of rows, so the run's "rows" total only adds up
+input rows; each other unit gets its own total.
+
+Requires nothing outside the standard library
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Iterator, List, Optional
+
+from cutg_shards import Heartbeat
+
+try:
+    import resource
+except ImportError:             # Windows
+    resource = None
+
+LOG_ENV = "CUTG_TELEMETRY"
+
+
+def peak_rss_mb(children: bool = True) -> Optional[float]:
+    """High‑water RSS of this process (and, by default, its finished children)."""
+    if resource is None:
+        return None
+    who = [resource.RUSAGE_SELF] + ([resource.RUSAGE_CHILDREN] if children else [])
+    kb = max(resource.getrusage(w).ru_maxrss for w in who)
+    return round(kb / 2**20 if sys.platform == "darwin" else kb / 2**10, 1)
+
+
+def _rate(n: float, secs: float) -> Optional[float]:
+    return round(n / secs, 1) if secs > 0 else None
+
+
+class Stage(Heartbeat):
+    """Rows, bytes and wall time of one stage; call it with row counts."""
+
+    def __init__(self, name: str, step: Optional[int] = None, nbytes: int = 0,
+                 forward: Optional[Callable[[int], None]] = None, unit: str = "rows"):
+        super().__init__(step, unit)
+        self.name, self.bytes, self.forward = name, nbytes, forward
+        self.seconds: Optional[float] = None
+
+    def __call__(self, n: int) -> None:
+        super().__call__(n)
+        if self.forward:
+            self.forward(n)
+
+    def to(self, total: int) -> None:
+        """Progress given as a running total (e.g. shuffles done so far)."""
+        self(total - self.rows)
+
+    def add_bytes(self, n: int) -> None:
+        self.bytes += n
+
+    def stop(self) -> None:
+        self.seconds = time.perf_counter() - self.t0
+
+    def record(self) -> dict:
+        secs = self.seconds if self.seconds is not None else time.perf_counter() - self.t0
+        rows = self.rows if self.unit == "rows" else 0
+        r = {"stage": self.name, "seconds": round(secs, 4), "rows": rows,
+             "bytes": self.bytes, "rows_per_s": _rate(rows, secs),
+             "bytes_per_s": _rate(self.bytes, secs), "peak_rss_mb": peak_rss_mb()}
+        if self.unit != "rows":
+            r.update({self.unit: self.rows, f"{self.unit}_per_s": _rate(self.rows, secs)})
+        return r
+
+    def summary(self) -> str:
+        r, u = self.record(), self.unit
+        parts = [f"{r[u]:,} {u}"] if r[u] else []
+        if r[f"{u}_per_s"] and r[u]:
+            parts.append(f"{r[f'{u}_per_s']:,.0f} {u}/s")
+        if r["bytes_per_s"] and r["bytes"]:
+            parts.append(f"{r['bytes_per_s'] / 2**20:,.1f} MB/s")
+        if r["peak_rss_mb"] is not None:
+            parts.append(f"peak RSS {r['peak_rss_mb']:,.0f} MB")
+        return f"[{self.name}] {r['seconds']:.2f} s" + (", " + ", ".join(parts) if parts else "")
+
+
+class Telemetry:
+    """Stages of one script run, logged as JSON Lines to *log* (or $CUTG_TELEMETRY)."""
+
+    def __init__(self, script: str, log: Optional[str] = None, quiet: bool = False):
+        self.script, self.quiet = script, quiet
+        self.log = log or os.environ.get(LOG_ENV) or None
+        self.run = uuid.uuid4().hex[:12]
+        self.stages: List[Stage] = []
+        self.t0 = time.perf_counter()
+        self.closed = False
+
+    def _emit(self, record: dict) -> None:
+        if not self.log:
+            return
+        record = {"run": self.run, "script": self.script,
+                  "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                  **record}
+        with open(self.log, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    @contextmanager
+    def stage(self, name: str, step: Optional[int] = None, nbytes: int = 0,
+              forward: Optional[Callable[[int], None]] = None,
+              unit: str = "rows") -> Iterator[Stage]:
+        st = Stage(name, step, nbytes, forward, unit)
+        try:
+            yield st
+        finally:
+            st.stop()
+            self.stages.append(st)
+            self._emit(st.record())
+            if not self.quiet:
+                print(st.summary(), file=sys.stderr)
+
+    def close(self, **extra) -> dict:
+        """Log the whole run (total time, rows, bytes, peak RSS); *extra* is added as is.
+
+        "rows" adds up the stages that count rows; stages with another unit
+        are totalled under that unit.
+        """
+        secs = time.perf_counter() - self.t0
+        counts = {"rows": 0}
+        for s in self.stages:
+            counts[s.unit] = counts.get(s.unit, 0) + s.rows
+        nbytes = sum(s.bytes for s in self.stages)
+        record = {"stage": None, "seconds": round(secs, 4), **counts, "bytes": nbytes,
+                  "peak_rss_mb": peak_rss_mb(),
+                  "stages": {s.name: round(s.seconds, 4) for s in self.stages},
+                  "argv": sys.argv, "host": platform.node(), "pid": os.getpid(),
+                  "python": platform.python_version(), **extra}
+        if not self.closed:
+            self._emit(record)
+            self.closed = True
+        return record
+
+    def __enter__(self) -> "Telemetry":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close(ok=exc[0] is None)
@@ -2,25 +2,63 @@
 """
 extract_ciliates.py - Extract ciliate data for FC testing
 Creates nuclear and mitochondrial datasets from GenBank codon usage data
+
+By default ciliates are species whose names contain one of CILIATE_GENERA.
+With --clade (a name or Taxid, e.g. Ciliophora) and an NCBI taxonomy dump
+(--taxonomy DIR or $NCBI_TAXONOMY) every Taxid under that clade is taken
+instead - see ncbi_taxonomy.py.
+
+With --partition CLADE[:ORGANELLE,...] (repeatable) the codon table is
+instead split in one streaming pass into a file per (clade, organelle)
+partition, plus manifest.json describing them, e.g.
+
+    python extract_ciliates.py AGG/genbank_codon_species.tsv INDEX/genbank_species_index.tsv out \
+        --partition Ciliophora:genomic,mitochondrion --partition Apicomplexa:apicoplast \
+        --partition Viridiplantae:chloroplast,plastid --taxonomy taxdump
 """
 
+import argparse
+import json
+import re
+import numpy as np
 import pandas as pd
 import sys
+from itertools import islice
 from pathlib import Path
 
-def extract_ciliate_data(codon_file, index_file, output_dir):
-    """Extract ciliate nuclear and mitochondrial data"""
+from cutg_cache import fingerprint
+from cutg_compress import open_input
+from cutg_layout import sniff
+from cutg_offsets import field, load_rows, table_taxids
+from ncbi_taxonomy import Taxonomy
+from species_index import SpeciesIndex
+
+CILIATE_GENERA = ['Paramecium', 'Tetrahymena', 'Oxytricha', 'Stentor']
+PARTITION_CHUNK = 100_000   # rows routed per block
+PARTITION_BUFFER = 1 << 20  # bytes a partition buffers before writing them out
+
+def extract_ciliate_data(codon_file, index_file, output_dir, clade=None, taxonomy=None):
+    """Extract ciliate nuclear and mitochondrial data
+
+    With *clade* (name or Taxid) the rows are those whose Taxid lies under it
+    in the NCBI *taxonomy* dump, not those matching CILIATE_GENERA.
+    """
     
     print("=== CILIATE DATA EXTRACTION ===")
     
-    # Load index to identify ciliate organisms
+    # Open the persistent species-name index (built on first use)
     print(f"Loading index: {index_file}")
-    index_df = pd.read_csv(index_file, sep='\t', names=['Row', 'Database', 'NA', 'Taxid', 'Species', 'Organelle'])
-    
-    # Identify ciliates
-    ciliate_genera = ['Paramecium', 'Tetrahymena', 'Oxytricha', 'Stentor']
-    ciliate_mask = index_df['Species'].str.contains('|'.join(ciliate_genera), case=False, na=False)
-    ciliate_index = index_df[ciliate_mask]
+    index = SpeciesIndex.open(index_file)
+    
+    # Identify ciliates: by taxonomy subtree, or by genus name
+    if clade is None:
+        tax = None
+        ciliate_index = index.frame(index.contains(CILIATE_GENERA))
+    else:
+        tax = Taxonomy.open(taxonomy)
+        taxid = tax.resolve(clade)
+        print(f"Clade: {tax.name(taxid)} (Taxid {taxid}, {tax.rank_of(taxid)})")
+        ciliate_index = index.frame(np.flatnonzero(tax.under(index.taxid, taxid)))
     
     print(f"Found {len(ciliate_index)} ciliate entries:")
     print(ciliate_index['Organelle'].value_counts())
@@ -32,24 +70,25 @@ def extract_ciliate_data(codon_file, index_file, output_dir):
     print(f"\nNuclear ciliates: {len(nuclear_ciliates)}")
     print(f"Mitochondrial ciliates: {len(mito_ciliates)}")
     
-    # Load codon usage data
+    # Load only the wanted rows of the codon usage data (byte-offset index)
     print(f"\nLoading codon usage data: {codon_file}")
-    codon_df = pd.read_csv(codon_file, sep='\t')
-    
-    # Extract ciliate data by Taxid
-    nuclear_taxids = set(nuclear_ciliates['Taxid'].astype(str))
-    mito_taxids = set(mito_ciliates['Taxid'].astype(str))
+    if tax is None:
+        wanted = set(ciliate_index['Taxid'].astype(str))
+    else:
+        all_taxids = table_taxids(codon_file)
+        wanted = set(all_taxids[tax.under(all_taxids, taxid)])
+    codon_df = load_rows(codon_file, taxids=wanted, organelle=['genomic', 'mitochondrion'])
+    
+    # Extract ciliate data by Taxid (interval test over the Taxid column for a clade)
+    if tax is None:
+        nuclear_in = codon_df['Taxid'].astype(str).isin(set(nuclear_ciliates['Taxid'].astype(str)))
+        mito_in = codon_df['Taxid'].astype(str).isin(set(mito_ciliates['Taxid'].astype(str)))
+    else:
+        nuclear_in = mito_in = tax.under(codon_df['Taxid'], taxid)
     
     # Match by Taxid and Organelle
-    nuclear_data = codon_df[
-        (codon_df['Taxid'].astype(str).isin(nuclear_taxids)) & 
-        (codon_df['Organelle'] == 'genomic')
-    ].copy()
-    
-    mito_data = codon_df[
-        (codon_df['Taxid'].astype(str).isin(mito_taxids)) & 
-        (codon_df['Organelle'] == 'mitochondrion')
-    ].copy()
+    nuclear_data = codon_df[nuclear_in & (codon_df['Organelle'] == 'genomic')].copy()
+    mito_data = codon_df[mito_in & (codon_df['Organelle'] == 'mitochondrion')].copy()
     
     print(f"\nExtracted nuclear ciliate data: {len(nuclear_data)} organisms")
     print(f"Extracted mitochondrial ciliate data: {len(mito_data)} organisms")
@@ -58,6 +97,11 @@ def extract_ciliate_data(codon_file, index_file, output_dir):
     taxid_to_species = dict(zip(ciliate_index['Taxid'].astype(str), ciliate_index['Species']))
     nuclear_data['Species_Name'] = nuclear_data['Taxid'].astype(str).map(taxid_to_species)
     mito_data['Species_Name'] = mito_data['Taxid'].astype(str).map(taxid_to_species)
+    if tax is not None:
+        # Taxids missing from the species index get their NCBI scientific name
+        for data in (nuclear_data, mito_data):
+            missing = data['Species_Name'].isna()
+            data.loc[missing, 'Species_Name'] = data.loc[missing, 'Taxid'].map(tax.name)
     
     # Create output directory
     output_path = Path(output_dir)
@@ -98,6 +142,156 @@ def extract_ciliate_data(codon_file, index_file, output_dir):
     
     return nuclear_file, mito_file, overlap_species
 
+def parse_partition(text):
+    """ "CLADE[:ORGANELLE,ORGANELLE]" -> (clade, organelles); none or "*" means all"""
+    clade, _, organelles = text.partition(':')
+    organelles = [o.strip() for o in organelles.split(',') if o.strip()]
+    if not clade.strip():
+        raise argparse.ArgumentTypeError(f"expected CLADE[:ORGANELLE,...]: {text}")
+    return clade.strip(), ['*'] if not organelles or '*' in organelles else organelles
+
+class PartitionWriter:
+    """One partition's output file; rows are held until PARTITION_BUFFER bytes
+    have accumulated and then written in one call, so memory stays bounded
+    however many rows the partition receives"""
+    
+    def __init__(self, path, header, limit=PARTITION_BUFFER):
+        self.path, self.limit = Path(path), limit
+        self.buffer, self.size, self.rows, self.taxids = [], 0, 0, set()
+        self.file = open(self.path, 'wb')
+        self.file.write(header)
+    
+    def add(self, lines, taxids):
+        self.buffer += lines
+        self.size += sum(map(len, lines))
+        self.rows += len(lines)
+        self.taxids.update(taxids)
+        if self.size >= self.limit:
+            self.flush()
+    
+    def flush(self):
+        self.file.write(b''.join(self.buffer))
+        self.buffer, self.size = [], 0
+    
+    def close(self):
+        self.flush()
+        self.file.close()
+
+def _slug(text):
+    return re.sub(r'\W+', '_', text).strip('_').lower()
+
+def _species_lookup(index_file, tax):
+    """Taxids -> species names as extract_ciliate_data labels them (last index
+    entry for the Taxid, else the NCBI scientific name), resolved in bulk and
+    memoised"""
+    index = SpeciesIndex.open(index_file)
+    taxid = np.asarray(index.taxid)[::-1]
+    known, last = np.unique(taxid, return_index=True)
+    last = len(taxid) - 1 - last
+    names = {}
+    
+    def lookup(taxids):
+        new = np.array(sorted(set(taxids) - names.keys()), dtype=str)
+        if len(new):
+            at = np.minimum(np.searchsorted(known, new), max(len(known) - 1, 0))
+            found = known[at] == new if len(known) else np.zeros(len(new), dtype=bool)
+            fallback = iter(tax.names(new[~found]))
+            for t, hit, i in zip(new.tolist(), found, at):
+                name = index.names[int(index.name_of_row[last[i]])] if hit else next(fallback)
+                names[t] = (name or '').encode()
+        return [names[t] for t in taxids]
+    return lookup
+
+def extract_partitions(codon_file, index_file, output_dir, specs, taxonomy=None,
+                       chunksize=PARTITION_CHUNK):
+    """Route every row of the codon table, in one pass, into each (clade,
+    organelle) partition of *specs* it matches; returns the manifest"""
+    
+    print("=== PARTITIONED EXTRACTION ===")
+    tax = Taxonomy.open(taxonomy)
+    lay = sniff(codon_file)
+    tcol, ocol = lay.columns.index('Taxid'), lay.columns.index('Organelle')
+    header = '\t'.join(lay.columns + ['Species_Name']).encode() + b'\n'
+    species_names = _species_lookup(index_file, tax)
+    
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    
+    # One partition per (clade, organelle); '*' keeps every organelle
+    partitions = {}
+    for clade, organelles in specs:
+        taxid = tax.resolve(clade)
+        lo, hi = tax.interval(taxid)
+        label = _slug(tax.name(taxid) or str(taxid))
+        for organelle in organelles:
+            name = f"{label}_{'all' if organelle == '*' else _slug(organelle)}"
+            if name not in partitions:
+                partitions[name] = dict(clade=clade, taxid=taxid, rank=tax.rank_of(taxid),
+                                        organelle=organelle, lo=lo, hi=hi,
+                                        writer=PartitionWriter(output_path / f"{name}_codon_usage.tsv", header))
+    
+    scanned = 0
+    try:
+        with open_input(codon_file, 'rb') as f:
+            f.readline()
+            while True:
+                lines = [line for line in islice(f, chunksize) if line.strip()]
+                if not lines:
+                    break
+                scanned += len(lines)
+                taxids = [field(line, tcol) for line in lines]
+                organelles = np.array([field(line, ocol) for line in lines], dtype=object)
+                pos = tax.positions(taxids)
+                
+                # Which rows each partition takes (one interval test per clade)
+                masks, hit = {}, np.zeros(len(lines), dtype=bool)
+                for name, part in partitions.items():
+                    mask = (pos >= part['lo']) & (pos < part['hi'])
+                    if part['organelle'] != '*':
+                        mask &= organelles == part['organelle']
+                    masks[name] = mask
+                    hit |= mask
+                
+                # Each routed row is labelled once, then shared by its partitions
+                routed = np.flatnonzero(hit).tolist()
+                out = {}
+                for i, name in zip(routed, species_names([taxids[i] for i in routed])):
+                    row = lines[i].rstrip(b'\r\n')
+                    if lay.trailing:
+                        row = row.rsplit(b'\t', 1)[0]
+                    out[i] = row + b'\t' + name + b'\n'
+                for name, mask in masks.items():
+                    rows = np.flatnonzero(mask)
+                    if len(rows):
+                        partitions[name]['writer'].add([out[i] for i in rows],
+                                                       [taxids[i] for i in rows])
+    finally:
+        for part in partitions.values():
+            part['writer'].close()
+    
+    manifest = {
+        'source': str(codon_file),
+        'source_fingerprint': fingerprint(codon_file),
+        'taxonomy': str(taxonomy or ''),
+        'rows_scanned': scanned,
+        'partitions': [
+            {'name': name, 'clade': part['clade'], 'taxid': part['taxid'],
+             'rank': part['rank'], 'organelle': part['organelle'],
+             'path': part['writer'].path.name, 'rows': part['writer'].rows,
+             'taxa': len(part['writer'].taxids),
+             'bytes': part['writer'].path.stat().st_size}
+            for name, part in partitions.items()],
+    }
+    manifest_file = output_path / 'manifest.json'
+    with open(manifest_file, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    
+    print(f"Scanned {scanned:,} rows of {codon_file}")
+    for entry in manifest['partitions']:
+        print(f"  {entry['name']:40s} {entry['rows']:8,} rows {entry['taxa']:7,} taxa  {entry['path']}")
+    print(f"\n✓ Manifest saved: {manifest_file}")
+    return manifest
+
 def create_ciliate_orbit_map(output_dir):
     """Create orbit mapping for ciliate genetic code"""
     
@@ -169,15 +363,37 @@ def create_ciliate_orbit_map(output_dir):
     return orbit_file
 
 def main():
-    if len(sys.argv) != 4:
-        print("Usage: python extract_ciliates.py <codon_file> <index_file> <output_dir>")
-        print("Example: python extract_ciliates.py ../CUTG/AGG/genbank_codon_species.tsv ../CUTG/INDEX/genbank_species_index.tsv ciliate_data")
-        sys.exit(1)
-    
-    codon_file, index_file, output_dir = sys.argv[1:4]
+    parser = argparse.ArgumentParser(
+        description="Extract ciliate data for FC testing",
+        epilog="Example: python extract_ciliates.py ../CUTG/AGG/genbank_codon_species.tsv "
+               "../CUTG/INDEX/genbank_species_index.tsv ciliate_data --clade Ciliophora")
+    parser.add_argument('codon_file', help='(Taxid, Organelle) codon usage table')
+    parser.add_argument('index_file', help='species index table')
+    parser.add_argument('output_dir')
+    parser.add_argument('--clade', help='NCBI taxon (name or Taxid) to extract instead of '
+                                        'matching ciliate genus names, e.g. Ciliophora')
+    parser.add_argument('--taxonomy', help='NCBI taxdump directory (nodes.dmp, names.dmp) '
+                                           '[$NCBI_TAXONOMY]')
+    parser.add_argument('--partition', action='append', type=parse_partition, default=[],
+                        metavar='CLADE[:ORGANELLE,...]',
+                        help='write the rows of CLADE (name or Taxid) per organelle, all '
+                             'partitions in one pass, plus manifest.json (repeatable)')
+    args = parser.parse_args()
+    codon_file, index_file, output_dir = args.codon_file, args.index_file, args.output_dir
+    
+    if args.partition:
+        try:
+            extract_partitions(codon_file, index_file, output_dir, args.partition, args.taxonomy)
+        except (KeyError, ValueError, FileNotFoundError) as e:
+            sys.exit(f"✗ {e.args[0] if e.args else e}")
+        return
     
     # Extract ciliate data
-    nuclear_file, mito_file, overlap_species = extract_ciliate_data(codon_file, index_file, output_dir)
+    try:
+        nuclear_file, mito_file, overlap_species = extract_ciliate_data(
+            codon_file, index_file, output_dir, args.clade, args.taxonomy)
+    except (KeyError, ValueError, FileNotFoundError) as e:
+        sys.exit(f"✗ {e.args[0] if e.args else e}")
     
     # Create ciliate-specific orbit map
     orbit_file = create_ciliate_orbit_map(output_dir)
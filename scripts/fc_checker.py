@@ -8,22 +8,48 @@ $ py fc_checker.py genbank_species.tsv refseq_species.tsv \
 Flags
 -----
 --map FILE        two‑column CSV, no header (codon,orbit).  Default: orbit_map.csv
+--maps SPEC       score every map in one pass instead: "ncbi" (all NCBI
+                  translation tables), "ncbi:1,2,6", or a directory of map
+                  CSVs.  Writes species × map ratios_by_map.tsv and
+                  map_medians.tsv to --out
+--by-code         score each row with the NCBI table named in its
+                  "Translation Table" column; rows without one use --map
 --progress INT    print a heartbeat every INT rows             [default 1000]
+--telemetry FILE  append JSON‑lines stage records (seconds, rows/s, MB/s,
+                  peak RSS) here; default $CUTG_TELEMETRY (cutg_telemetry.py)
 --plots           write violin + null‑hist PNGs to ./fc_out
 --null [N]        add shuffled‑orbit null model; optional N    [default 10000]
+--null-mem MB     memory budget per null‑model batch           [default 512]
+--workers N       run the null model on N processes            [default 1]
+--chunksize N     stream tables N rows at a time (C parser)    [default 100000]
+--sketch-out FILE save the ratio quantile sketch (JSON) for a later merge
+--cache           read tables through the cutg_cache binary cache; codon
+                  columns are matched by name rather than position
 --quiet           suppress per‑row warnings/NaN notes
+--reference       score row by row with to_rscu/sigma_ratio (slow; the
+                  default is the whole‑matrix engine in fc_engine.py)
 
 Requires numpy pandas scipy matplotlib
 """
 
 import argparse, math, sys
+from collections import Counter
 from pathlib import Path
 import numpy as np
 import pandas as pd
 from scipy.stats import wilcoxon
 import matplotlib.pyplot as plt
 
-CODON_ORDER = [a + b + c for a in "UCAG" for b in "UCAG" for c in "UCAG"]
+from fc_engine import (CODON_ORDER, compile_orbit_map, fc_ratio_table, fc_ratios,
+                       fc_ratios_by_code)
+from fc_null import frequency_matrix, null_distribution, null_summary
+from cutg_io import CHUNK, iter_cutg
+from cutg_compress import open_input
+from cutg_layout import sniff
+from cutg_telemetry import Telemetry
+from cutg_cache import iter_blocks
+from quantile_sketch import QuantileSketch, describe
+from genetic_codes import NCBI_TABLES, orbit_registry, table_indexes
 
 # ---------------------------------------------------------------------------
 
@@ -35,9 +61,11 @@ def load_map(path):
 
 
 def read_cutg(path):
-    df = pd.read_csv(path, sep="\t", header=0, engine="python", on_bad_lines="skip")
-    df = df.iloc[:, [0] + list(range(df.shape[1] - 64, df.shape[1]))]
-    df.rename(columns=lambda c: c.replace("T", "U") if len(c) == 3 else c, inplace=True)
+    lay = sniff(path)                   # fails fast on a shifted layout
+    with open_input(path, "rt") as f:
+        df = pd.read_csv(f, sep="\t", header=None, skiprows=1, names=lay.names,
+                         usecols=[0, *lay.codon_cols], engine="python", on_bad_lines="skip")
+    df = df[[lay.columns[0], *lay.codon_names]]
     df.columns = ["species"] + CODON_ORDER
     df[CODON_ORDER] = df[CODON_ORDER].apply(pd.to_numeric, errors="coerce").fillna(0)
     return df
@@ -62,44 +90,160 @@ def sigma_ratio(rscu, orbit):
 
 # ---------------------------------------------------------------------------
 
+def score_maps(args):
+    """Multi‑map mode: one read of the tables, one ratio column per map."""
+    maps = orbit_registry(args.maps)
+    names = list(maps)
+    idxs = [compile_orbit_map(maps[n][1]) for n in names]
+    sketches = {n: QuantileSketch() for n in names}
+    print(f"Scoring {len(names)} orbit maps: {', '.join(names)}")
+
+    out = Path(args.out, "ratios_by_map.tsv")
+    source = iter_blocks if args.cache else iter_cutg
+    tel = Telemetry("fc_checker", args.telemetry)
+    rows, header = 0, True
+    with tel.stage("score_maps", nbytes=sum(Path(t).stat().st_size for t in args.tables)) as st:
+        for tbl in args.tables:
+            print(f"Reading {tbl} …")
+            for species, counts in source(tbl, args.chunksize):
+                if (rows + len(counts)) // args.progress > rows // args.progress:
+                    print(f"  processed {rows + len(counts):,} rows …", flush=True)
+                rows += len(counts)
+                st(len(counts))
+                table = fc_ratio_table(counts, idxs)
+                for j, n in enumerate(names):
+                    sketches[n].update(table[:, j])
+                block = pd.DataFrame(table, columns=names)
+                block.insert(0, "species", species)
+                block.to_csv(out, sep="\t", index=False, header=header,
+                             mode="w" if header else "a", float_format="%.6g")
+                header = False
+    tel.close(maps=len(names))
+    if not rows:
+        sys.exit("No rows read – check the input tables.")
+
+    summary = []
+    for n in names:
+        st = sketches[n].summary()
+        table_id = maps[n][0]
+        summary.append({"map": n, "code": NCBI_TABLES[table_id][0] if table_id else "",
+                        "n": st["n"], "median": st["median"], "q1": st["q1"],
+                        "q3": st["q3"], "mean": st["mean"]})
+        print(f"  {n:28s} " + describe(sketches[n]))
+    pd.DataFrame(summary).to_csv(Path(args.out, "map_medians.tsv"), sep="\t",
+                                 index=False, float_format="%.6g")
+    print("Ratios →", out)
+    print("Medians →", Path(args.out, "map_medians.tsv"))
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("tables", nargs="+", help="CUTG species TSV files")
     ap.add_argument("--map", default="orbit_map.csv")
+    ap.add_argument("--maps", metavar="SPEC",
+                    help='score many maps in one pass: "ncbi", "ncbi:1,2,6" or a directory')
+    ap.add_argument("--by-code", action="store_true",
+                    help='score rows with the map of their "Translation Table"')
     ap.add_argument("--plots", action="store_true")
     ap.add_argument("--null", nargs="?", const=10000, type=int, default=0,
                     help="add null model with optional shuffle count [10000]")
+    ap.add_argument("--null-mem", type=float, default=512, metavar="MB",
+                    help="memory budget per null-model batch in MB [512]")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="processes for the null model; result is identical for any N")
+    ap.add_argument("--chunksize", type=int, default=CHUNK,
+                    help=f"rows per streamed block [{CHUNK}]")
+    ap.add_argument("--sketch-out", metavar="FILE",
+                    help="save the ratio quantile sketch here (merge with quantile_sketch.py)")
+    ap.add_argument("--cache", action="store_true",
+                    help="open tables through the binary cache (built on first use)")
     ap.add_argument("--progress", type=int, default=1000)
+    ap.add_argument("--telemetry", metavar="FILE",
+                    help="append JSON-lines timing/throughput/RSS records here "
+                         "[$CUTG_TELEMETRY]")
     ap.add_argument("--out", default="fc_out")
     ap.add_argument("--quiet", action="store_true")
+    ap.add_argument("--reference", action="store_true",
+                    help="use the per-row reference path instead of fc_engine")
     args = ap.parse_args()
 
     Path(args.out).mkdir(exist_ok=True)
+    if args.maps:
+        if args.reference or args.null or args.by_code:
+            ap.error("--maps does not combine with --reference, --null or --by-code")
+        return score_maps(args)
+    if args.by_code and (args.reference or args.null):
+        ap.error("--by-code does not combine with --reference or --null")
+
     ORBIT = load_map(args.map)
     DEGEN = {c: ORBIT[c] for c in CODON_ORDER}
+    INDEX = compile_orbit_map(ORBIT)
+    TABLES = table_indexes() if args.by_code else {}
+    used = Counter()    # rows per translation table (--by-code)
 
-    ratios = []
+    tel = Telemetry("fc_checker", args.telemetry)
+    sketch = QuantileSketch()
+    ratios = []         # raw values, kept only for --reference, --plots and --null
+    blocks = []
     rows = 0
-    for tbl in args.tables:
-        print(f"Reading {tbl} …")
-        for _, row in read_cutg(tbl).iterrows():
-            rows += 1
-            if rows % args.progress == 0:
-                print(f"  processed {rows:,} rows …", flush=True)
-            rscu = to_rscu(row[1:], DEGEN)
-            if np.isnan(rscu).any():
-                if not args.quiet:
-                    print(f"    skipped NaN row {row[0]}")
+    scoring = tel.stage("score", nbytes=sum(Path(t).stat().st_size for t in args.tables))
+    with scoring as st:
+        for tbl in args.tables:
+            print(f"Reading {tbl} …")
+            if args.reference:
+                for _, row in read_cutg(tbl).iterrows():
+                    rows += 1
+                    st(1)
+                    if rows % args.progress == 0:
+                        print(f"  processed {rows:,} rows …", flush=True)
+                    rscu = to_rscu(row.iloc[1:].to_numpy(dtype=float), DEGEN)
+                    if np.isnan(rscu).any():
+                        if not args.quiet:
+                            print(f"    skipped NaN row {row.iloc[0]}")
+                        continue
+                    r = sigma_ratio(rscu, ORBIT)
+                    if math.isfinite(r):
+                        ratios.append(r)
                 continue
-            r = sigma_ratio(rscu, ORBIT)
-            if math.isfinite(r):
-                ratios.append(r)
 
-    if not ratios:
+            source = iter_blocks if args.cache else iter_cutg
+            for species, counts, *codes in source(tbl, args.chunksize, codes=args.by_code):
+                if (rows + len(counts)) // args.progress > rows // args.progress:
+                    print(f"  processed {rows + len(counts):,} rows …", flush=True)
+                rows += len(counts)
+                st(len(counts))
+                if not args.quiet:
+                    for sp in species[counts.sum(axis=1) == 0]:
+                        print(f"    skipped NaN row {sp}")
+                if args.by_code:
+                    codes = codes[0]
+                    ids, n = np.unique(codes, return_counts=True)
+                    used.update(dict(zip(ids.tolist(), n.tolist())))
+                    r = fc_ratios_by_code(counts, codes, TABLES, INDEX)
+                else:
+                    r = fc_ratios(counts, INDEX)
+                r = r[np.isfinite(r)]
+                sketch.update(r)
+                if args.plots or args.null:
+                    ratios.extend(r.tolist())
+                if args.null:
+                    blocks.append(frequency_matrix(counts))
+
+    if args.reference:
+        sketch.update(ratios)
+    if not sketch.n:
         sys.exit("No valid rows – check orbit map and input tables.")
 
-    med = float(np.median(ratios))
-    print(f"Median σ_intra/σ_inter = {med:.3f}  (n = {len(ratios):,})")
+    if args.by_code:
+        for t, n in sorted(used.items()):
+            code = NCBI_TABLES[t][0] if t in TABLES else f"no table → {args.map}"
+            print(f"  table {t:>2}: {n:>10,} rows  {code}")
+    med = sketch.median()
+    print(f"Median σ_intra/σ_inter = {med:.3f}  (n = {sketch.n:,})")
+    print("  " + describe(sketch))
+    if args.sketch_out:
+        sketch.save(args.sketch_out)
+        print("Sketch saved →", args.sketch_out)
 
     if args.plots:
         plt.figure(figsize=(2.4, 4))
@@ -108,28 +252,52 @@ def main():
         plt.savefig(Path(args.out, "violin_sigma_ratio.png"), dpi=300)
         print("Violin saved →", Path(args.out, "violin_sigma_ratio.png"))
 
+    # the null medians are exact, so the observed one must be too – the
+    # sketch's median is only rank‑accurate and is used for reporting alone
+    observed = float(np.median(ratios)) if args.null else med
+
+    if args.null and args.reference:
+        with tel.stage("null_model", unit="shuffles") as st:
+            rng = np.random.default_rng(2025)
+            null = []
+            base_orbits = list(ORBIT.values())
+            for _ in range(args.null):
+                rng.shuffle(base_orbits)
+                fake = dict(zip(CODON_ORDER, base_orbits))
+                groups = {}
+                for c in CODON_ORDER:
+                    groups.setdefault(fake[c], []).append(1.0)
+                intra = [x - np.mean(v) for v in groups.values() for x in v]
+                inter = [np.mean(v) for v in groups.values() for _ in v]
+                d = np.std(inter, ddof=1)
+                null.append(np.std(intra, ddof=1) / d if d else np.nan)
+                st(1)
+            null = [n for n in null if math.isfinite(n)]
+            z = (observed - np.mean(null)) / np.std(null)
+            p = (sum(n <= observed for n in null) + 1) / (len(null) + 1)
+    elif args.null:
+        freq = np.vstack(blocks)
+        last = 0
+
+        with tel.stage("null_model", unit="shuffles") as st:
+            def heartbeat(done):
+                nonlocal last
+                if done // args.progress > last // args.progress or done == args.null:
+                    print(f"  null model: {done:,}/{args.null:,} shuffles …", flush=True)
+                last = done
+                st.to(done)
+
+            null = null_distribution(freq, INDEX, args.null, 2025, args.workers,
+                                     args.null_mem, heartbeat)
+        z, p = null_summary(observed, null)
+        null = null[np.isfinite(null)]
+    tel.close(rows=rows, null=args.null, workers=args.workers)
     if args.null:
-        rng = np.random.default_rng(2025)
-        null = []
-        base_orbits = list(ORBIT.values())
-        for _ in range(args.null):
-            rng.shuffle(base_orbits)
-            fake = dict(zip(CODON_ORDER, base_orbits))
-            groups = {}
-            for c in CODON_ORDER:
-                groups.setdefault(fake[c], []).append(1.0)
-            intra = [x - np.mean(v) for v in groups.values() for x in v]
-            inter = [np.mean(v) for v in groups.values() for _ in v]
-            d = np.std(inter, ddof=1)
-            null.append(np.std(intra, ddof=1) / d if d else np.nan)
-        null = [n for n in null if math.isfinite(n)]
-        z = (med - np.mean(null)) / np.std(null)
-        p = (sum(n <= med for n in null) + 1) / (len(null) + 1)
         print(f"Null‑model Z = {z:.2f},  empirical P = {p:.4g}")
         if args.plots:
             plt.figure(figsize=(3.5, 3))
             plt.hist(null, bins=40, alpha=0.7)
-            plt.axvline(med, color="red"); plt.xlabel("median σ_intra/σ_inter (null)")
+            plt.axvline(observed, color="red"); plt.xlabel("median σ_intra/σ_inter (null)")
             plt.tight_layout(); name = Path(args.out, "null_hist.png")
             plt.savefig(name, dpi=300); print("Null hist →", name)
 
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+r"""
+fc_engine.py – whole‑matrix First‑Classness (FC) kernel
+-------------------------------------------------------
+Vectorised replacement for the per‑row `to_rscu` / `sigma_ratio` pair in
+fc_checker.py.  Takes an (n_species × 64) count matrix whose columns follow
+CODON_ORDER and returns every σ_intra/σ_inter ratio in one go.
+
+    >>> idx = compile_orbit_map(load_map("orbit_map.csv"))
+    >>> ratios = fc_ratios(counts, idx)          # shape (n_species,)
+
+Rows with no codons, or whose σ_inter is zero, come back as NaN – exactly
+the rows the per‑row path skips.
+
+Several maps (e.g. every NCBI translation table) share one frequency pass:
+
+    >>> table = fc_ratio_table(counts, [idx_standard, idx_ciliate])   # (n, 2)
+
+Mixed‑code tables are scored row by row with the map of each row's NCBI
+translation table (genetic_codes.table_indexes()), in one grouped pass:
+
+    >>> ratios = fc_ratios_by_code(counts, codes, table_indexes(), default=idx)
+
+Requires numpy
+"""
+
+from typing import Dict
+
+import numpy as np
+
+from codon_index import CODON_ORDER, OrbitIndex, compile_orbit_map  # noqa: F401 (re-exported)
+
+
+def frequencies(counts) -> np.ndarray:
+    """Row‑normalised codon frequencies; all‑zero rows become NaN."""
+    counts = np.asarray(counts, dtype=float)
+    total = counts.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return counts / np.where(total == 0, np.nan, total)
+
+
+def rscu_matrix(counts, idx: OrbitIndex) -> np.ndarray:
+    """Row‑wise RSCU; all‑zero rows become NaN (cf. fc_checker.to_rscu)."""
+    return frequencies(counts) * idx.degen
+
+
+def sigma_ratios(rscu: np.ndarray, idx: OrbitIndex) -> np.ndarray:
+    """σ_intra/σ_inter for every row of an RSCU matrix (cf. sigma_ratio)."""
+    inter = ((rscu @ idx.onehot) / idx.size)[:, idx.group]
+    intra = rscu - inter
+    den = inter.std(axis=1, ddof=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den == 0, np.nan, intra.std(axis=1, ddof=1) / den)
+
+
+def fc_ratios(counts, idx: OrbitIndex) -> np.ndarray:
+    """Counts → σ_intra/σ_inter for every species; NaN where undefined."""
+    return sigma_ratios(rscu_matrix(counts, idx), idx)
+
+
+def fc_ratio_table(counts, idxs) -> np.ndarray:
+    """(n_species × n_maps) ratios, one column per compiled map in *idxs*."""
+    freq = frequencies(counts)
+    out = np.empty((len(freq), len(idxs)))
+    for j, idx in enumerate(idxs):
+        out[:, j] = sigma_ratios(freq * idx.degen, idx)
+    return out
+
+
+def fc_ratios_by_code(counts, codes, idxs: Dict[int, OrbitIndex],
+                      default: OrbitIndex) -> np.ndarray:
+    """Ratios with each row scored under idxs[codes[row]]; other codes use *default*.
+
+    Rows are grouped by code, each group is scored in one call, and the
+    result comes back in the original row order.
+    """
+    counts = np.asarray(counts, dtype=float)
+    keys, inv = np.unique(np.asarray(codes), return_inverse=True)
+    order = np.argsort(inv, kind="stable")
+    bounds = np.cumsum(np.bincount(inv, minlength=len(keys)))[:-1]
+    out = np.empty(len(counts))
+    for key, rows in zip(keys, np.split(order, bounds)):
+        out[rows] = fc_ratios(counts[rows], idxs.get(key, default))
+    return out
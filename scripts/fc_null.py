@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+r"""
+fc_null.py – batched shuffled‑orbit null model for the FC ratio
+---------------------------------------------------------------
+Scores the *real* RSCU matrix under N random orbit relabellings.  The N
+permutations are drawn up front as an (N × 64) index array and the median
+σ_intra/σ_inter over species is kept per permutation.
+
+RSCU is computed once with the real degeneracies; relabelling codon c with
+orbit labels[perm[c]] only changes which codons are pooled, so a whole batch
+of permutations reduces to one matrix product against the RSCU matrix:
+
+    S   = rscu @ W          W[c, (b, k)] = [group[perm_b[c]] == k]
+
+S holds the per‑orbit RSCU sums; Σ rscu and Σ rscu² do not depend on the
+permutation.  Both σ's follow from these moments (Σ intra = 0, Σ intra² =
+Σ rscu² − Σ_k S_k²/n_k), so no (n_species × 64) array is ever built per
+permutation.  This is fc_checker's shuffle(orbit) → sigma_ratio(rscu,
+shuffled) loop, for every species and permutation at once.
+
+Permutations are processed in chunks sized so the working set stays under
+`mem_mb` megabytes.
+
+    >>> perms = permutation_matrix(100_000, np.random.default_rng(2025))
+    >>> null = null_medians(freq, idx, perms, mem_mb=512)
+    >>> z, p = null_summary(observed_median, null)
+
+Multi‑core
+----------
+null_distribution() splits the budget into fixed blocks of BLOCK shuffles.
+Block i draws from child i of SeedSequence(seed).spawn(), so the combined
+null is bit‑identical whatever the worker count – workers only decide who
+scores which block.  The frequency matrix is copied once into shared memory
+and every worker maps it at start‑up; tasks carry only a seed and a size.
+
+    >>> null = null_distribution(freq, idx, 1_000_000, seed=2025, workers=64)
+
+Requires numpy
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from codon_index import OrbitIndex
+
+BLOCK = 4096        # shuffles per seeded block; fixed so --workers never
+                    # changes which permutations are drawn
+
+# per‑process state set up by _attach() in pool workers
+_WORKER = {}
+
+
+def frequency_matrix(counts) -> np.ndarray:
+    """Row‑normalised codon frequencies; all‑zero rows are dropped."""
+    counts = np.asarray(counts, dtype=float)
+    total = counts.sum(axis=1)
+    keep = total > 0
+    return counts[keep] / total[keep, None]
+
+
+def permutation_matrix(n_perm: int, rng: np.random.Generator) -> np.ndarray:
+    """(n_perm × 64) array whose rows are independent shuffles of 0..63."""
+    base = np.broadcast_to(np.arange(64, dtype=np.uint8), (n_perm, 64))
+    return rng.permuted(base, axis=1)
+
+
+def chunk_size(n_species: int, idx: OrbitIndex, mem_mb: float) -> int:
+    """Permutations per batch that keep the working set under mem_mb."""
+    # S, S² and the weighted S² (k floats each) plus ~6 per‑row temporaries
+    per_perm = 8 * max(n_species, 1) * (3 * len(idx.size) + 6)
+    return max(1, int(mem_mb * 2**20) // per_perm)
+
+
+def score_permutations(rscu: np.ndarray, idx: OrbitIndex, perms: np.ndarray) -> np.ndarray:
+    """Median σ_intra/σ_inter over species of the fixed *rscu* matrix, grouped
+    by every row of *perms*."""
+    n, b, k = len(rscu), len(perms), len(idx.size)
+    w = idx.onehot[perms]                                      # (b, 64, k)
+    s = (rscu @ w.transpose(1, 0, 2).reshape(64, b * k)).reshape(n, b, k)
+    r2 = np.einsum("ij,ij->i", rscu, rscu)[:, None]            # Σ rscu²
+    s1 = rscu.sum(axis=1)[:, None]                             # Σ rscu
+    q = (s * s) @ (1.0 / idx.size)                             # Σ inter²
+    var_inter = q - s1 * s1 / 64
+    var_intra = r2 - q
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = np.where(var_inter <= 0, np.nan, np.sqrt(var_intra / var_inter))
+    # nanmedian walks columns one by one; only pay for it when needed
+    return np.nanmedian(r, axis=0) if np.isnan(r).any() else np.median(r, axis=0)
+
+
+def null_medians(freq, idx: OrbitIndex, perms, mem_mb: float = 512,
+                 progress=None) -> np.ndarray:
+    """Score *perms* in memory‑bounded chunks; progress(done) after each one."""
+    rscu = np.asarray(freq) * idx.degen          # real weights, never shuffled
+    step = chunk_size(len(rscu), idx, mem_mb)
+    out = np.empty(len(perms))
+    for lo in range(0, len(perms), step):
+        hi = min(lo + step, len(perms))
+        out[lo:hi] = score_permutations(rscu, idx, perms[lo:hi])
+        if progress:
+            progress(hi)
+    return out
+
+
+def _block_perms(seed: np.random.SeedSequence, n_perm: int) -> np.ndarray:
+    return permutation_matrix(n_perm, np.random.default_rng(seed))
+
+
+def _attach(name, shape, idx, mem_mb):
+    shm = shared_memory.SharedMemory(name=name)
+    _WORKER.update(shm=shm, idx=idx, mem_mb=mem_mb,
+                   freq=np.ndarray(shape, dtype=float, buffer=shm.buf))
+
+
+def _score_block(seed, n_perm):
+    w = _WORKER
+    return null_medians(w["freq"], w["idx"], _block_perms(seed, n_perm), w["mem_mb"])
+
+
+def null_distribution(freq, idx: OrbitIndex, n_perm: int, seed: int = 2025,
+                      workers: int = 1, mem_mb: float = 512,
+                      progress=None) -> np.ndarray:
+    """Median ratio under n_perm seeded shuffles, optionally on a process pool.
+
+    mem_mb is the budget per worker; progress(done) is called as blocks finish.
+    """
+    freq = np.ascontiguousarray(freq, dtype=float)
+    sizes = [min(BLOCK, n_perm - lo) for lo in range(0, n_perm, BLOCK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    parts = [None] * len(sizes)
+    done = 0
+
+    if workers <= 1:
+        for i, (ss, n) in enumerate(zip(seeds, sizes)):
+            parts[i] = null_medians(freq, idx, _block_perms(ss, n), mem_mb)
+            done += n
+            if progress:
+                progress(done)
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(freq.nbytes, 1))
+    try:
+        np.ndarray(freq.shape, dtype=float, buffer=shm.buf)[:] = freq
+        with ProcessPoolExecutor(workers, initializer=_attach,
+                                 initargs=(shm.name, freq.shape, idx, mem_mb)) as ex:
+            futs = {ex.submit(_score_block, ss, n): i
+                    for i, (ss, n) in enumerate(zip(seeds, sizes))}
+            for fut in as_completed(futs):
+                i = futs[fut]
+                parts[i] = fut.result()
+                done += sizes[i]
+                if progress:
+                    progress(done)
+    finally:
+        shm.close()
+        shm.unlink()
+    return np.concatenate(parts) if parts else np.empty(0)
+
+
+def null_summary(observed: float, null):
+    """Z score and one‑sided empirical P (null ≤ observed) of *observed*."""
+    null = np.asarray(null, dtype=float)
+    null = null[np.isfinite(null)]
+    z = (observed - null.mean()) / null.std()
+    p = (np.count_nonzero(null <= observed) + 1) / (len(null) + 1)
+    return float(z), float(p)
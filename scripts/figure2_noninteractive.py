@@ -7,7 +7,12 @@ Non-interactive version that saves all plots without displaying them.
 Perfect for WSL/headless environments.
 
 Usage:
-    python figure2_noninteractive.py [data_file]
+    python figure2_noninteractive.py [data_file] [map_medians.tsv]
+
+Panel C is scored on data_file, or read from the map_medians.tsv written
+by `fc_checker.py --maps ncbi`.  All three codes score the same data_file,
+so the bars compare genetic codes on one dataset – not the former
+hard-coded values, which each came from a different organism group.
 """
 
 import sys
@@ -18,6 +23,12 @@ matplotlib.use('Agg')  # Use non-interactive backend
 import matplotlib.pyplot as plt
 from pathlib import Path
 from scipy import stats
+
+from codon_index import (AA_FAMILIES, SIXFOLD_SUBFAMILIES, codon_matrix, compile_orbit_map,
+                         family_map, group_cv)
+from cutg_cache import load_frame
+from fc_engine import fc_ratio_table
+from genetic_codes import orbit_registry
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -47,34 +58,19 @@ ORBIT_COLORS = {
 }
 
 # RNA codon families for detailed analysis
-CODON_FAMILIES = {
-    'Met': ['AUG'],
-    'Trp': ['UGG'],
-    'Phe': ['UUU', 'UUC'],
-    'Tyr': ['UAU', 'UAC'],
-    'Cys': ['UGU', 'UGC'],
-    'His': ['CAU', 'CAC'],
-    'Gln': ['CAA', 'CAG'],
-    'Asn': ['AAU', 'AAC'],
-    'Lys': ['AAA', 'AAG'],
-    'Asp': ['GAU', 'GAC'],
-    'Glu': ['GAA', 'GAG'],
-    'Stop': ['UAA', 'UAG', 'UGA'],
-    'Ile': ['AUU', 'AUC', 'AUA'],
-    'Val': ['GUU', 'GUC', 'GUA', 'GUG'],
-    'Pro': ['CCU', 'CCC', 'CCA', 'CCG'],
-    'Thr': ['ACU', 'ACC', 'ACA', 'ACG'],
-    'Ala': ['GCU', 'GCC', 'GCA', 'GCG'],
-    'Gly': ['GGU', 'GGC', 'GGA', 'GGG'],
-    'Ser': ['UCU', 'UCC', 'UCA', 'UCG', 'AGU', 'AGC'],
-    'Leu': ['UUA', 'UUG', 'CUU', 'CUC', 'CUA', 'CUG'],
-    'Arg': ['CGU', 'CGC', 'CGA', 'CGG', 'AGA', 'AGG']
-}
+CODON_FAMILIES = AA_FAMILIES
+
+# Panel C bars: label and NCBI translation table id of each genetic code
+VARIANT_CODES = [
+    ('Standard\nNuclear', 1),
+    ('Mitochondrial\nVariant', 2),
+    ('Ciliate\nNuclear', 6),
+]
 
 def load_codon_data(filepath):
     """Load codon usage data with proper preprocessing."""
     try:
-        df = pd.read_csv(filepath, sep='\t', low_memory=False)
+        df = load_frame(filepath)
         print(f"Loaded {len(df)} species from {filepath}")
         
         # Find codon columns and convert DNA->RNA if needed
@@ -107,32 +103,21 @@ def calculate_family_cvs(df, codon_cols, max_species=5000):
     else:
         df_sample = df
     
+    # CV of every family for every sampled species in one grouped reduction
+    idx = compile_orbit_map(family_map(CODON_FAMILIES))
+    cv = group_cv(np.clip(codon_matrix(df_sample), 0, None), idx)
+    column = {name: k for k, name in enumerate(idx.labels)}
+
     family_cv_data = {}
     
     for family_name, codons in CODON_FAMILIES.items():
-        available_codons = [c for c in codons if c in codon_cols]
-        
-        if len(available_codons) > 1:  # Need multiple codons for CV calculation
-            cvs = []
-            
-            for idx, row in df_sample.iterrows():
-                # Get codon counts for this family
-                counts = []
-                for codon in available_codons:
-                    if codon in row.index and not pd.isna(row[codon]):
-                        counts.append(max(0, row[codon]))
-                
-                if len(counts) == len(available_codons) and sum(counts) > 0:
-                    # Calculate coefficient of variation
-                    mean_count = np.mean(counts)
-                    std_count = np.std(counts, ddof=1)
-                    if mean_count > 0:
-                        cv = std_count / mean_count
-                        cvs.append(cv)
+        if len(codons) > 1:  # Need multiple codons for CV calculation
+            cvs = cv[:, column[family_name]]
+            cvs = cvs[np.isfinite(cvs)].tolist()
             
             if cvs:
                 family_cv_data[family_name] = cvs
-                orbit_size = len(available_codons)
+                orbit_size = len(codons)
                 print(f"{family_name} ({orbit_size}-fold): {len(cvs)} species, median CV = {np.median(cvs):.3f}")
     
     return family_cv_data
@@ -232,12 +217,12 @@ def create_figure2b_sixfold_structure(family_cv_data, df, codon_cols, output_pat
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
     
     # Serine subfamilies: UC* (4 codons) vs AG* (2 codons) 
-    ser_uc = ['UCU', 'UCC', 'UCA', 'UCG']
-    ser_ag = ['AGU', 'AGC']
+    ser_uc = SIXFOLD_SUBFAMILIES['Ser']['UC']
+    ser_ag = SIXFOLD_SUBFAMILIES['Ser']['AG']
     
     # Leucine subfamilies: CU* (4 codons) vs UU* (2 codons)
-    leu_cu = ['CUU', 'CUC', 'CUA', 'CUG'] 
-    leu_uu = ['UUA', 'UUG']
+    leu_cu = SIXFOLD_SUBFAMILIES['Leu']['CU']
+    leu_uu = SIXFOLD_SUBFAMILIES['Leu']['UU']
     
     # Sample subset for detailed analysis
     df_subset = df.sample(n=min(1000, len(df)), random_state=42)
@@ -247,17 +232,12 @@ def create_figure2b_sixfold_structure(family_cv_data, df, codon_cols, output_pat
         ser_uc_available = [c for c in ser_uc if c in codon_cols]
         ser_ag_available = [c for c in ser_ag if c in codon_cols]
         
-        uc_fractions = []
-        ag_fractions = []
-        
-        for _, row in df_subset.iterrows():
-            uc_total = sum(row[c] for c in ser_uc_available if c in row.index and not pd.isna(row[c]))
-            ag_total = sum(row[c] for c in ser_ag_available if c in row.index and not pd.isna(row[c]))
-            total = uc_total + ag_total
-            
-            if total > 0:
-                uc_fractions.append(uc_total / total)
-                ag_fractions.append(ag_total / total)
+        uc_total = df_subset[ser_uc_available].sum(axis=1).to_numpy(dtype=float)
+        ag_total = df_subset[ser_ag_available].sum(axis=1).to_numpy(dtype=float)
+        total = uc_total + ag_total
+        keep = total > 0
+        uc_fractions = (uc_total[keep] / total[keep]).tolist()
+        ag_fractions = (ag_total[keep] / total[keep]).tolist()
         
         # Box plots for Serine subfamilies
         if uc_fractions and ag_fractions:
@@ -284,17 +264,12 @@ def create_figure2b_sixfold_structure(family_cv_data, df, codon_cols, output_pat
         leu_cu_available = [c for c in leu_cu if c in codon_cols]
         leu_uu_available = [c for c in leu_uu if c in codon_cols]
         
-        cu_fractions = []
-        uu_fractions = []
-        
-        for _, row in df_subset.iterrows():
-            cu_total = sum(row[c] for c in leu_cu_available if c in row.index and not pd.isna(row[c]))
-            uu_total = sum(row[c] for c in leu_uu_available if c in row.index and not pd.isna(row[c]))
-            total = cu_total + uu_total
-            
-            if total > 0:
-                cu_fractions.append(cu_total / total)
-                uu_fractions.append(uu_total / total)
+        cu_total = df_subset[leu_cu_available].sum(axis=1).to_numpy(dtype=float)
+        uu_total = df_subset[leu_uu_available].sum(axis=1).to_numpy(dtype=float)
+        total = cu_total + uu_total
+        keep = total > 0
+        cu_fractions = (cu_total[keep] / total[keep]).tolist()
+        uu_fractions = (uu_total[keep] / total[keep]).tolist()
         
         # Box plots for Leucine subfamilies
         if cu_fractions and uu_fractions:
@@ -322,12 +297,28 @@ def create_figure2b_sixfold_structure(family_cv_data, df, codon_cols, output_pat
     plt.close()  # Close figure to free memory
     print(f"✓ Saved Figure 2B: {output_path / 'Figure2B_sixfold_structure.png'}")
 
-def create_figure2c_variant_codes(output_path):
+def variant_code_medians(df, medians_file=None):
+    """Median FC ratio under each VARIANT_CODES genetic code.
+
+    Every code is scored on the same rows of *df* (or read from the
+    fc_checker --maps medians of one run).
+    """
+    tables = [table_id for _, table_id in VARIANT_CODES]
+    maps = orbit_registry('ncbi:' + ','.join(map(str, tables)))
+    keys = [next(name for name, (t, _) in maps.items() if t == table_id)
+            for table_id in tables]
+    if medians_file:
+        medians = pd.read_csv(medians_file, sep='\t').set_index('map')['median']
+        return [float(medians[key]) for key in keys]
+    
+    # One frequency pass over the data, one ratio column per code
+    table = fc_ratio_table(codon_matrix(df), [compile_orbit_map(maps[key][1]) for key in keys])
+    return [float(np.nanmedian(table[:, j])) for j in range(len(keys))]
+
+def create_figure2c_variant_codes(output_path, fc_ratios):
     """Create Panel C: Genetic code variant validation bar chart."""
     
-    # Data from handover document - proven results
-    variants = ['Standard\nNuclear', 'Mitochondrial\nVariant', 'Ciliate\nNuclear']
-    fc_ratios = [4.809, 4.949, 5.734]
+    variants = [label for label, _ in VARIANT_CODES]
     colors = ['#4472C4', '#70AD47', '#FFC000']  # Professional color scheme
     
     fig, ax = plt.subplots(figsize=(10, 6))
@@ -340,23 +331,21 @@ def create_figure2c_variant_codes(output_path):
         ax.text(bar.get_x() + bar.get_width()/2., height + 0.05,
                 f'{ratio:.3f}', ha='center', va='bottom', fontweight='bold', fontsize=12)
     
-    # Add improvement percentages
-    mito_improvement = ((4.949 - 4.809) / 4.809) * 100
-    ciliate_improvement = ((5.734 - 4.809) / 4.809) * 100
-    
-    ax.text(1, 4.949 + 0.2, f'+{mito_improvement:.1f}%', ha='center', va='bottom', 
-            fontsize=10, color='green', fontweight='bold')
-    ax.text(2, 5.734 + 0.2, f'+{ciliate_improvement:.1f}%', ha='center', va='bottom', 
-            fontsize=10, color='green', fontweight='bold')
+    # Add change relative to the standard code
+    standard = fc_ratios[0]
+    for i, ratio in enumerate(fc_ratios[1:], start=1):
+        change = ((ratio - standard) / standard) * 100
+        ax.text(i, ratio + 0.2, f'{change:+.1f}%', ha='center', va='bottom', 
+                fontsize=10, color='green' if change >= 0 else 'red', fontweight='bold')
     
     ax.set_ylabel('σ_intra / σ_inter')
     ax.set_title('Genetic Code Variant Validation\n(FC Compliance Improvements Through Orbit Mergers)')
-    ax.set_ylim(0, 6.5)
+    ax.set_ylim(0, max(6.5, 1.15 * max(fc_ratios)))
     ax.grid(True, alpha=0.3, axis='y')
     
     # Add explanatory text
     ax.text(0.02, 0.98, 
-            'Higher ratios = better FC compliance\nCiliate code shows 19.2% improvement', 
+            f'Higher ratios = better FC compliance\nCiliate code: {(fc_ratios[2] - standard) / standard * 100:+.1f}% vs standard', 
             transform=ax.transAxes, va='top', ha='left',
             bbox=dict(boxstyle='round', facecolor='lightyellow', alpha=0.8),
             fontsize=10)
@@ -409,7 +398,8 @@ def main():
     create_figure2b_sixfold_structure(family_cv_data, df, codon_cols, output_dir)
     
     print("\n📈 Panel C: Variant code validation...")
-    create_figure2c_variant_codes(output_dir)
+    medians_file = sys.argv[2] if len(sys.argv) > 2 else None
+    create_figure2c_variant_codes(output_dir, variant_code_medians(df, medians_file))
     
     print("\n🎉 FIGURE 2 GENERATION COMPLETE!")
     print("=" * 70)
@@ -421,4 +411,4 @@ def main():
     print("\n✅ Ready for publication!")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -17,11 +17,30 @@ Usage:
     python fix_hive_header.py refseq_cds.tsv 
 Produces:
     refseq_cds_fixed.tsv
+
+The body is streamed, not parsed: FIXED_HEADER is written, then the rows
+are copied in BLOCK‑sized binary chunks.  When the dump carries the extra
+trailing field, each block has it cut off per line (one vectorised byte
+mask when every line ends in an empty field); when it does not, the body is
+copied by the kernel (copy_file_range / sendfile).  Memory use is constant
+and the run time close to cp.  --in-memory keeps the original pandas
+round trip (which re‑quotes fields and rewrites line endings).
+
+A compressed dump (refseq_cds.tsv.gz, .bz2, .xz, .zst) is decompressed in a
+background thread and the fixed table is written with the same compression
+(refseq_cds_fixed.tsv.gz).
 """
 
+import argparse
+import os
+import shutil
 import sys
 from pathlib import Path
+import numpy as np
 import pandas as pd
+
+from cutg_compress import is_compressed, open_input, open_output, split_compression
+from cutg_telemetry import Telemetry
  
 # The exact, correct header line for the CUTG refseq_cds dump:
 
@@ -48,19 +67,119 @@ FIXED_HEADER = [
     "GGT","GGC","GGA","GGG",
 ]
  
-def main(raw_path: Path):
+BLOCK = 1 << 24      # bytes per streamed block
+SNIFF_LINES = 1000   # body lines checked for the field count
+
+
+def sniff_fields(raw_path: Path) -> int:
+    """Field count shared by the first SNIFF_LINES body lines (exit if they differ)."""
+    counts = set()
+    with open_input(raw_path, "rb") as f:
+        f.readline()
+        for _, line in zip(range(SNIFF_LINES), f):
+            counts.add(line.rstrip(b"\r\n").count(b"\t") + 1)
+    if len(counts) > 1:
+        sys.exit(f"Rows have differing field counts {sorted(counts)}. Check input data manually.")
+    return counts.pop() if counts else len(FIXED_HEADER)
+
+
+def strip_last_field(block: bytes) -> bytes:
+    """Drop the final field of every line in a block (the last may lack its newline)."""
+    if block and not block.endswith(b"\n"):
+        return strip_last_field(block + b"\n")[:-1]
+    a = np.frombuffer(block, dtype=np.uint8)
+    nl = np.flatnonzero(a == 10)
+    tab = nl - 1
+    if len(tab) and tab[0] >= 1:
+        tab -= a[tab] == 13                              # \t\r\n line ends
+        tabs = np.diff(np.searchsorted(np.flatnonzero(a == 9), nl), prepend=0)
+        # every line has the extra (empty) field: cut one byte per line
+        if (a[tab] == 9).all() and (tabs == len(FIXED_HEADER)).all():
+            keep = np.ones(len(a), dtype=bool)
+            keep[tab] = False
+            return a[keep].tobytes()
+    out = []
+    for line in block.splitlines(keepends=True):
+        body = line.rstrip(b"\r\n")
+        if body.count(b"\t") == len(FIXED_HEADER):
+            line = body.rpartition(b"\t")[0] + line[len(body):]
+        out.append(line)
+    return b"".join(out)
+
+
+def _copy_rest(src, dst) -> None:
+    """Copy src from its position to EOF onto dst, in the kernel if possible."""
+    dst.flush()
+    fin, fout, offset = src.fileno(), dst.fileno(), src.tell()
+    copy = getattr(os, "copy_file_range", None)
+    if copy is None and hasattr(os, "sendfile"):
+        def copy(fin, fout, count, offset):
+            return os.sendfile(fout, fin, offset, count)
+    try:
+        while copy:
+            n = copy(fin, fout, BLOCK, offset)
+            if not n:
+                return
+            offset += n
+    except OSError:
+        pass                     # filesystem or platform refuses; copy in user space
+    src.seek(offset)
+    shutil.copyfileobj(src, dst, BLOCK)
+
+
+def stream_fix(raw_path: Path, fixed_path: Path) -> None:
+    """Write FIXED_HEADER then the body of raw_path, trailing field removed if present."""
+    fields = sniff_fields(raw_path)
+    if fields not in (len(FIXED_HEADER), len(FIXED_HEADER) + 1):
+        print(f"Column mismatch detected. Data columns: {fields}, Header columns: {len(FIXED_HEADER)}")
+        sys.exit("Column mismatch. Check input data manually.")
+
+    with open_input(raw_path, "rb") as src, open_output(fixed_path, "wb") as dst:
+        src.readline()
+        dst.write("\t".join(FIXED_HEADER).encode() + b"\n")
+        if fields == len(FIXED_HEADER):
+            if is_compressed(raw_path) or is_compressed(fixed_path):
+                shutil.copyfileobj(src, dst, BLOCK)
+            else:
+                _copy_rest(src, dst)
+            return
+        print("Extra column detected, dropping the last column...")
+        tail = b""
+        for block in iter(lambda: src.read(BLOCK), b""):
+            block = tail + block
+            cut = block.rfind(b"\n") + 1
+            dst.write(strip_last_field(block[:cut]))
+            tail = block[cut:]
+        if tail:
+            dst.write(strip_last_field(tail))
+
+
+def main(raw_path: Path, in_memory: bool = False, telemetry: str = None):
     if not raw_path.exists():
         print(f"PROBLEM: File not found: {raw_path}")
         sys.exit(f"File not found: {raw_path}")
 
     print(f"entered Main")
 
-    fixed_path = raw_path.with_name(raw_path.stem + "_fixed.tsv")
+    base, ext = split_compression(raw_path)
+    fixed_path = base.with_name(base.stem + "_fixed.tsv" + ext)
     print(f"Reading broken file: {raw_path}")
     print(f"Writing fixed file:  {fixed_path}")
 
-    body = pd.read_csv(raw_path, sep="\t", skiprows=1, header=None,
-                       dtype=str, low_memory=False)
+    tel = Telemetry("fix_hive_header", telemetry)
+    if not in_memory:
+        with tel.stage("stream_fix", nbytes=raw_path.stat().st_size):
+            stream_fix(raw_path, fixed_path)
+        tel.close()
+        print("Header fixed. Downstream workflows should now use:")
+        print(f"    {fixed_path}")
+        return
+
+    read = tel.stage("read", nbytes=raw_path.stat().st_size)
+    with read as st:
+        body = pd.read_csv(raw_path, sep="\t", skiprows=1, header=None,
+                           dtype=str, low_memory=False)
+        st(len(body))
 
     # Drop the extraneous final column (column index 76):
     if len(body.columns) == len(FIXED_HEADER) + 1:
@@ -75,13 +194,22 @@ def main(raw_path: Path):
     body.columns = FIXED_HEADER
     body = body[FIXED_HEADER]
 
-    body.to_csv(fixed_path, sep="\t", index=False, header=FIXED_HEADER)
+    with tel.stage("write") as st:
+        body.to_csv(fixed_path, sep="\t", index=False, header=FIXED_HEADER)
+        st(len(body))
+    tel.close()
 
     print("Header fixed. Downstream workflows should now use:")
     print(f"    {fixed_path}")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        sys.exit(f"Usage: python {sys.argv[0]} <broken_tsv_file>")
-    main(Path(sys.argv[1]))
+    ap = argparse.ArgumentParser(description="Replace the broken header of a CUTG HIVE dump.")
+    ap.add_argument("broken_tsv_file", type=Path)
+    ap.add_argument("--in-memory", action="store_true",
+                    help="parse and rewrite the whole body with pandas (the old behaviour)")
+    ap.add_argument("--telemetry", metavar="FILE",
+                    help="append JSON-lines timing/throughput/RSS records here "
+                         "[$CUTG_TELEMETRY]")
+    args = ap.parse_args()
+    main(args.broken_tsv_file, args.in_memory, args.telemetry)
 
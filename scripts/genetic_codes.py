@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+r"""
+genetic_codes.py – NCBI translation tables as orbit maps
+--------------------------------------------------------
+Built‑in registry of the NCBI genetic codes (the "Translation Table" numbers
+used by CUTG and GenBank), each stored as NCBI's 64‑letter amino‑acid string
+in TCAG order – the same order as CODON_ORDER.
+
+The orbit of a codon is the size of its synonymous family, stop codons
+counting as one family, so
+
+    >>> orbit_map(1) == STANDARD_ORBITS          # orbit_map.csv
+    True
+    >>> orbit_map(6)["UAA"]                      # ciliate: UAA/UAG → Gln
+    4
+
+orbit_registry() resolves a --maps argument into {name: (table id, orbit
+map)}: a directory of orbit‑map CSVs (one map per file, named after the
+file, table id None), else exactly "ncbi" (every table below) or a comma
+list such as "ncbi:1,2,6".
+
+table_indexes() compiles every table for per‑row dispatch on a CUTG
+"Translation Table" column (fc_engine.fc_ratios_by_code).
+
+    $ python genetic_codes.py                    # list the registry
+
+Requires numpy pandas
+"""
+
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from codon_index import (CODON_ORDER, STANDARD_ORBITS, OrbitIndex,  # noqa: F401
+                         compile_orbit_map, to_rna)
+
+# table id → (name, amino acids for the 64 codons in TCAG order; * = stop)
+NCBI_TABLES = {
+    1: ("Standard",
+        "FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    2: ("Vertebrate Mitochondrial",
+        "FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNKKSS**VVVVAAAADDEEGGGG"),
+    3: ("Yeast Mitochondrial",
+        "FFLLSSSSYY**CCWWTTTTPPPPHHQQRRRRIIMMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    4: ("Mold, Protozoan, Coelenterate Mitochondrial; Mycoplasma",
+        "FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    5: ("Invertebrate Mitochondrial",
+        "FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNKKSSSSVVVVAAAADDEEGGGG"),
+    6: ("Ciliate, Dasycladacean and Hexamita Nuclear",
+        "FFLLSSSSYYQQCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    9: ("Echinoderm and Flatworm Mitochondrial",
+        "FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNNKSSSSVVVVAAAADDEEGGGG"),
+    10: ("Euplotid Nuclear",
+         "FFLLSSSSYY**CCCWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    11: ("Bacterial, Archaeal and Plant Plastid",
+         "FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    12: ("Alternative Yeast Nuclear",
+         "FFLLSSSSYY**CC*WLLLSPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    13: ("Ascidian Mitochondrial",
+         "FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNKKSSGGVVVVAAAADDEEGGGG"),
+    14: ("Alternative Flatworm Mitochondrial",
+         "FFLLSSSSYYY*CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNNKSSSSVVVVAAAADDEEGGGG"),
+    15: ("Blepharisma Nuclear",
+         "FFLLSSSSYY*QCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    16: ("Chlorophycean Mitochondrial",
+         "FFLLSSSSYY*LCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    21: ("Trematode Mitochondrial",
+         "FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNNKSSSSVVVVAAAADDEEGGGG"),
+    22: ("Scenedesmus obliquus Mitochondrial",
+         "FFLLSS*SYY*LCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    23: ("Thraustochytrium Mitochondrial",
+         "FF*LSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    24: ("Rhabdopleuridae Mitochondrial",
+         "FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSSKVVVVAAAADDEEGGGG"),
+    25: ("Candidate Division SR1 and Gracilibacteria",
+         "FFLLSSSSYY**CCGWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    26: ("Pachysolen tannophilus Nuclear",
+         "FFLLSSSSYY**CC*WLLLAPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    27: ("Karyorelict Nuclear",
+         "FFLLSSSSYYQQCCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    28: ("Condylostoma Nuclear",
+         "FFLLSSSSYYQQCCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    29: ("Mesodinium Nuclear",
+         "FFLLSSSSYYYYCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    30: ("Peritrich Nuclear",
+         "FFLLSSSSYYEECC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    31: ("Blastocrithidia Nuclear",
+         "FFLLSSSSYYEECCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"),
+    33: ("Cephalodiscidae Mitochondrial",
+         "FFLLSSSSYYY*CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSSKVVVVAAAADDEEGGGG"),
+}
+
+
+def code_families(table: int) -> Dict[str, List[str]]:
+    """{one‑letter amino acid (or '*'): [RNA codons]} for an NCBI table."""
+    fams = {}
+    for codon, aa in zip(CODON_ORDER, NCBI_TABLES[table][1]):
+        fams.setdefault(aa, []).append(codon)
+    return fams
+
+
+def orbit_map(table: int) -> Dict[str, int]:
+    """{codon: orbit size} for an NCBI table, in CODON_ORDER."""
+    fams = code_families(table)
+    aas = NCBI_TABLES[table][1]
+    return {c: len(fams[aa]) for c, aa in zip(CODON_ORDER, aas)}
+
+
+def table_indexes() -> Dict[int, OrbitIndex]:
+    """{table id: compiled orbit map} for every NCBI table (cached per map)."""
+    return {t: compile_orbit_map(orbit_map(t)) for t in NCBI_TABLES}
+
+
+def read_orbit_map(path) -> Dict[str, int]:
+    """Orbit‑map CSV → {codon: orbit}.
+
+    Accepts the repo's variants: headerless codon,orbit; a codon,orbit header;
+    '#' comment lines; and the codon,amino_acid,orbit_size,… layout.
+    """
+    df = pd.read_csv(path, header=None, comment="#", dtype=str, skipinitialspace=True)
+    if not df.iloc[0, 1].strip().lstrip("-").isdigit():
+        df.columns = [str(c).strip().lower() for c in df.iloc[0]]
+        df = df.iloc[1:]
+        col = next((c for c in ("orbit", "orbit_size") if c in df.columns), df.columns[1])
+    else:
+        col = 1
+    orbit = {to_rna(c.strip()): int(v) for c, v in zip(df.iloc[:, 0], df[col])}
+    if len(df) != 64 or set(orbit) != set(CODON_ORDER):
+        raise ValueError(f"{path}: orbit map must list each codon exactly once")
+    return {c: orbit[c] for c in CODON_ORDER}
+
+
+def orbit_registry(spec: str) -> Dict[str, Tuple[Optional[int], Dict[str, int]]]:
+    """Resolve a directory of CSVs, "ncbi" or "ncbi:1,2,6" into
+    {name: (NCBI table id or None, orbit map)}."""
+    if Path(spec).is_dir():
+        maps = {}
+        for path in sorted(Path(spec).glob("*.csv")):
+            try:
+                maps[path.stem] = (None, read_orbit_map(path))
+            except (ValueError, IndexError) as e:
+                print(f"  skipping {path.name}: {e}")
+        if not maps:
+            raise ValueError(f"no orbit maps found in {spec}")
+        return maps
+
+    m = re.fullmatch(r"ncbi(?::(\d+(?:,\d+)*))?", spec.strip(), re.IGNORECASE)
+    if not m:
+        raise ValueError(f'expected a directory of orbit maps, "ncbi" or "ncbi:1,2,6": {spec}')
+    tables = [int(t) for t in m.group(1).split(",")] if m.group(1) else list(NCBI_TABLES)
+    unknown = [t for t in tables if t not in NCBI_TABLES]
+    if unknown:
+        raise ValueError(f"unknown NCBI translation table(s): {unknown}")
+    return {f"ncbi{t}": (t, orbit_map(t)) for t in tables}
+
+
+def main():
+    for t, (name, _) in NCBI_TABLES.items():
+        sizes = sorted(set(orbit_map(t).values()))
+        print(f"{t:3d}  {name:55s} orbits {sizes}")
+
+
+if __name__ == "__main__":
+    main()
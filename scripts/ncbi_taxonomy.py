@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+r"""
+ncbi_taxonomy.py – clade membership from a local NCBI taxonomy dump
+-------------------------------------------------------------------
+Genus‑name matching (extract_ciliates.CILIATE_GENERA) misses most members of
+a clade and needs a code edit for every new one.  Given the NCBI taxdump
+files (nodes.dmp, names.dmp – plain or compressed, cutg_compress.py), the
+tree is laid out once into
+
+    <dump>/.cutg_cache/nodes.dmp.tree/
+        parent.npy              parent Taxid, indexed by Taxid (-1: no such node)
+        entry.npy, exit.npy     Euler‑tour (pre‑order) interval of each Taxid
+        rank.npy                rank code per Taxid (labels in stamp.json)
+        names.bin, names.off    lower‑cased scientific (and unique) names, sorted
+        text.bin, text.off      the same names as spelled in names.dmp
+        name_taxid.npy          Taxid of each of those names
+        sci.npy                 Taxid → its scientific name's entry
+        stamp.json              fingerprints of both files, rank labels
+
+A Taxid lies under a clade exactly when its entry falls inside the clade's
+[entry, exit) interval, so "every Taxid under Ciliophora" is two array
+lookups and two comparisons over a whole Taxid column:
+
+    >>> tax = Taxonomy.open("taxdump")
+    >>> tax.resolve("Ciliophora")                        # name or Taxid → Taxid
+    5878
+    >>> mask = tax.under(df["Taxid"], "Ciliophora")      # bool array, one per row
+    >>> tax.lineage(5911)                                # Tetrahymena thermophila …
+
+Names are matched case‑insensitively against scientific names and NCBI's
+disambiguated unique names ("Morus <plant>"); an ambiguous name raises
+ValueError listing the candidates.  Taxids that are blank, non‑numeric or
+absent from the dump are under no clade.  The cache is rebuilt when either
+file's fingerprint changes (cutg_cache.fingerprint; CUTG_CACHE_DIR is
+honoured).  The dump directory defaults to $NCBI_TAXONOMY.
+
+    $ python ncbi_taxonomy.py taxdump --clade Ciliophora --count AGG/genbank_codon_species.tsv
+
+Requires numpy pandas
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from cutg_cache import (cache_dir, fingerprint, publish, read_stamp, source_matches,
+                        stage_dir, write_stamp)
+from cutg_compress import SUFFIXES, open_input
+from species_index import Strings, blob
+
+VERSION = 1
+DUMP_ENV = "NCBI_TAXONOMY"
+FILES = ("nodes.dmp", "names.dmp")
+MAX_DEPTH = 1_000       # deeper than any real lineage; guards against parent cycles
+
+Clade = Union[int, str]
+
+
+def dump_file(dump, name: str) -> Path:
+    """*name* (nodes.dmp / names.dmp) in the dump directory, possibly compressed."""
+    dump = Path(dump)
+    for suffix in ("",) + SUFFIXES:
+        path = dump / (name + suffix)
+        if path.exists():
+            return path
+    raise FileNotFoundError(f"{dump}: no {name} (NCBI taxdump) found")
+
+
+def tree_dir(dump) -> Path:
+    where = cache_dir(dump_file(dump, "nodes.dmp"))
+    return where.with_name(where.name + ".tree")
+
+
+def _read_dmp(path: Path, cols: List[int], names: List[str]) -> pd.DataFrame:
+    """Columns of a "\t|\t"‑separated .dmp file (field k is tab column 2k)."""
+    with open_input(path, "rb") as f:
+        return pd.read_csv(f, sep="\t", header=None, usecols=cols,
+                           dtype=str, quoting=3, keep_default_na=False,
+                           engine="c").set_axis(names, axis=1)
+
+
+def euler_intervals(parent: np.ndarray, order: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pre‑order entry and exit (entry + subtree size) of every node.
+
+    *parent* holds each node's parent as a node index (-1 for roots); siblings
+    are visited in *order* (e.g. by Taxid).  Done a tree level at a time, so
+    the work is vectorized over all nodes of a level.
+    """
+    n = len(parent)
+    depth = np.zeros(n, dtype=np.int32)
+    anc = parent.copy()
+    for _ in range(MAX_DEPTH):
+        live = anc >= 0
+        if not live.any():
+            break
+        depth[live] += 1
+        anc[live] = parent[anc[live]]
+    else:
+        raise ValueError(f"taxonomy has a parent cycle or is deeper than {MAX_DEPTH}")
+
+    levels = [np.flatnonzero(depth == d) for d in range(depth.max() + 1 if n else 0)]
+    size = np.ones(n, dtype=np.int64)
+    for nodes in reversed(levels[1:]):
+        size += np.bincount(parent[nodes], weights=size[nodes], minlength=n).astype(np.int64)
+
+    entry = np.zeros(n, dtype=np.int64)
+    for d, nodes in enumerate(levels):
+        up = parent[nodes] if d else np.full(len(nodes), -1)
+        nodes = nodes[np.lexsort((order[nodes], up))]
+        up = parent[nodes] if d else np.full(len(nodes), -1)
+        before = np.cumsum(size[nodes]) - size[nodes]
+        first = np.r_[True, up[1:] != up[:-1]] if len(nodes) else np.zeros(0, bool)
+        before -= before[np.flatnonzero(first)][np.cumsum(first) - 1]
+        entry[nodes] = (entry[up] + 1 if d else 0) + before
+    return entry, entry + size
+
+
+def build(dump, where: Path = None) -> Path:
+    """Parse nodes.dmp and names.dmp once into the tree directory."""
+    nodes_path, names_path = (dump_file(dump, f) for f in FILES)
+    where = where or tree_dir(dump)
+    tmp = stage_dir(where)
+
+    stamp = {"nodes": fingerprint(nodes_path), "names": fingerprint(names_path)}
+    nodes = _read_dmp(nodes_path, [0, 2, 4], ["taxid", "parent", "rank"])
+    taxid = nodes["taxid"].astype(np.int64).to_numpy()
+    top = int(taxid.max()) + 1 if len(taxid) else 0
+    dense = np.full(top, -1, dtype=np.int64)
+    dense[taxid] = np.arange(len(taxid))
+
+    # parent as a node index; the root (its own parent) and orphans become roots
+    up = nodes["parent"].astype(np.int64).to_numpy()
+    known = (up >= 0) & (up < top)
+    pidx = np.full(len(taxid), -1, dtype=np.int64)
+    pidx[known] = dense[up[known]]
+    pidx[pidx == np.arange(len(taxid))] = -1
+    entry, exit_ = euler_intervals(pidx, taxid)
+
+    rank_codes, rank_labels = pd.factorize(nodes["rank"])
+    by_taxid = {"parent": np.where(pidx >= 0, taxid[np.maximum(pidx, 0)], -1),
+                "entry": entry, "exit": exit_, "rank": rank_codes}
+    for name, values in by_taxid.items():
+        arr = np.full(top, -1, dtype=np.int32 if name != "rank" else np.int16)
+        arr[taxid] = values
+        np.save(tmp / f"{name}.npy", arr)
+
+    # scientific names (and unique names) → Taxid, sorted for binary search
+    names = _read_dmp(names_path, [0, 2, 4, 6], ["taxid", "name", "unique", "kind"])
+    names = names[names["kind"] == "scientific name"]
+    sci_taxid = names["taxid"].astype(np.int64).to_numpy()
+    uniq = names["unique"] != ""
+    keys = pd.DataFrame({"key": pd.concat([names["name"], names.loc[uniq, "unique"]]).str.lower(),
+                         "taxid": np.r_[sci_taxid, sci_taxid[uniq.to_numpy()]],
+                         "sci": np.r_[np.ones(len(names), bool), np.zeros(uniq.sum(), bool)],
+                         "text": pd.concat([names["name"], names.loc[uniq, "unique"]])})
+    keys = keys.sort_values(["key", "taxid"], kind="stable", ignore_index=True)
+    bin_, off = blob(keys["key"].tolist())
+    (tmp / "names.bin").write_bytes(bin_)
+    text_bin, text_off = blob(keys["text"].tolist())
+    (tmp / "text.bin").write_bytes(text_bin)
+    sci = np.full(top, -1, dtype=np.int32)
+    rows = np.flatnonzero(keys["sci"].to_numpy())
+    ok = keys["taxid"].to_numpy()[rows] < top
+    sci[keys["taxid"].to_numpy()[rows][ok]] = rows[ok]
+    for name, arr in {"names.off": off, "text.off": text_off, "sci": sci,
+                      "name_taxid": keys["taxid"].to_numpy(dtype=np.int64)}.items():
+        np.save(tmp / f"{name}.npy", arr)
+
+    stamp.update(version=VERSION, nodes_count=len(taxid), names_count=len(keys),
+                 ranks=[str(r) for r in rank_labels])
+    write_stamp(tmp, stamp)
+    return publish(tmp, where, lambda: is_fresh(dump, where))
+
+
+def is_fresh(dump, where: Path = None) -> bool:
+    stamp = read_stamp(where or tree_dir(dump))
+    if not stamp or stamp.get("version") != VERSION:
+        return False
+    return all(source_matches(stamp[key], dump_file(dump, name))
+               for key, name in zip(("nodes", "names"), FILES))
+
+
+def taxid_array(taxids) -> np.ndarray:
+    """A Taxid column (ints, floats or strings, blanks allowed) as int64, -1 where unusable."""
+    arr = np.asarray(taxids)
+    out = np.full(len(arr), -1, dtype=np.int64)
+    if arr.dtype.kind in "iu":
+        out[arr >= 0] = arr[arr >= 0]
+    elif arr.dtype.kind == "f":
+        ok = np.isfinite(arr) & (arr >= 0) & (arr == np.floor(arr))
+        out[ok] = arr[ok]
+    else:
+        try:                                    # the usual case: all plain integers
+            out[:] = pd.Series(arr, dtype=object).astype(np.int64)
+            out[out < 0] = -1
+            return out
+        except (TypeError, ValueError, OverflowError):
+            pass
+        text = pd.Series(arr.astype(str)).str.strip()
+        ok = text.str.fullmatch(r"\d{1,18}").to_numpy(dtype=bool)
+        out[ok] = text[ok].astype(np.int64)
+    return out
+
+
+class Taxonomy:
+    """Memory‑mapped tree of one NCBI taxonomy dump."""
+
+    def __init__(self, where: Path):
+        stamp = read_stamp(where)
+        load = lambda name: np.load(where / f"{name}.npy", mmap_mode="r")  # noqa: E731
+        self.parent, self.entry, self.exit = load("parent"), load("entry"), load("exit")
+        self.rank = load("rank")
+        self.keys = Strings((where / "names.bin").read_bytes(), load("names.off"))
+        self.text = Strings((where / "text.bin").read_bytes(), load("text.off"))
+        self.name_taxid, self.sci = load("name_taxid"), load("sci")
+        self.ranks = stamp["ranks"]
+
+    @classmethod
+    def open(cls, dump=None, refresh: bool = False) -> "Taxonomy":
+        """Open the tree of *dump* (default $NCBI_TAXONOMY), building it if stale."""
+        dump = dump or os.environ.get(DUMP_ENV)
+        if not dump:
+            raise FileNotFoundError(f"no taxonomy dump given and ${DUMP_ENV} is not set")
+        where = tree_dir(dump)
+        if refresh or not is_fresh(dump, where):
+            print(f"Indexing {dump} → {where}", file=sys.stderr)
+            build(dump, where)
+        return cls(where)
+
+    def __len__(self) -> int:
+        return int((np.asarray(self.entry) >= 0).sum())
+
+    def __contains__(self, taxid) -> bool:
+        t = int(taxid_array([taxid])[0])
+        return 0 <= t < len(self.entry) and self.entry[t] >= 0
+
+    def resolve(self, clade: Clade) -> int:
+        """Taxid of *clade*, given as a Taxid or a (unique) scientific name."""
+        text = str(clade).strip()
+        if text.isdigit():
+            if int(text) not in self:
+                raise KeyError(f"Taxid {text} is not in the taxonomy")
+            return int(text)
+        key = text.lower()
+        lo = self.keys.lower_bound(key)
+        hi = lo
+        while hi < len(self.keys) and self.keys[hi] == key:
+            hi += 1
+        found = sorted({int(t) for t in self.name_taxid[lo:hi]})
+        if not found:
+            raise KeyError(f"no taxon named {text!r}")
+        if len(found) > 1:
+            options = ", ".join(f"{t} ({self.name(t)}, {self.rank_of(t)})" for t in found)
+            raise ValueError(f"{text!r} is ambiguous: {options}")
+        return found[0]
+
+    def interval(self, clade: Clade) -> Tuple[int, int]:
+        """Euler‑tour [entry, exit) of *clade*'s subtree."""
+        t = self.resolve(clade)
+        return int(self.entry[t]), int(self.exit[t])
+
+    def positions(self, taxids) -> np.ndarray:
+        """Euler‑tour entry of each of *taxids* (-1 where unknown) – compare
+        against interval() bounds to test many clades over one column."""
+        ids = taxid_array(taxids)
+        ok = (ids >= 0) & (ids < len(self.entry))
+        pos = np.full(len(ids), -1, dtype=np.int64)
+        pos[ok] = self.entry[ids[ok]]
+        return pos
+
+    def under(self, taxids, *clades: Clade) -> np.ndarray:
+        """Bool mask: which *taxids* lie under (or are) any of *clades*."""
+        pos = self.positions(taxids)
+        mask = np.zeros(len(pos), dtype=bool)
+        for lo, hi in map(self.interval, clades):
+            mask |= (pos >= lo) & (pos < hi)
+        return mask
+
+    def names(self, taxids) -> List[Optional[str]]:
+        """Scientific name of each of *taxids* (None where unknown)."""
+        ids = taxid_array(taxids)
+        ok = (ids >= 0) & (ids < len(self.sci))
+        at = np.full(len(ids), -1, dtype=np.int64)
+        at[ok] = self.sci[ids[ok]]
+        return [self.text[i] if i >= 0 else None for i in at]
+
+    def name(self, taxid) -> Optional[str]:
+        """Scientific name of *taxid* (None if unknown)."""
+        return self.names([taxid])[0]
+
+    def rank_of(self, taxid) -> Optional[str]:
+        code = int(self.rank[int(taxid)]) if taxid in self else -1
+        return self.ranks[code] if code >= 0 else None
+
+    def lineage(self, taxid: int) -> List[Tuple[int, Optional[str], Optional[str]]]:
+        """(Taxid, rank, name) from *taxid* up to the root."""
+        out, t = [], int(taxid)
+        while t >= 0 and t in self and len(out) < MAX_DEPTH:
+            out.append((t, self.rank_of(t), self.name(t)))
+            t = int(self.parent[t])
+        return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build / query the Euler-tour tree of an NCBI "
+                                             "taxonomy dump.")
+    ap.add_argument("dump", nargs="?", help=f"taxdump directory with nodes.dmp, names.dmp "
+                                            f"[${DUMP_ENV}]")
+    ap.add_argument("--clade", action="append", default=[], help="name or Taxid (repeatable)")
+    ap.add_argument("--count", metavar="TABLE",
+                    help="count the rows of a table (Taxid column) under the clades")
+    ap.add_argument("--lineage", type=int, metavar="TAXID", action="append", default=[])
+    ap.add_argument("--refresh", action="store_true", help="rebuild even if fresh")
+    args = ap.parse_args()
+
+    try:
+        tax = Taxonomy.open(args.dump, args.refresh)
+        print(f"{len(tax):,} taxa → {tree_dir(args.dump or os.environ[DUMP_ENV])}")
+        for clade in args.clade:
+            t = tax.resolve(clade)
+            lo, hi = tax.interval(t)
+            print(f"{clade}: Taxid {t} ({tax.name(t)}, {tax.rank_of(t)}), {hi - lo:,} taxa")
+        for t in args.lineage:
+            print(" < ".join(f"{name} ({rank})" for _, rank, name in tax.lineage(t)))
+        if args.count and args.clade:
+            from cutg_cache import load_frame
+            df = load_frame(args.count, columns=["Taxid", "Organelle"])
+            mask = tax.under(df["Taxid"], *args.clade)
+            print(f"{args.count}: {mask.sum():,} of {len(df):,} rows under "
+                  f"{', '.join(args.clade)}")
+            print(df.loc[mask, "Organelle"].value_counts().to_string())
+    except (KeyError, ValueError, FileNotFoundError) as e:
+        sys.exit(f"✗ {e.args[0] if e.args else e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,95 +4,40 @@ Orbit-by-orbit First-Classness analysis
 Test whether 6-fold orbits (especially Serine) violate FC more than others
 """
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
 
+from codon_index import AA_FAMILIES, codon_matrix, compile_orbit_map, family_map, group_cv
+from cutg_cache import load_frame
+
 # Load data
-df = pd.read_csv('../CUTG/AGG/refseq_codon_species.tsv', sep='\t')
-codon_cols = [c for c in df.columns if len(c) == 3]
-
-# Define orbit families with their expected FC compliance
-ORBIT_FAMILIES = {
-    # Size 1 (perfect FC - no variance possible)
-    'Met1': ['AUG'],
-    'Trp1': ['UGG'],
-    
-    # Size 2 (strong FC expected)
-    'Phe2': ['UUU', 'UUC'],
-    'Tyr2': ['UAU', 'UAC'], 
-    'Cys2': ['UGU', 'UGC'],
-    'His2': ['CAU', 'CAC'],
-    'Gln2': ['CAA', 'CAG'],
-    'Asn2': ['AAU', 'AAC'],
-    'Lys2': ['AAA', 'AAG'],
-    'Asp2': ['GAU', 'GAC'],
-    'Glu2': ['GAA', 'GAG'],
-    
-    # Size 3 (moderate FC expected)
-    'Stop3': ['UAA', 'UAG', 'UGA'],
-    'Ile3': ['AUU', 'AUC', 'AUA'],
-    
-    # Size 4 (good FC expected)
-    'Val4': ['GUU', 'GUC', 'GUA', 'GUG'],
-    'Pro4': ['CCU', 'CCC', 'CCA', 'CCG'],
-    'Thr4': ['ACU', 'ACC', 'ACA', 'ACG'],
-    'Ala4': ['GCU', 'GCC', 'GCA', 'GCG'],
-    'Gly4': ['GGU', 'GGC', 'GGA', 'GGG'],
-    
-    # Size 6 (WEAK FC expected - split families!)
-    'Ser6': ['UCU', 'UCC', 'UCA', 'UCG', 'AGU', 'AGC'],  # UC* vs AG*
-    'Leu6': ['UUA', 'UUG', 'CUU', 'CUC', 'CUA', 'CUG'],  # UU* vs CU*
-    'Arg6': ['CGU', 'CGC', 'CGA', 'CGG', 'AGA', 'AGG'],  # CG* vs AG*
-}
-
-# Convert to DNA codons (matching your data)
-DNA_FAMILIES = {}
-for name, codons in ORBIT_FAMILIES.items():
-    DNA_FAMILIES[name] = [c.replace('U', 'T') for c in codons]
-
-def calculate_within_orbit_variance(data_row, family_codons):
-    """Calculate coefficient of variation within a codon family"""
-    if len(family_codons) <= 1:
-        return np.nan
-    
-    counts = [data_row[codon] for codon in family_codons if codon in data_row.index]
-    if len(counts) <= 1 or sum(counts) == 0:
-        return np.nan
-    
-    # Convert to frequencies
-    freqs = np.array(counts) / sum(counts)
-    
-    # Calculate coefficient of variation (std/mean)
-    mean_freq = np.mean(freqs)
-    if mean_freq == 0:
-        return np.nan
-    
-    cv = np.std(freqs, ddof=1) / mean_freq
-    return cv
+df = load_frame('../CUTG/AGG/refseq_codon_species.tsv')
+
+# Orbit families named by amino acid and orbit size (Met1 … Arg6)
+ORBIT_FAMILIES = {f"{aa}{len(codons)}": codons for aa, codons in AA_FAMILIES.items()}
+FAMILY_INDEX = compile_orbit_map(family_map(ORBIT_FAMILIES))
 
 # Analyze each orbit family
 results = {}
 sample_size = min(1000, len(df))  # Use subset for speed
 sample_df = df.sample(sample_size)
 
-print(f"Analyzing {sample_size} species across {len(DNA_FAMILIES)} orbit families...")
-
-for family_name, family_codons in DNA_FAMILIES.items():
-    print(f"Processing {family_name}...")
-    
-    cv_values = []
-    for _, row in sample_df.iterrows():
-        cv = calculate_within_orbit_variance(row, family_codons)
-        if np.isfinite(cv):
-            cv_values.append(cv)
-    
-    if cv_values:
+print(f"Analyzing {sample_size} species across {len(ORBIT_FAMILIES)} orbit families...")
+
+# CV within every family for every species in one pass (NaN for size‑1 / unused)
+cv_matrix = group_cv(codon_matrix(sample_df), FAMILY_INDEX)
+column = {name: k for k, name in enumerate(FAMILY_INDEX.labels)}
+
+for family_name in ORBIT_FAMILIES:
+    cv_values = cv_matrix[:, column[family_name]]
+    cv_values = cv_values[np.isfinite(cv_values)]
+
+    if len(cv_values):
         results[family_name] = {
             'median_cv': np.median(cv_values),
             'mean_cv': np.mean(cv_values),
             'std_cv': np.std(cv_values),
             'n_species': len(cv_values),
-            'values': cv_values
+            'values': cv_values.tolist()
         }
 
 # Sort by orbit size and median CV
@@ -2,16 +2,23 @@
 """
 paired_fc_analysis.py - Test FC predictions using paired nuclear/mitochondrial data
 This is the smoking gun test for First-Classness theory
+
+All organisms are scored at once by fc_compliance_table (the per-row
+calculate_fc_compliance, vectorized) and nuclear/mitochondrial results are
+paired with one join on Species (or Taxid, --pair-on Taxid).
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
-import sys
 from pathlib import Path
 
+from cutg_cache import load_frame
+from quantile_sketch import QuantileSketch
+
 def load_orbit_map(orbit_file):
     """Load orbit mapping from CSV"""
     orbit_df = pd.read_csv(orbit_file)
@@ -65,14 +72,103 @@ def calculate_fc_compliance(row, orbit_map, codon_cols):
         'n_orbits': len(orbit_means)
     }
 
-def paired_fc_analysis(nuclear_file, mito_file, nuclear_orbit_map, mito_orbit_map):
-    """Perform paired FC analysis on nuclear vs mitochondrial data"""
+def fc_compliance_table(counts, orbit_map, codon_cols):
+    """calculate_fc_compliance for every row of a count matrix (columns in
+    codon_cols order) at once; returns sigma_intra, sigma_inter, fc_ratio, n_orbits"""
+    
+    counts = np.asarray(counts, dtype=float)
+    n = len(counts)
+    
+    # Group codon columns by orbit; only multi-codon families count
+    orbit_codons = {}
+    for j, codon in enumerate(codon_cols):
+        orbit = orbit_map.get(convert_dna_to_rna(codon))
+        if orbit is not None:
+            orbit_codons.setdefault(orbit, []).append(j)
+    families = [cols for cols in orbit_codons.values() if len(cols) > 1]
+    
+    # RSCU dispersion and mean of every family, for every row at once
+    used = np.zeros((n, len(families)), dtype=bool)
+    dispersion = np.zeros((n, len(families)))
+    means = np.zeros((n, len(families)))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for k, cols in enumerate(families):
+            family = counts[:, cols]
+            total = family.sum(axis=1)
+            rscus = family / (total / len(cols))[:, None]
+            used[:, k] = total > 0
+            dispersion[:, k] = rscus.std(axis=1)
+            means[:, k] = rscus.mean(axis=1)
+    
+    # Rows with the same families present are reduced together, so every
+    # mean/std sees the same values in the same order as the per-row loop
+    sigma_intra = np.full(n, np.nan)
+    sigma_inter = np.full(n, np.nan)
+    if n:
+        patterns, which = np.unique(used, axis=0, return_inverse=True)
+        which = which.reshape(-1)
+        for p, pattern in enumerate(patterns):
+            rows, cols = np.flatnonzero(which == p), np.flatnonzero(pattern)
+            if len(cols) > 0:
+                sigma_intra[rows] = dispersion[np.ix_(rows, cols)].mean(axis=1)
+            if len(cols) > 1:
+                sigma_inter[rows] = means[np.ix_(rows, cols)].std(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fc_ratio = np.where(sigma_inter > 0, sigma_intra / sigma_inter, np.nan)
+    
+    return pd.DataFrame({
+        'sigma_intra': sigma_intra,
+        'sigma_inter': sigma_inter,
+        'fc_ratio': fc_ratio,
+        'n_orbits': used.sum(axis=1)
+    })
+
+def score_organisms(df, orbit_map, codon_cols, kind):
+    """Taxid, Species, Type and FC metrics of every organism in a codon table"""
+    scores = fc_compliance_table(df[codon_cols].to_numpy(), orbit_map, codon_cols)
+    scores.insert(0, 'Taxid', df['Taxid'].to_numpy())
+    scores.insert(1, 'Species', df['Species_Name'].to_numpy() if 'Species_Name' in df.columns
+                  else 'Unknown')
+    scores.insert(2, 'Type', kind)
+    return scores
+
+def pair_results(results, key='Species'):
+    """Paired table: the first nuclear and first mitochondrial result of every
+    *key* present in both, joined on it; pairs with an undefined ratio are dropped"""
+    
+    first = {kind: results[results['Type'] == kind].dropna(subset=[key]).drop_duplicates(key)
+             for kind in ('Nuclear', 'Mitochondrial')}
+    keep = [key] + (['Species'] if key != 'Species' else [])
+    paired = first['Nuclear'][keep + ['fc_ratio']].merge(
+        first['Mitochondrial'][[key, 'fc_ratio']], on=key, suffixes=('_nuclear', '_mito'))
+    paired = paired.rename(columns={'fc_ratio_nuclear': 'Nuclear_FC',
+                                    'fc_ratio_mito': 'Mitochondrial_FC'})
+    paired = paired.dropna(subset=['Nuclear_FC', 'Mitochondrial_FC']).reset_index(drop=True)
+    
+    paired['Difference'] = paired['Nuclear_FC'] - paired['Mitochondrial_FC']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        paired['FC_Advantage'] = np.where(paired['Nuclear_FC'] > 0,
+                                          paired['Mitochondrial_FC'] / paired['Nuclear_FC'],
+                                          np.nan)
+    return paired
+
+def print_ratio_summary(label, sketch):
+    """Print mean/median/IQR/range of FC ratios from a QuantileSketch"""
+    s = sketch.summary()
+    print(f"{label}:")
+    print(f"  Mean FC ratio: {s['mean']:.3f} ± {s['std']:.3f}")
+    print(f"  Median FC ratio: {s['median']:.3f}  (IQR {s['q1']:.3f} - {s['q3']:.3f})")
+    print(f"  Range: {s['min']:.3f} - {s['max']:.3f}")
+
+def paired_fc_analysis(nuclear_file, mito_file, nuclear_orbit_map, mito_orbit_map, pair_on='Species'):
+    """Perform paired FC analysis on nuclear vs mitochondrial data; returns all
+    per-organism results and the paired table (joined on *pair_on*)"""
     
     print("=== PAIRED FC ANALYSIS ===")
     
     # Load datasets
-    nuclear_df = pd.read_csv(nuclear_file, sep='\t')
-    mito_df = pd.read_csv(mito_file, sep='\t')
+    nuclear_df = load_frame(nuclear_file)
+    mito_df = load_frame(mito_file)
     
     print(f"Nuclear ciliates: {len(nuclear_df)} organisms")
     print(f"Mitochondrial ciliates: {len(mito_df)} organisms")
@@ -83,53 +179,30 @@ def paired_fc_analysis(nuclear_file, mito_file, nuclear_orbit_map, mito_orbit_ma
     # Calculate FC compliance for all organisms
     print("\nCalculating FC compliance...")
     
-    nuclear_results = []
-    for idx, row in nuclear_df.iterrows():
-        fc_metrics = calculate_fc_compliance(row, nuclear_orbit_map, codon_cols)
-        nuclear_results.append({
-            'Taxid': row['Taxid'],
-            'Species': row.get('Species_Name', 'Unknown'),
-            'Type': 'Nuclear',
-            **fc_metrics
-        })
-    
-    mito_results = []
-    for idx, row in mito_df.iterrows():
-        fc_metrics = calculate_fc_compliance(row, mito_orbit_map, codon_cols)
-        mito_results.append({
-            'Taxid': row['Taxid'],
-            'Species': row.get('Species_Name', 'Unknown'),
-            'Type': 'Mitochondrial',
-            **fc_metrics
-        })
-    
-    # Combine results
-    all_results = pd.DataFrame(nuclear_results + mito_results)
-    
-    # Find paired organisms (same species, both nuclear and mitochondrial)
-    nuclear_species = set(all_results[all_results['Type'] == 'Nuclear']['Species'])
-    mito_species = set(all_results[all_results['Type'] == 'Mitochondrial']['Species'])
-    paired_species = nuclear_species & mito_species
-    
-    print(f"\nPaired species analysis:")
-    print(f"  Species with nuclear data: {len(nuclear_species)}")
-    print(f"  Species with mitochondrial data: {len(mito_species)}")
-    print(f"  Species with BOTH: {len(paired_species)}")
+    all_results = pd.concat([score_organisms(nuclear_df, nuclear_orbit_map, codon_cols, 'Nuclear'),
+                             score_organisms(mito_df, mito_orbit_map, codon_cols, 'Mitochondrial')],
+                            ignore_index=True)
+    
+    # Find paired organisms (same species - or Taxid - both nuclear and mitochondrial)
+    nuclear_keys = set(all_results.loc[all_results['Type'] == 'Nuclear', pair_on].dropna())
+    mito_keys = set(all_results.loc[all_results['Type'] == 'Mitochondrial', pair_on].dropna())
+    label = 'Species' if pair_on == 'Species' else 'Taxids'
+    
+    print(f"\nPaired {label.lower()} analysis:")
+    print(f"  {label} with nuclear data: {len(nuclear_keys)}")
+    print(f"  {label} with mitochondrial data: {len(mito_keys)}")
+    print(f"  {label} with BOTH: {len(nuclear_keys & mito_keys)}")
+    
+    paired_df = pair_results(all_results, pair_on)
     
     # Statistical analysis
     nuclear_ratios = all_results[all_results['Type'] == 'Nuclear']['fc_ratio'].dropna()
     mito_ratios = all_results[all_results['Type'] == 'Mitochondrial']['fc_ratio'].dropna()
     
     print(f"\n=== OVERALL FC COMPLIANCE ===")
-    print(f"Nuclear ciliates:")
-    print(f"  Mean FC ratio: {nuclear_ratios.mean():.3f} ± {nuclear_ratios.std():.3f}")
-    print(f"  Median FC ratio: {nuclear_ratios.median():.3f}")
-    print(f"  Range: {nuclear_ratios.min():.3f} - {nuclear_ratios.max():.3f}")
-    
-    print(f"\nMitochondrial ciliates:")
-    print(f"  Mean FC ratio: {mito_ratios.mean():.3f} ± {mito_ratios.std():.3f}")
-    print(f"  Median FC ratio: {mito_ratios.median():.3f}")
-    print(f"  Range: {mito_ratios.min():.3f} - {mito_ratios.max():.3f}")
+    print_ratio_summary("Nuclear ciliates", QuantileSketch().update(nuclear_ratios))
+    print()
+    print_ratio_summary("Mitochondrial ciliates", QuantileSketch().update(mito_ratios))
     
     # Statistical test
     if len(nuclear_ratios) > 0 and len(mito_ratios) > 0:
@@ -145,36 +218,17 @@ def paired_fc_analysis(nuclear_file, mito_file, nuclear_orbit_map, mito_orbit_ma
             print("✗ FC prediction not supported")
     
     # Paired organism analysis
-    if paired_species:
+    if nuclear_keys & mito_keys:
         print(f"\n=== PAIRED ORGANISM ANALYSIS ===")
-        paired_comparisons = []
-        
-        for species in paired_species:
-            nuclear_data = all_results[(all_results['Species'] == species) & (all_results['Type'] == 'Nuclear')]
-            mito_data = all_results[(all_results['Species'] == species) & (all_results['Type'] == 'Mitochondrial')]
-            
-            if len(nuclear_data) > 0 and len(mito_data) > 0:
-                nuclear_fc = nuclear_data['fc_ratio'].iloc[0]
-                mito_fc = mito_data['fc_ratio'].iloc[0]
-                
-                if not (np.isnan(nuclear_fc) or np.isnan(mito_fc)):
-                    paired_comparisons.append({
-                        'Species': species,
-                        'Nuclear_FC': nuclear_fc,
-                        'Mitochondrial_FC': mito_fc,
-                        'Difference': nuclear_fc - mito_fc,
-                        'FC_Advantage': mito_fc / nuclear_fc if nuclear_fc > 0 else np.nan
-                    })
         
-        if paired_comparisons:
-            paired_df = pd.DataFrame(paired_comparisons)
-            print(f"Paired comparisons: {len(paired_df)} species")
+        if len(paired_df):
+            print(f"Paired comparisons: {len(paired_df)} {label.lower()}")
             
             # Test if nuclear is consistently better
             improvements = paired_df['Difference'] < 0  # Nuclear better (lower ratio)
             n_improved = improvements.sum()
             
-            print(f"Species where nuclear < mitochondrial: {n_improved}/{len(paired_df)} ({100*n_improved/len(paired_df):.1f}%)")
+            print(f"{label} where nuclear < mitochondrial: {n_improved}/{len(paired_df)} ({100*n_improved/len(paired_df):.1f}%)")
             
             # Wilcoxon signed-rank test for paired data
             if len(paired_df) > 5:
@@ -193,11 +247,11 @@ def paired_fc_analysis(nuclear_file, mito_file, nuclear_orbit_map, mito_orbit_ma
                 print(f"  {row['Species']}: {row['FC_Advantage']:.2f}x better (nuclear={row['Nuclear_FC']:.3f}, mito={row['Mitochondrial_FC']:.3f})")
     
     # Visualization
-    create_fc_comparison_plots(all_results, paired_species)
+    create_fc_comparison_plots(all_results, paired_df, pair_on)
     
-    return all_results, paired_species
+    return all_results, paired_df
 
-def create_fc_comparison_plots(results_df, paired_species):
+def create_fc_comparison_plots(results_df, paired_df, pair_on='Species'):
     """Create comprehensive FC comparison plots"""
     
     fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
@@ -224,32 +278,20 @@ def create_fc_comparison_plots(results_df, paired_species):
     ax2.set_yscale('log')
     
     # Plot 3: Paired comparisons (if available)
-    if paired_species:
-        paired_data = []
-        for species in paired_species:
-            nuclear_fc = results_df[(results_df['Species'] == species) & (results_df['Type'] == 'Nuclear')]['fc_ratio']
-            mito_fc = results_df[(results_df['Species'] == species) & (results_df['Type'] == 'Mitochondrial')]['fc_ratio']
-            
-            if len(nuclear_fc) > 0 and len(mito_fc) > 0:
-                nuclear_val = nuclear_fc.iloc[0]
-                mito_val = mito_fc.iloc[0]
-                if not (np.isnan(nuclear_val) or np.isnan(mito_val)):
-                    paired_data.append((nuclear_val, mito_val))
+    if len(paired_df):
+        nuclear_paired, mito_paired = paired_df['Nuclear_FC'], paired_df['Mitochondrial_FC']
+        ax3.scatter(nuclear_paired, mito_paired, alpha=0.7, s=50)
         
-        if paired_data:
-            nuclear_paired, mito_paired = zip(*paired_data)
-            ax3.scatter(nuclear_paired, mito_paired, alpha=0.7, s=50)
-            
-            # Add diagonal line (y=x)
-            max_val = max(max(nuclear_paired), max(mito_paired))
-            ax3.plot([0, max_val], [0, max_val], 'k--', alpha=0.5, label='Equal FC compliance')
-            
-            ax3.set_xlabel('Nuclear FC Ratio')
-            ax3.set_ylabel('Mitochondrial FC Ratio')
-            ax3.set_title(f'Paired Comparison ({len(paired_data)} species)')
-            ax3.legend()
-            ax3.set_xscale('log')
-            ax3.set_yscale('log')
+        # Add diagonal line (y=x)
+        max_val = max(nuclear_paired.max(), mito_paired.max())
+        ax3.plot([0, max_val], [0, max_val], 'k--', alpha=0.5, label='Equal FC compliance')
+        
+        ax3.set_xlabel('Nuclear FC Ratio')
+        ax3.set_ylabel('Mitochondrial FC Ratio')
+        ax3.set_title(f'Paired Comparison ({len(paired_df)} pairs by {pair_on})')
+        ax3.legend()
+        ax3.set_xscale('log')
+        ax3.set_yscale('log')
     
     # Plot 4: FC ratio by organism type
     sns.violinplot(data=results_df, x='Type', y='fc_ratio', ax=ax4)
@@ -262,18 +304,26 @@ def create_fc_comparison_plots(results_df, paired_species):
     plt.show()
 
 def main():
-    if len(sys.argv) != 5:
-        print("Usage: python paired_fc_analysis.py <nuclear_file> <mito_file> <nuclear_orbit_map> <mito_orbit_map>")
-        sys.exit(1)
-    
-    nuclear_file, mito_file, nuclear_orbit_file, mito_orbit_file = sys.argv[1:5]
+    parser = argparse.ArgumentParser(description="Paired nuclear/mitochondrial FC analysis")
+    parser.add_argument('nuclear_file')
+    parser.add_argument('mito_file')
+    parser.add_argument('nuclear_orbit_map')
+    parser.add_argument('mito_orbit_map')
+    parser.add_argument('--pair-on', choices=['Species', 'Taxid'], default='Species',
+                        help='key joining nuclear and mitochondrial results [Species]')
+    parser.add_argument('--paired-out', help='also write the paired table (TSV) here')
+    args = parser.parse_args()
     
     # Load orbit maps
-    nuclear_orbit_map = load_orbit_map(nuclear_orbit_file)
-    mito_orbit_map = load_orbit_map(mito_orbit_file)
+    nuclear_orbit_map = load_orbit_map(args.nuclear_orbit_map)
+    mito_orbit_map = load_orbit_map(args.mito_orbit_map)
     
     # Perform analysis
-    results, paired_species = paired_fc_analysis(nuclear_file, mito_file, nuclear_orbit_map, mito_orbit_map)
+    results, paired_df = paired_fc_analysis(args.nuclear_file, args.mito_file, nuclear_orbit_map,
+                                            mito_orbit_map, args.pair_on)
+    if args.paired_out:
+        paired_df.to_csv(args.paired_out, sep='\t', index=False)
+        print(f"\n✓ Paired table saved: {args.paired_out}")
     
     print(f"\n=== SUMMARY ===")
     print(f"This analysis tests the core FC prediction:")
@@ -4,76 +4,56 @@ Serine vs Leucine: Fine structure analysis of 6-fold codon families
 Why does Serine follow FC while Leucine violates it?
 """
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
 
+from codon_index import (CODONS_DNA, CODONS_RNA, SIXFOLD_SUBFAMILIES, codon_matrix,
+                         compile_orbit_map, group_cv, group_sums)
+from cutg_cache import load_frame
+
 # Load data
-df = pd.read_csv('../CUTG/AGG/refseq_codon_species.tsv', sep='\t')
+df = load_frame('../CUTG/AGG/refseq_codon_species.tsv')
 
-# Define the two families with their sub-groups
-FAMILIES = {
-    'Serine': {
-        'UC_group': ['TCT', 'TCC', 'TCA', 'TCG'],  # UC* subfamily
-        'AG_group': ['AGT', 'AGC'],               # AG* subfamily
-        'all': ['TCT', 'TCC', 'TCA', 'TCG', 'AGT', 'AGC']
-    },
-    'Leucine': {
-        'TT_group': ['TTA', 'TTG'],                           # UU* subfamily  
-        'CT_group': ['CTT', 'CTC', 'CTA', 'CTG'],            # CU* subfamily
-        'all': ['TTA', 'TTG', 'CTT', 'CTC', 'CTA', 'CTG']
-    }
+# Define the two families with their sub-groups, named as the analysis reports them
+SUBGROUP_LABELS = {
+    'Ser': {'UC': 'UC_group', 'AG': 'AG_group'},
+    'Leu': {'UU': 'TT_group', 'CU': 'CT_group'},
 }
 
-def analyze_family_structure(family_name, groups, sample_size=500):
+def _subgroup_index(aa):
+    """Compiled map with each sub-group of *aa* as one group, every other codon in 'other'"""
+    orbit = dict.fromkeys(CODONS_RNA, 'other')
+    for box, codons in SIXFOLD_SUBFAMILIES[aa].items():
+        orbit.update(dict.fromkeys(codons, SUBGROUP_LABELS[aa][box]))
+    return compile_orbit_map(orbit)
+
+FAMILIES = {'Serine': 'Ser', 'Leucine': 'Leu'}
+
+def analyze_family_structure(family_name, aa, sample_size=500):
     """Analyze the internal structure of a 6-fold family"""
     print(f"\n{'='*60}")
     print(f"{family_name.upper()} FAMILY STRUCTURE ANALYSIS")
     print(f"{'='*60}")
     
     sample_df = df.sample(sample_size)
+    idx = _subgroup_index(aa)
+    names = list(SUBGROUP_LABELS[aa].values())
+    groups = [list(idx.labels).index(name) for name in names]
     
-    # Calculate relative usage within each sub-group and across groups
-    within_subgroup_cvs = []
-    between_subgroup_cvs = []
+    # Per-species sub-group totals and within-sub-group CVs (CV of the
+    # frequencies equals CV of the counts); species without the family are skipped
+    x = codon_matrix(sample_df)
+    totals = group_sums(x, idx)[:, groups]
+    family_total = totals.sum(axis=1)
+    ok = family_total > 0
+    totals, family_total = totals[ok], family_total[ok]
+    used = totals > 0
     
-    for _, row in sample_df.iterrows():
-        # Get counts for all codons in family
-        all_counts = [row[codon] for codon in groups['all']]
-        total_family = sum(all_counts)
-        
-        if total_family == 0:
-            continue
-            
-        # Calculate frequencies within each sub-group
-        subgroup_means = []
-        subgroup_cvs = []
-        
-        for subgroup_name, codons in groups.items():
-            if subgroup_name == 'all':
-                continue
-                
-            counts = [row[codon] for codon in codons]
-            subgroup_total = sum(counts)
-            
-            if subgroup_total == 0:
-                continue
-                
-            # Frequencies within this sub-group
-            freqs = np.array(counts) / subgroup_total
-            mean_freq = np.mean(freqs)
-            cv = np.std(freqs, ddof=1) / mean_freq if mean_freq > 0 else 0
-            
-            subgroup_cvs.append(cv)
-            subgroup_means.append(subgroup_total / total_family)  # Fraction of family usage
-        
-        # Average CV within sub-groups
-        if subgroup_cvs:
-            within_subgroup_cvs.append(np.mean(subgroup_cvs))
-            
-        # CV between sub-group usage levels
-        if len(subgroup_means) > 1:
-            between_cv = np.std(subgroup_means) / np.mean(subgroup_means) if np.mean(subgroup_means) > 0 else 0
-            between_subgroup_cvs.append(between_cv)
+    # Average CV within sub-groups (unused sub-groups are NaN)
+    within_subgroup_cvs = np.nanmean(group_cv(x[ok], idx)[:, groups], axis=1)
+    
+    # CV between sub-group usage levels (fraction of family usage), when >1 used
+    share = np.where(used, totals / family_total[:, None], np.nan)[used.sum(axis=1) > 1]
+    between_subgroup_cvs = np.nanstd(share, axis=1) / np.nanmean(share, axis=1)
     
     # Print results
     print(f"Sample size: {len(within_subgroup_cvs)} species")
@@ -83,25 +63,15 @@ def analyze_family_structure(family_name, groups, sample_size=500):
     # Show typical usage patterns
     print(f"\nTypical codon usage patterns:")
     
-    # Get median usage for each codon
-    medians = {}
-    for codon in groups['all']:
-        values = []
-        for _, row in sample_df.iterrows():
-            total = sum(row[c] for c in groups['all'])
-            if total > 0:
-                values.append(row[codon] / total)
-        if values:
-            medians[codon] = np.median(values)
-    
-    # Group by subfamily
-    for subgroup_name, codons in groups.items():
-        if subgroup_name == 'all':
+    # Median usage of each codon as a fraction of its family, by sub-family
+    for name, g in zip(names, groups):
+        print(f"\n  {name}:")
+        if not len(family_total):
             continue
-        print(f"\n  {subgroup_name}:")
-        for codon in codons:
-            if codon in medians:
-                print(f"    {codon}: {medians[codon]:.3f}")
+        codons = idx.order[idx.bounds[g]:idx.bounds[g + 1]]
+        medians = np.median(x[ok][:, codons] / family_total[:, None], axis=0)
+        for codon, median in zip(codons, medians):
+            print(f"    {CODONS_DNA[codon]}: {median:.3f}")
     
     return within_subgroup_cvs, between_subgroup_cvs
 
@@ -1,83 +1,63 @@
 #!/usr/bin/env python3
 """
 Simple null model test for First-Classness
+
+    python simple_null_test.py [--trials 1000] [--workers N]
+
+Shuffles are scored by fc_null.null_distribution; the result is the same
+for any --workers value.
 """
+import argparse
+
 import numpy as np
-import pandas as pd
+
+from cutg_cache import load_frame
+from codon_index import STANDARD_ORBITS, codon_matrix, compile_orbit_map
+from cutg_telemetry import Telemetry
+from fc_null import frequency_matrix, null_distribution
 
 # Your real result
 OBSERVED = 4.810
 
-# Load your actual codon data
-df = pd.read_csv('../CUTG/AGG/refseq_codon_species.tsv', sep='\t')
-codon_cols = [c for c in df.columns if len(c) == 3 and c.replace('T','U') in 
-              [a+b+c for a in "UCAG" for b in "UCAG" for c in "UCAG"]]
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--trials", type=int, default=1000, help="number of shuffles [1000]")
+    ap.add_argument("--workers", type=int, default=1, help="processes for the shuffles [1]")
+    args = ap.parse_args()
+
+    # Load your actual codon data
+    df = load_frame('../CUTG/AGG/refseq_codon_species.tsv')
+
+    # Convert to frequencies and take sample of rows
+    sample_size = min(1000, len(df))  # Use 1000 species for speed
+    sample_data = codon_matrix(df.sample(sample_size))
 
-# Convert to frequencies and take sample of rows
-sample_size = min(1000, len(df))  # Use 1000 species for speed
-sample_data = df[codon_cols].sample(sample_size).values
+    print(f"Testing {sample_size} species against {OBSERVED}")
 
-# Real orbit assignments (matching your orbit_map.csv)
-real_orbits = [2,2,6,6,6,6,6,6,2,2,3,3,2,2,3,1,  # U row
-               6,6,6,6,4,4,4,4,2,2,2,2,6,6,6,6,  # C row  
-               3,3,3,1,4,4,4,4,2,2,2,2,6,6,6,6,  # A row
-               4,4,4,4,4,4,4,4,2,2,2,2,4,4,4,4]  # G row
+    # Run null model
+    idx = compile_orbit_map(STANDARD_ORBITS)     # = orbit_map.csv
+    with Telemetry("simple_null_test") as tel, tel.stage("null_model", unit="shuffles") as st:
+        def progress(done):
+            print(f"  Trial {done}...")
+            st.to(done)
 
-print(f"Testing {sample_size} species against {OBSERVED}")
+        null_ratios = null_distribution(frequency_matrix(sample_data), idx, args.trials,
+                                        seed=2025, workers=args.workers, progress=progress)
+    null_ratios = null_ratios[np.isfinite(null_ratios)]
 
-# Run null model
-null_ratios = []
-rng = np.random.default_rng(2025)
+    # Calculate statistics
+    null_mean = np.mean(null_ratios)
+    null_std = np.std(null_ratios)
+    z_score = (OBSERVED - null_mean) / null_std
+    p_value = (null_ratios >= OBSERVED).mean()
 
-for trial in range(1000):
-    if trial % 100 == 0:
-        print(f"  Trial {trial}...")
-    
-    # Shuffle orbit assignments
-    fake_orbits = real_orbits.copy()
-    rng.shuffle(fake_orbits)
-    
-    trial_ratios = []
-    for row in sample_data:
-        if row.sum() == 0:
-            continue
-            
-        # Calculate RSCU with fake orbits
-        freq = row / row.sum()
-        rscu = freq * fake_orbits
-        
-        # Group by fake orbit
-        groups = {}
-        for i, orbit in enumerate(fake_orbits):
-            groups.setdefault(orbit, []).append(rscu[i])
-        
-        # Calculate σ_intra / σ_inter
-        intra_vals = []
-        inter_vals = []
-        for orbit, values in groups.items():
-            if len(values) > 1:
-                mean_val = np.mean(values)
-                intra_vals.extend([v - mean_val for v in values])
-                inter_vals.extend([mean_val] * len(values))
-        
-        if len(intra_vals) > 1 and len(inter_vals) > 1:
-            ratio = np.std(intra_vals, ddof=1) / np.std(inter_vals, ddof=1)
-            if np.isfinite(ratio):
-                trial_ratios.append(ratio)
-    
-    if trial_ratios:
-        null_ratios.append(np.median(trial_ratios))
+    print(f"\nResults:")
+    print(f"Null mean: {null_mean:.3f}")
+    print(f"Null std:  {null_std:.3f}")
+    print(f"Z-score:   {z_score:.2f}")
+    print(f"P-value:   {p_value:.4f}")
+    print(f"Observed:  {OBSERVED}")
 
-# Calculate statistics
-null_ratios = np.array(null_ratios)
-null_mean = np.mean(null_ratios)
-null_std = np.std(null_ratios)
-z_score = (OBSERVED - null_mean) / null_std
-p_value = (null_ratios >= OBSERVED).mean()
 
-print(f"\nResults:")
-print(f"Null mean: {null_mean:.3f}")
-print(f"Null std:  {null_std:.3f}")
-print(f"Z-score:   {z_score:.2f}")
-print(f"P-value:   {p_value:.4f}")
-print(f"Observed:  {OBSERVED}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
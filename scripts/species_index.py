@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+r"""
+species_index.py – persistent species‑name index for clade lookups
+------------------------------------------------------------------
+CUTG species index tables (Row, Database, NA, Taxid, Species, Organelle; no
+header) are parsed once into
+
+    <dir>/.cutg_cache/<file name>.names/
+        names.bin, names.off    distinct species names, sorted case‑insensitively
+        lower.bin, lower.off    the same names lower‑cased, "\n"‑separated
+        tokens.bin, tokens.off  distinct lower‑cased words of the names, sorted
+        post.npy, post_ptr.npy  word → names that contain it (inverted index)
+        rows.npy, rows_ptr.npy  name → index rows carrying it
+        taxid.npy, organelle.npy, name_of_row.npy   per index row
+        stamp.json              source fingerprint, organelle labels
+
+and memory‑mapped on later opens, so lookups never re‑read the TSV:
+
+    >>> idx = SpeciesIndex.open("INDEX/genbank_species_index.tsv")
+    >>> rows = idx.genus("Paramecium")                  # "Paramecium …" names
+    >>> rows = idx.prefix("tetrahymena therm")          # name prefix
+    >>> rows = idx.word("thermophila")                  # any word of the name
+    >>> rows = idx.contains(["Paramecium", "Stentor"])  # substring, as str.contains
+    >>> idx.frame(rows)                                 # Row, Taxid, Species, Organelle
+
+Every query is case‑insensitive and returns index row ids (file order).
+Genus and prefix queries are binary searches in the sorted names, word
+queries one posting list, and substring queries a bytes.find scan of the
+lower‑cased names (a few MB) – milliseconds for hundreds of thousands of
+species.  The index is rebuilt when the source's fingerprint changes
+(cutg_cache.fingerprint; CUTG_CACHE_DIR is honoured).
+
+    $ python species_index.py INDEX.tsv --genus Paramecium --contains Stentor
+
+Requires numpy pandas
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cutg_cache import (cache_dir, csr_gather, fingerprint, is_current, publish,
+                        read_stamp, stage_dir, write_stamp)
+
+VERSION = 1
+INDEX_COLUMNS = ["Row", "Database", "NA", "Taxid", "Species", "Organelle"]
+_WORD = re.compile(r"\w+")
+
+
+def blob(strings: List[str]) -> Tuple[bytes, np.ndarray]:
+    """UTF‑8 concatenation of *strings* and the (n+1) offsets into it."""
+    enc = [s.encode() for s in strings]
+    off = np.zeros(len(enc) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in enc], out=off[1:])
+    return b"".join(enc), off
+
+
+def index_dir(path) -> Path:
+    where = cache_dir(path)
+    return where.with_name(where.name + ".names")
+
+
+def build(path, where: Path = None) -> Path:
+    """Parse the index table once into its index directory."""
+    where = where or index_dir(path)
+    tmp = stage_dir(where)
+
+    stamp = fingerprint(path)
+    df = pd.read_csv(path, sep="\t", names=INDEX_COLUMNS, usecols=["Taxid", "Species", "Organelle"],
+                     dtype=str, keep_default_na=False)
+    species = df["Species"].to_numpy(dtype=object)
+    names = sorted(set(species), key=lambda s: (s.lower(), s))
+    name_id = {s: i for i, s in enumerate(names)}
+    name_of_row = np.fromiter((name_id[s] for s in species), dtype=np.int32, count=len(species))
+    org_codes, org_labels = pd.factorize(df["Organelle"])
+
+    # name → rows (CSR), rows in file order within each name
+    order = np.argsort(name_of_row, kind="stable").astype(np.int32)
+    rows_ptr = np.zeros(len(names) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(name_of_row, minlength=len(names)), out=rows_ptr[1:])
+
+    # word → names (CSR)
+    lower = [s.lower() for s in names]
+    pairs = {}
+    for i, s in enumerate(lower):
+        for w in set(_WORD.findall(s)):
+            pairs.setdefault(w, []).append(i)
+    tokens = sorted(pairs)
+    post = np.fromiter((i for w in tokens for i in pairs[w]), dtype=np.int32)
+    post_ptr = np.zeros(len(tokens) + 1, dtype=np.int64)
+    np.cumsum([len(pairs[w]) for w in tokens], out=post_ptr[1:])
+
+    name_bin, name_off = blob(names)
+    low_bin, low_off = blob([s + "\n" for s in lower])
+    tok_bin, tok_off = blob(tokens)
+    (tmp / "names.bin").write_bytes(name_bin)
+    (tmp / "lower.bin").write_bytes(low_bin)
+    (tmp / "tokens.bin").write_bytes(tok_bin)
+    for name, arr in {"names.off": name_off, "lower.off": low_off,
+                      "tokens.off": tok_off, "post": post,
+                      "post_ptr": post_ptr, "rows": order, "rows_ptr": rows_ptr,
+                      "taxid": df["Taxid"].to_numpy(dtype=str),
+                      "organelle": org_codes.astype(np.int16),
+                      "name_of_row": name_of_row}.items():
+        np.save(tmp / f"{name}.npy", arr)
+    stamp.update(version=VERSION, rows=len(df), names=len(names), tokens=len(tokens),
+                 organelles=[str(o) for o in org_labels])
+    write_stamp(tmp, stamp)
+    return publish(tmp, where, lambda: is_current(where, path, VERSION))
+
+
+def is_fresh(path, where: Path = None) -> bool:
+    return is_current(where or index_dir(path), path, VERSION)
+
+
+class Strings:
+    """Sequence view of a UTF‑8 blob plus offsets (minus *end* trailing bytes each)."""
+
+    def __init__(self, blob: bytes, off: np.ndarray, end: int = 0):
+        self.blob, self.off, self.end = blob, off, end
+
+    def __len__(self) -> int:
+        return len(self.off) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.off[i]:self.off[i + 1] - self.end].decode()
+
+    def lower_bound(self, key: str) -> int:
+        """First i whose string is ≥ key (the strings are sorted)."""
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self[mid] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+class SpeciesIndex:
+    """Memory‑mapped name index of one species index table."""
+
+    def __init__(self, where: Path):
+        stamp = read_stamp(where)
+        load = lambda name: np.load(where / f"{name}.npy", mmap_mode="r")  # noqa: E731
+        self.names = Strings((where / "names.bin").read_bytes(), load("names.off"))
+        self.tokens = Strings((where / "tokens.bin").read_bytes(), load("tokens.off"))
+        self.lower = Strings((where / "lower.bin").read_bytes(), load("lower.off"), end=1)
+        self.post, self.post_ptr = load("post"), load("post_ptr")
+        self.rows, self.rows_ptr = load("rows"), load("rows_ptr")
+        self.taxid, self.organelle = load("taxid"), load("organelle")
+        self.name_of_row = load("name_of_row")
+        self.organelles = stamp["organelles"]
+
+    @classmethod
+    def open(cls, path, refresh: bool = False) -> "SpeciesIndex":
+        """Open the index of *path*, building it first if missing or stale."""
+        where = index_dir(path)
+        if refresh or not is_fresh(path, where):
+            print(f"Indexing {path} → {where}", file=sys.stderr)
+            build(path, where)
+        return cls(where)
+
+    def __len__(self) -> int:
+        return len(self.taxid)
+
+    # -- name ids → row ids --------------------------------------------------
+
+    def _rows(self, name_ids) -> np.ndarray:
+        pos = csr_gather(self.rows_ptr, np.unique(np.asarray(name_ids, dtype=np.int64)))
+        return np.sort(np.asarray(self.rows[pos], dtype=np.int64))
+
+    def _name_range(self, prefix: str) -> range:
+        p = prefix.lower()
+        return range(self.lower.lower_bound(p), self.lower.lower_bound(p + "\U0010ffff"))
+
+    # -- queries ---------------------------------------------------------------
+
+    def prefix(self, text: str) -> np.ndarray:
+        """Rows whose species name starts with *text*."""
+        return self._rows(self._name_range(text))
+
+    def genus(self, genus: str) -> np.ndarray:
+        """Rows whose species name is *genus* or starts with "*genus* "."""
+        r = self._name_range(genus)
+        exact = [i for i in r if self.lower[i] == genus.lower()]
+        return self._rows(list(self._name_range(genus + " ")) + exact)
+
+    def word(self, word: str, prefix: bool = False) -> np.ndarray:
+        """Rows with *word* (or, with prefix=True, a word starting with it) in the name."""
+        w = word.lower()
+        lo = self.tokens.lower_bound(w)
+        hi = self.tokens.lower_bound(w + "\U0010ffff") if prefix else \
+            lo + (lo < len(self.tokens) and self.tokens[lo] == w)
+        if hi <= lo:
+            return np.zeros(0, dtype=np.int64)
+        return self._rows(self.post[self.post_ptr[lo]:self.post_ptr[hi]])
+
+    def contains(self, texts: Iterable[str]) -> np.ndarray:
+        """Rows whose species name contains any of *texts* (literal, case‑insensitive),
+        as Series.str.contains("|".join(texts), case=False) matches plain words."""
+        if isinstance(texts, str):
+            texts = [texts]
+        blob, starts = self.lower.blob, []
+        for needle in {t.lower().encode() for t in texts if t}:
+            pos = blob.find(needle)
+            while pos >= 0:
+                starts.append(pos)
+                pos = blob.find(needle, pos + 1)
+        return self._rows(np.searchsorted(self.lower.off, starts, side="right") - 1)
+
+    def frame(self, rows) -> pd.DataFrame:
+        """Row (position in the index table), Taxid, Species, Organelle of *rows*."""
+        rows = np.asarray(rows, dtype=np.int64)
+        labels = np.array(self.organelles + [""], dtype=object)
+        return pd.DataFrame({"Row": rows,
+                             "Taxid": np.asarray(self.taxid[rows]).astype(object),
+                             "Species": [self.names[i] for i in self.name_of_row[rows]],
+                             "Organelle": labels[self.organelle[rows]]})
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build / query the species-name index of a "
+                                             "CUTG species index table.")
+    ap.add_argument("table", help="species index TSV (Row, Database, NA, Taxid, Species, Organelle)")
+    ap.add_argument("--genus", action="append", default=[])
+    ap.add_argument("--prefix", action="append", default=[])
+    ap.add_argument("--word", action="append", default=[])
+    ap.add_argument("--contains", action="append", default=[])
+    ap.add_argument("--refresh", action="store_true", help="rebuild even if fresh")
+    args = ap.parse_args()
+
+    idx = SpeciesIndex.open(args.table, args.refresh)
+    print(f"{args.table}: {len(idx):,} rows, {len(idx.names):,} species, "
+          f"{len(idx.tokens):,} words → {index_dir(args.table)}")
+    queries = ([("genus", q, idx.genus) for q in args.genus]
+               + [("prefix", q, idx.prefix) for q in args.prefix]
+               + [("word", q, idx.word) for q in args.word]
+               + [("contains", q, idx.contains) for q in args.contains])
+    for kind, q, fn in queries:
+        t0 = time.perf_counter()
+        rows = fn(q)
+        ms = (time.perf_counter() - t0) * 1e3
+        hits = idx.frame(rows)
+        print(f"{kind} {q!r}: {len(rows):,} rows, {hits['Species'].nunique():,} species "
+              f"({ms:.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()
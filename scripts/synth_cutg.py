@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+r"""
+synth_cutg.py – synthetic CUTG‑shaped tables at any scale
+---------------------------------------------------------
+Writes realistic stand‑ins for the CUTG HIVE dumps so the real parsers can be
+exercised and timed from 10^3 to 10^7 rows:
+
+    <out>/CDS/<tag>_cds.tsv         raw dump: malformed header (adjacent codon
+                                    names merged) and a stray trailing field on
+                                    every row – what fix_hive_header.py repairs
+    <out>/CDS/<tag>_cds_fixed.tsv   the same rows under FIXED_HEADER
+    <out>/<tag>_species.tsv         per‑species table: Species, Taxid, # CDS,
+                                    # Codons and the 64 RNA codons (fc_checker)
+
+Each species gets a GC‑biased, Dirichlet‑perturbed codon preference; a CDS
+draws a lognormal length and Poisson counts from it.  Species sizes are
+heavy‑tailed, ~12 % of CDS rows are mitochondrial (table 2) and ~3 %
+chloroplast (table 11).  Output is fully determined by --seed.
+
+    $ python synth_cutg.py /tmp/cutg --rows 1M                  # CDS + species
+    $ python synth_cutg.py /tmp/cutg --rows 10M --species 200k --what raw
+
+Requires numpy pandas
+"""
+
+import argparse
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from codon_index import CODONS_DNA, CODONS_RNA
+from fix_hive_header import FIXED_HEADER
+
+BLOCK = 100_000         # rows generated and written per step
+META = FIXED_HEADER[:12]
+CDS_CODONS = FIXED_HEADER[12:]              # CUTG column order (DNA)
+DIVISIONS = ["bct", "pln", "inv", "vrt", "mam", "pri", "rod", "phg", "vrl"]
+ORGANELLES = [("genomic", 0.85, None), ("mitochondrion", 0.12, 2), ("chloroplast", 0.03, 11)]
+_SYLLABLES = ["ba", "ci", "do", "fe", "gu", "la", "mi", "no", "pe", "ru", "sa", "ti", "vo", "xe"]
+
+
+def parse_count(text: str) -> int:
+    """ "5000", "10k", "2M" or "1e6" → int."""
+    m = re.fullmatch(r"(\d+(?:\.\d+)?(?:e\d+)?)([kKmM]?)", text.strip())
+    if not m:
+        raise argparse.ArgumentTypeError(f"not a row count: {text}")
+    num, suf = m.groups()
+    return int(float(num) * {"": 1, "k": 1e3, "m": 1e6}[suf.lower()])
+
+
+def _names(n: int, rng: np.random.Generator) -> np.ndarray:
+    syl = np.array(_SYLLABLES)
+    genus = [s.capitalize() for s in
+             map("".join, syl[rng.integers(len(syl), size=(n, 3))])]
+    epithet = map("".join, syl[rng.integers(len(syl), size=(n, 3))])
+    return np.array([f"{g} {e} {i}" for i, (g, e) in enumerate(zip(genus, epithet))])
+
+
+def _preferences(n: int, rng: np.random.Generator) -> np.ndarray:
+    """(n, 64) codon probabilities in CODONS_DNA order, GC‑biased per species."""
+    gc = rng.uniform(0.25, 0.75, size=(n, 1))
+    w = np.ones((n, 64))
+    for pos, strength in enumerate((0.4, 0.2, 1.0)):
+        strong = np.array([c[pos] in "GC" for c in CODONS_DNA])
+        bias = 0.5 + strength * (gc - 0.5)
+        w *= np.where(strong, bias, 1 - bias)
+    w[:, [CODONS_DNA.index(c) for c in ("TAA", "TAG", "TGA")]] *= 0.02
+    p = rng.gamma(20 * w / w.mean(axis=1, keepdims=True))
+    return p / p.sum(axis=1, keepdims=True)
+
+
+def _gc(counts: np.ndarray) -> np.ndarray:
+    """(n, 4) GC%, GC1%, GC2%, GC3% of (n, 64) CODONS_DNA counts."""
+    total = np.maximum(counts.sum(axis=1, keepdims=True), 1)
+    pos = np.stack([counts @ np.array([c[i] in "GC" for c in CODONS_DNA], float)
+                    for i in range(3)], axis=1) / total
+    return np.round(100 * np.column_stack([pos.mean(axis=1), pos]), 2)
+
+
+class Species:
+    """Fixed species panel shared by the CDS and species tables."""
+
+    def __init__(self, n: int, rng: np.random.Generator):
+        self.n = n
+        self.names = _names(n, rng)
+        self.taxid = 1000 + rng.permutation(n * 3)[:n]
+        self.division = np.array(DIVISIONS)[rng.integers(len(DIVISIONS), size=n)]
+        self.nuclear_code = rng.choice([1, 11, 6, 4], size=n, p=[0.80, 0.15, 0.03, 0.02])
+        self.pref = _preferences(n, rng)
+        w = rng.lognormal(0, 1.5, size=n)
+        self.weight = w / w.sum()
+
+
+def cds_block(sp: Species, n: int, rng: np.random.Generator) -> pd.DataFrame:
+    """n CDS rows under FIXED_HEADER."""
+    who = rng.choice(sp.n, size=n, p=sp.weight)
+    kind = rng.choice(len(ORGANELLES), size=n, p=[o[1] for o in ORGANELLES])
+    length = rng.lognormal(5.8, 0.6, size=n)
+    counts = rng.poisson(length[:, None] * sp.pref[who])
+    code = np.where(kind == 0, sp.nuclear_code[who],
+                    np.array([o[2] or 0 for o in ORGANELLES])[kind])
+    df = pd.DataFrame(counts, columns=CODONS_DNA)[CDS_CODONS]
+    meta = pd.DataFrame({
+        "Division": sp.division[who],
+        "Assembly": [f"GCF_{t:09d}.1" for t in sp.taxid[who]],
+        "Taxid": sp.taxid[who],
+        "Species": sp.names[who],
+        "Organelle": np.array([o[0] for o in ORGANELLES])[kind],
+        "Translation Table": code,
+        "# CDS": 1,
+        "# Codons": counts.sum(axis=1),
+    })
+    gc = pd.DataFrame(_gc(counts), columns=META[8:])
+    return pd.concat([meta, gc, df], axis=1)
+
+
+def species_block(sp: Species, lo: int, hi: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Species rows lo..hi: summed counts from ~lognormal many CDS each."""
+    n_cds = np.maximum(1, rng.lognormal(6, 1.2, size=hi - lo)).astype(int)
+    counts = rng.poisson((n_cds * 330.0)[:, None] * sp.pref[lo:hi])
+    df = pd.DataFrame({"Species": sp.names[lo:hi], "Taxid": sp.taxid[lo:hi],
+                       "# CDS": n_cds, "# Codons": counts.sum(axis=1)})
+    return pd.concat([df, pd.DataFrame(counts, columns=CODONS_RNA)], axis=1)
+
+
+def broken_header() -> str:
+    """FIXED_HEADER with a few adjacent codon names run together."""
+    fields = list(FIXED_HEADER)
+    for i in (12 + 40, 12 + 20, 12 + 2):        # right to left keeps indices valid
+        fields[i:i + 2] = [fields[i] + fields[i + 1]]
+    return "\t".join(fields)
+
+
+def write_tables(out: Path, rows: int, species: int, tag: str = "refseq",
+                 what=("raw", "fixed", "species"), seed: int = 2025) -> dict:
+    """Generate the requested tables under *out*; returns {kind: path}."""
+    seeds = np.random.SeedSequence(seed).spawn(3)
+    sp = Species(species, np.random.default_rng(seeds[0]))
+    (out / "CDS").mkdir(parents=True, exist_ok=True)
+    paths = {"raw": out / "CDS" / f"{tag}_cds.tsv",
+             "fixed": out / "CDS" / f"{tag}_cds_fixed.tsv",
+             "species": out / f"{tag}_species.tsv"}
+    paths = {k: v for k, v in paths.items() if k in what}
+
+    if "raw" in paths or "fixed" in paths:
+        rng = np.random.default_rng(seeds[1])
+        files = {k: open(paths[k], "w", newline="") for k in ("raw", "fixed") if k in paths}
+        try:
+            if "raw" in files:
+                files["raw"].write(broken_header() + "\n")
+            if "fixed" in files:
+                files["fixed"].write("\t".join(FIXED_HEADER) + "\n")
+            for lo in range(0, rows, BLOCK):
+                block = cds_block(sp, min(BLOCK, rows - lo), rng)
+                text = block.to_csv(sep="\t", header=False, index=False)
+                if "fixed" in files:
+                    files["fixed"].write(text)
+                if "raw" in files:
+                    files["raw"].write(text.replace("\n", "\t\n"))
+        finally:
+            for f in files.values():
+                f.close()
+
+    if "species" in paths:
+        rng = np.random.default_rng(seeds[2])
+        with open(paths["species"], "w", newline="") as f:
+            for lo in range(0, species, BLOCK):
+                block = species_block(sp, lo, min(lo + BLOCK, species), rng)
+                block.to_csv(f, sep="\t", header=lo == 0, index=False)
+    return paths
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Write synthetic CUTG CDS and species tables.")
+    ap.add_argument("out", type=Path, help="output root (CDS/ is created inside)")
+    ap.add_argument("--rows", type=parse_count, default=parse_count("100k"),
+                    help="CDS rows (k/M/1eN accepted) [100k]")
+    ap.add_argument("--species", type=parse_count,
+                    help="species panel size and species‑table rows [rows/50]")
+    ap.add_argument("--tag", default="refseq", help="file name prefix [refseq]")
+    ap.add_argument("--what", default="raw,fixed,species",
+                    help="comma list of raw, fixed, species [all]")
+    ap.add_argument("--seed", type=int, default=2025)
+    args = ap.parse_args()
+
+    species = args.species or max(10, args.rows // 50)
+    paths = write_tables(args.out, args.rows, species, args.tag,
+                         args.what.split(","), args.seed)
+    for kind, path in paths.items():
+        print(f"{kind:8s} {path}  ({path.stat().st_size / 2**20:,.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
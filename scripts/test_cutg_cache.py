@@ -0,0 +1,37 @@
+"""cutg_cache: side table round trip and concurrent publishing."""
+import os
+import shutil
+
+import pandas as pd
+
+import cutg_cache
+from cutg_cache import build, cache_dir, load_frame
+from synth_cutg import write_tables
+
+
+def test_load_frame_matches_read_csv(tmp_path):
+    path = write_tables(tmp_path, 0, 200, what=("species",))["species"]
+    df = pd.read_csv(path, sep="\t")
+    df.iloc[3, 0] = None                       # a blank name survives as NaN
+    df.to_csv(path, sep="\t", index=False)
+
+    pd.testing.assert_frame_equal(load_frame(path), pd.read_csv(path, sep="\t"))
+    assert not list(cache_dir(path).glob("*.pkl"))
+
+
+def test_publish_keeps_a_concurrent_winner(tmp_path, monkeypatch):
+    path = write_tables(tmp_path, 0, 50, what=("species",))["species"]
+    where = cache_dir(path)
+    winner = build(path, tmp_path / "winner")
+    replace = os.replace
+
+    def racing(src, dst):                      # another process publishes first
+        shutil.copytree(winner, dst)
+        replace(src, dst)
+
+    monkeypatch.setattr(cutg_cache.os, "replace", racing)
+    assert build(path, where) == where
+    monkeypatch.undo()
+
+    assert [p.name for p in where.parent.iterdir()] == [where.name]
+    pd.testing.assert_frame_equal(load_frame(path), pd.read_csv(path, sep="\t"))
@@ -0,0 +1,36 @@
+"""cutg_layout.sniff on tables with an odd row near the top."""
+import pytest
+
+from cutg_io import iter_cutg
+from cutg_layout import LayoutError, sniff
+from synth_cutg import write_tables
+
+
+def _with_row(path, at, row):
+    lines = path.read_text().splitlines(keepends=True)
+    lines.insert(at, row)
+    path.write_text("".join(lines))
+
+
+def test_one_short_row_takes_the_modal_field_count(tmp_path):
+    paths = write_tables(tmp_path, 300, 50, what=("raw", "species"))
+    clean = sniff(paths["raw"])
+    first = paths["raw"].read_text().splitlines()[1].split("\t")
+    _with_row(paths["raw"], 10, "\t".join(first[:20]) + "\n")
+
+    assert sniff(paths["raw"]) == clean
+
+    before = [n for names, _ in iter_cutg(paths["species"]) for n in names]
+    _with_row(paths["species"], 5, "truncated\t1\t2\n")
+    after = [n for names, _ in iter_cutg(paths["species"]) for n in names]
+    assert [n for n in after if n != "truncated"] == before
+
+
+def test_no_majority_field_count_raises(tmp_path):
+    path = write_tables(tmp_path, 300, 50, what=("species",))["species"]
+    lines = path.read_text().splitlines(keepends=True)
+    lines[1:] = [ln if i % 2 else ln.rstrip("\n") + "\t0\n" for i, ln in enumerate(lines[1:])]
+    path.write_text("".join(lines))
+
+    with pytest.raises(LayoutError, match="no field count"):
+        sniff(path)
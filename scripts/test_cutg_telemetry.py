@@ -0,0 +1,16 @@
+"""cutg_telemetry run totals."""
+from cutg_telemetry import Telemetry
+
+
+def test_shuffles_stay_out_of_the_row_total():
+    tel = Telemetry("test", quiet=True)
+    with tel.stage("score") as st:
+        st(1000)
+    with tel.stage("null_model", unit="shuffles") as st:
+        st.to(50_000)
+
+    rec = tel.close()
+    assert (rec["rows"], rec["shuffles"]) == (1000, 50_000)
+    null = tel.stages[1].record()
+    assert (null["rows"], null["shuffles"]) == (0, 50_000)
+    assert "shuffles" in tel.stages[1].summary()